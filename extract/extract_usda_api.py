@@ -1,64 +1,185 @@
-import requests
 import os
+import sys
 import json
-from fake_useragent import UserAgent
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 
-## CUSTOM FUNCTIONS ##
-def get_latest_browser_version_number(browser, browser_type, operating_system):
-
-    ua = UserAgent()
-
-    all_browsers = ua.data_browsers
-
-    ff_linux_desktop_browsers = [d for d in all_browsers if d['type'] == browser_type and d['os'] == operating_system and d['browser'] == browser]
-
-    latest_ff_browser_num = "0.0"
-
-    for i in ff_linux_desktop_browsers:
-        new_num = i["browser_version"]
-        if (float(new_num) > float(latest_ff_browser_num)):
-            latest_ff_browser_num = new_num
-    
-    return(latest_ff_browser_num)
-
-def get_data_from_url(url):
-    try:
-        latest_ff = get_latest_browser_version_number(browser='Firefox', browser_type='desktop', operating_system='Linux')
-        ua = f"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/{latest_ff}"
-        headers = {
-        'User-Agent': ua
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-        return response  # Return the response data
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error {err.response.status_code}: {url}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.ConnectionError as err:
-        print(f"Connection Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.Timeout as err:
-        print(f"Timeout Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.RequestException as err:
-        print(f"Request Error: {err}")
-        return None  # Return None to indicate an error
-
-# Getting latest USDA FSIS food safety alert webpages from their RSS feed
-# The `field_year_id` argument will have to be changed every year. 
-# Values can be found in documentation here: https://www.fsis.usda.gov/sites/default/files/media_file/documents/Recall-API-documentation.pdf
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls import metrics
+from food_safety_recalls.fetch import get_data_from_url, download_to_file_if_changed, HostRateLimiter
+from food_safety_recalls.watermarks import read_recall_watermarks, empty_agency_watermarks
+from food_safety_recalls.json_stream import iter_json_array, JsonArrayWriter
+
+## GETTING ENVIRONMENT VARIABLES ##
+# How many years are pulled at once in a backfill and how many requests a second are sent to FSIS
+USDA_BACKFILL_CONCURRENCY = int(os.getenv("USDA_BACKFILL_CONCURRENCY", "4"))
+USDA_REQUESTS_PER_SECOND = float(os.getenv("USDA_REQUESTS_PER_SECOND", "1"))
+
+## CONSTANTS ##
+# API documentation here: https://www.fsis.usda.gov/sites/default/files/media_file/documents/Recall-API-documentation.pdf
 # landing page here: https://www.fsis.usda.gov/science-data/developer-resources/recall-api
-print("Grabbing USDA Food Safety Recall API JSON")
-usda_api_res = get_data_from_url("https://www.fsis.usda.gov/fsis/api/recall/v/1")
-usda_api_json = usda_api_res.json() # Parsing as JSON
+USDA_API_URL = "https://www.fsis.usda.gov/fsis/api/recall/v/1"
+# The year filter on the FSIS recalls page lists the API's `field_year_id` for every year
+USDA_RECALLS_PAGE_URL = "https://www.fsis.usda.gov/recalls"
+# Running with `--backfill` pulls every year instead of only the years since the latest USDA recall in the clean data
+BACKFILL = "--backfill" in sys.argv[1:]
+
+## CUSTOM FUNCTIONS ##
+# Reads the {year: field_year_id} mapping off the year filter on the FSIS recalls page
+def fetch_usda_year_ids():
+    # Only needed when the cached year ids are missing a year, so bs4 isn't imported on every run
+    from bs4 import BeautifulSoup
+    recalls_page = get_data_from_url(USDA_RECALLS_PAGE_URL)
+    if recalls_page is None:
+        return {}
+    soup = BeautifulSoup(recalls_page.text, "html.parser")
+    year_select = soup.find("select", attrs={"name": "field_year_id"})
+    if year_select is None:
+        print("Could not find the year filter on the FSIS recalls page")
+        return {}
+    year_ids = {}
+    for option in year_select.find_all("option"):
+        year_str = option.get_text(strip=True)
+        if year_str.isdigit() and option.get("value"):
+            year_ids[year_str] = option["value"]
+    return year_ids
+
+# Uses the cached year ids unless one of the years needed isn't in them, like on a new year's first run
+def load_usda_year_ids(year_ids_path, needed_years):
+    year_ids = {}
+    if os.path.exists(year_ids_path):
+        with open(year_ids_path, "r") as f:
+            year_ids = json.load(f)
+
+    if all(str(year) in year_ids for year in needed_years):
+        return year_ids
+
+    print("Refreshing the USDA year ids from the FSIS recalls page")
+    fetched_year_ids = fetch_usda_year_ids()
+    if fetched_year_ids:
+        year_ids.update(fetched_year_ids)
+        os.makedirs(os.path.dirname(year_ids_path), exist_ok=True)
+        with open(year_ids_path, "w") as f:
+            json.dump(year_ids, f, indent=4, separators=(",", ": "), sort_keys=True)
+    return year_ids
+
+# Year of the latest USDA recall in the clean data, or None if there aren't any
+def get_latest_usda_year():
+    latest_dttm_str = read_recall_watermarks().get("USDA", empty_agency_watermarks())["latest_notification_dttm"]
+    if latest_dttm_str is None:
+        return None
+    return datetime.fromisoformat(latest_dttm_str).astimezone(ZoneInfo("America/New_York")).year
+
+# Downloads one year's recalls to its own file, returns whether it changed or None if it failed
+def download_usda_partition(year, year_id):
+    usda_rate_limiter.acquire(USDA_API_URL)
+    partition_file_path = os.path.join(partition_folder_path, f"{year}.json")
+    partition_validators_path = os.path.join(validators_folder_path, f"usda_food_safety_recalls_{year}.json")
+    partition_changed = download_to_file_if_changed(f"{USDA_API_URL}?field_year_id={year_id}", partition_validators_path, partition_file_path)
+    if partition_changed is None:
+        print(f"Could not download the USDA Food Safety Recall API JSON for {year}")
+    elif partition_changed:
+        print(f"USDA Food Safety Recall API JSON for {year} changed")
+    return partition_changed
+
+# Years that have a partition file on disk, newest first
+def list_usda_partition_years():
+    partition_file_names = os.listdir(partition_folder_path) if os.path.isdir(partition_folder_path) else []
+    return sorted(
+        (int(file_name[:-len(".json")]) for file_name in partition_file_names
+         if file_name.endswith(".json") and file_name[:-len(".json")].isdigit()),
+        reverse=True
+    )
+
+# Splits the raw file the unpartitioned extract wrote into one partition file per recall year, so the
+# first partitioned run, which only pulls the window years, doesn't drop the older years from the raw file.
+# Returns how many recalls were seeded.
+def seed_usda_partitions(raw_file_path):
+    partition_writers = {}
+    # A failure part way through leaves no partition files, so the next run seeds them again
+    with ExitStack() as stack:
+        for recall in iter_json_array(raw_file_path):
+            year = int(recall["field_recall_date"][:4])
+            if year not in partition_writers:
+                partition_writers[year] = stack.enter_context(JsonArrayWriter(os.path.join(partition_folder_path, f"{year}.json")))
+            partition_writers[year].write(recall)
+    return sum(partition_writer.count for partition_writer in partition_writers.values())
+
+## OBJECTS ##
+usda_rate_limiter = HostRateLimiter(USDA_REQUESTS_PER_SECOND)
+
+## ACTUAL SCRIPT ##
+metrics.start_run("extract_usda_api")
 
 # Getting script folder
 script_dir = os.path.dirname(__file__)
 target_folder_rel_path = "../raw_data"
 output_file_path = os.path.join(script_dir, target_folder_rel_path, "usda_food_safety_recalls.json")
+# ETag, Last-Modified and content hash from the last time each raw JSON was written
+validators_folder_path = os.path.join(script_dir, target_folder_rel_path, "validators")
+# Its own file, the RSS extract keeps the feed's validators in `usda_food_safety_recalls.json`
+validators_file_path = os.path.join(validators_folder_path, "usda_food_safety_recalls_api.json")
+# Each year's recalls and the cached year ids are kept in a subfolder so writing them doesn't trigger the transform workflow
+partition_folder_path = os.path.join(script_dir, target_folder_rel_path, "partitions", "usda")
+year_ids_file_path = os.path.join(script_dir, target_folder_rel_path, "partitions", "usda_year_ids.json")
+
+# Hourly runs only pull the years from the latest USDA recall already in the clean data through this
+# year, so a recall issued on New Year's Eve still gets picked up once the year has turned over
+current_year = datetime.now(ZoneInfo("America/New_York")).year
+latest_usda_year = get_latest_usda_year()
+if latest_usda_year is None:
+    latest_usda_year = current_year
+window_years = list(range(current_year, min(latest_usda_year, current_year) - 1, -1))
+
+usda_year_ids = load_usda_year_ids(year_ids_file_path, window_years)
+
+if not all(str(year) in usda_year_ids for year in window_years):
+    # Without the year ids the whole history is pulled in one request like before
+    print("USDA year ids aren't available, grabbing the full USDA Food Safety Recall API JSON")
+    # The response is written to the raw file as it's received instead of being parsed and re-serialized,
+    # so the whole API history is never held in memory
+    usda_api_changed = download_to_file_if_changed(USDA_API_URL, validators_file_path, output_file_path)
+
+    if usda_api_changed is None:
+        sys.exit("Could not download the USDA Food Safety Recall API JSON")
+
+    # Not rewriting the raw file when it hasn't changed so the transform and load workflows aren't triggered
+    if not usda_api_changed:
+        print("USDA Food Safety Recall API JSON hasn't changed, leaving ./raw_data/usda_food_safety_recalls.json as is")
+    else:
+        print("Wrote out USDA Food Safety Recall API JSON to ./raw_data/usda_food_safety_recalls.json")
+else:
+    if BACKFILL:
+        partition_years = sorted((int(year) for year in usda_year_ids), reverse=True)
+    else:
+        partition_years = window_years
+
+    os.makedirs(partition_folder_path, exist_ok=True)
+    if not list_usda_partition_years() and os.path.exists(output_file_path):
+        seeded_count = seed_usda_partitions(output_file_path)
+        print(f"Seeded the USDA partitions with the {seeded_count} recalls in ./raw_data/usda_food_safety_recalls.json")
+
+    print(f"Grabbing USDA Food Safety Recall API JSON for {', '.join(str(year) for year in partition_years)}")
+    with ThreadPoolExecutor(max_workers=USDA_BACKFILL_CONCURRENCY) as executor:
+        partitions_changed = list(executor.map(
+            lambda year: download_usda_partition(year, usda_year_ids[str(year)]),
+            partition_years
+        ))
 
-# Writing out dict as JSON
-with open(output_file_path, 'w') as f:
-    json.dump(usda_api_json, f, indent=4, separators=(",", ": "))
+    if any(partition_changed is None for partition_changed in partitions_changed):
+        sys.exit("Could not download the USDA Food Safety Recall API JSON")
 
-print("Writing out USDA Food Safety Recall API JSON to ./raw_data/usda_food_safety_recalls.json")
+    # Not rewriting the raw file when none of the years changed so the transform and load workflows aren't triggered
+    if not any(partitions_changed):
+        print("USDA Food Safety Recall API JSON hasn't changed, leaving ./raw_data/usda_food_safety_recalls.json as is")
+    else:
+        # The raw file is every year's recalls on disk, newest year first, streamed from their files, so an
+        # hourly run that only pulled the latest years still writes out the whole history
+        with JsonArrayWriter(output_file_path) as raw_writer:
+            for year in list_usda_partition_years():
+                for recall in iter_json_array(os.path.join(partition_folder_path, f"{year}.json")):
+                    raw_writer.write(recall)
+        print(f"Wrote out {raw_writer.count} USDA recalls to ./raw_data/usda_food_safety_recalls.json")
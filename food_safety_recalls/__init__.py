@@ -0,0 +1 @@
+# Code shared between the extract, transform and load scripts
@@ -0,0 +1,24 @@
+import sys
+import argparse
+
+from food_safety_recalls import metrics
+from food_safety_recalls.runner import AGENCY_STAGES, run_pipeline
+
+# Runs the whole pipeline in one process from the repo root:
+#   python -m food_safety_recalls run --agency fda|usda|all [--force] [--skip-extract] [--metrics]
+
+## ACTUAL SCRIPT ##
+parser = argparse.ArgumentParser(prog="python -m food_safety_recalls")
+subparsers = parser.add_subparsers(dest="command", required=True)
+run_parser = subparsers.add_parser("run", help="extract, transform and load recalls in one process")
+run_parser.add_argument("--agency", choices=list(AGENCY_STAGES) + ["all"], default="all")
+run_parser.add_argument("--force", action="store_true", help="run every stage even if its inputs haven't changed")
+run_parser.add_argument("--skip-extract", action="store_true", help="transform and load the raw data already on disk")
+run_parser.add_argument("--metrics", action="store_true", help="write a metrics report for each stage to the metrics folder")
+args = parser.parse_args()
+
+if args.metrics:
+    metrics.enable_metrics()
+
+if not run_pipeline(args.agency, force=args.force, skip_extract=args.skip_extract):
+    sys.exit(1)
@@ -0,0 +1,76 @@
+import os
+import re
+import json
+import hashlib
+import threading
+
+## CUSTOM CLASSES ##
+class ClassificationCache:
+    """
+    LLM recall classifications saved to a JSON lines file so text that's already been
+    classified is never sent to the API again. Entries are keyed by a hash of the
+    normalized recall text, the model name and the prompt version, and the file is kept
+    in least to most recently used order so the oldest entries are dropped first once
+    there are more than `max_entries`.
+    """
+    def __init__(self, cache_path, max_entries=5000):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.entries = {}
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    @staticmethod
+    def make_key(recall_text, model, prompt_version):
+        # Whitespace differences between fetches of the same page shouldn't count as new text
+        normalized_text = re.sub(r"\s+", " ", recall_text).strip()
+        key_str = "\n".join([model, prompt_version, normalized_text])
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    def get(self, recall_text, model, prompt_version):
+        key = self.make_key(recall_text, model, prompt_version)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Moving the entry to the end so it's the most recently used. A hit alone doesn't
+            # rewrite the file, the new order is saved along with the next insert or eviction.
+            self.entries[key] = entry
+            self.hits += 1
+            return entry["classification"]
+
+    def set(self, recall_text, model, prompt_version, classification):
+        key = self.make_key(recall_text, model, prompt_version)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = {
+                "key": key,
+                "model": model,
+                "prompt_version": prompt_version,
+                "classification": classification
+            }
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+            self.changed = True
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_cache_path = f"{self.cache_path}.tmp"
+            with open(tmp_cache_path, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_cache_path, self.cache_path)
+            self.changed = False
@@ -0,0 +1,170 @@
+import os
+import json
+import gzip
+from datetime import datetime, timezone
+
+from food_safety_recalls.store import CLEAN_DATA_DIR
+from food_safety_recalls.state_codes import states_to_mask
+
+# Compact, column by column copy of the published recalls for the dashboard. Rows are split
+# into one row group per year of `notification_dttm`, and each column of a row group is its
+# own gzipped JSON array at `<year>/<column>.json.gz`, so a reader only downloads and parses
+# the columns and years it asks for. Low-cardinality columns are dictionary encoded as
+# integer codes into lists kept in `manifest.json`, and timestamps are integer Unix seconds.
+
+## CONSTANTS ##
+COLUMNAR_EXPORT_DIR = os.path.join(CLEAN_DATA_DIR, "columnar")
+COLUMNAR_MANIFEST_NAME = "manifest.json"
+DICTIONARY_COLUMNS = ["agency", "risk_level", "recall_type", "recall_classification"]
+TIMESTAMP_COLUMNS = ["notification_dttm", "company_announce_dttm"]
+COLUMNS = [
+    "uid",
+    "notification_dttm",
+    "company_announce_dttm",
+    "agency",
+    "title",
+    "recall_reason",
+    "company_name",
+    "brand_name",
+    "product_description",
+    "impacted_states",
+    "recall_url",
+    "notice_id_number",
+    "recall_type",
+    "risk_level",
+    "recall_classification"
+]
+
+## CUSTOM FUNCTIONS ##
+def encode_timestamp(dttm_str):
+    if dttm_str is None:
+        return None
+    return int(datetime.fromisoformat(dttm_str).timestamp())
+
+def decode_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+# Only writes the file if its bytes changed so unchanged row groups don't show up in the commit
+def write_if_changed(file_path, content):
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as f:
+            if f.read() == content:
+                return False
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_file_path = f"{file_path}.tmp"
+    with open(tmp_file_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_file_path, file_path)
+    return True
+
+# Writes the columnar export of `recalls`, which should be oldest first like the recall log.
+# Returns how many column files were rewritten.
+def write_columnar_export(recalls, export_dir=COLUMNAR_EXPORT_DIR):
+    # Codes are given out in the order values first appear so adding recalls never renumbers old ones
+    dictionaries = {column: [] for column in DICTIONARY_COLUMNS}
+    dictionary_codes = {column: {} for column in DICTIONARY_COLUMNS}
+    row_groups = {}
+
+    for recall in recalls:
+        notification_timestamp = encode_timestamp(recall["notification_dttm"])
+        year = str(decode_timestamp(notification_timestamp).year)
+        row_group = row_groups.setdefault(year, {column: [] for column in COLUMNS})
+        for column in COLUMNS:
+            value = recall.get(column)
+            if column in DICTIONARY_COLUMNS:
+                if value not in dictionary_codes[column]:
+                    dictionary_codes[column][value] = len(dictionaries[column])
+                    dictionaries[column].append(value)
+                value = dictionary_codes[column][value]
+            elif column in TIMESTAMP_COLUMNS:
+                value = notification_timestamp if column == "notification_dttm" else encode_timestamp(value)
+            row_group[column].append(value)
+
+    manifest = {
+        "columns": COLUMNS,
+        "dictionary_columns": DICTIONARY_COLUMNS,
+        "timestamp_columns": TIMESTAMP_COLUMNS,
+        "dictionaries": dictionaries,
+        "row_count": sum(len(row_group["uid"]) for row_group in row_groups.values()),
+        "row_groups": []
+    }
+
+    written_count = 0
+    for year in sorted(row_groups):
+        row_group = row_groups[year]
+        for column in COLUMNS:
+            column_json = json.dumps(row_group[column], separators=(",", ":"))
+            # A fixed mtime keeps the gzip bytes the same when the column hasn't changed
+            column_gz = gzip.compress(column_json.encode("utf-8"), mtime=0)
+            written_count += write_if_changed(os.path.join(export_dir, year, f"{column}.json.gz"), column_gz)
+        manifest["row_groups"].append({
+            "name": year,
+            "row_count": len(row_group["uid"]),
+            "min_notification_dttm": min(row_group["notification_dttm"]),
+            "max_notification_dttm": max(row_group["notification_dttm"])
+        })
+
+    manifest_json = json.dumps(manifest, indent=4, separators=(",", ": "))
+    written_count += write_if_changed(os.path.join(export_dir, COLUMNAR_MANIFEST_NAME), manifest_json.encode("utf-8"))
+    return written_count
+
+# Reads `columns` (all of them by default) for recalls with a `notification_dttm` between `start`
+# and `end`, which are timezone-aware datetimes and both optional, and that impact any of the postal
+# codes in `states` if it's given. Row groups outside the range are never opened. Returns a dict of
+# column name to list of values, with dictionary columns decoded back to their strings and
+# timestamps left as integer Unix seconds.
+def read_columnar_export(columns=None, start=None, end=None, states=None, export_dir=COLUMNAR_EXPORT_DIR):
+    with open(os.path.join(export_dir, COLUMNAR_MANIFEST_NAME), "r") as f:
+        manifest = json.load(f)
+
+    if columns is None:
+        columns = manifest["columns"]
+    start_timestamp = None if start is None else int(start.timestamp())
+    end_timestamp = None if end is None else int(end.timestamp())
+    states_mask = None if states is None else states_to_mask(states)
+    # The columns rows are filtered on are needed even if they weren't asked for
+    read_columns = list(columns)
+    if (start_timestamp is not None or end_timestamp is not None) and "notification_dttm" not in read_columns:
+        read_columns.append("notification_dttm")
+    if states_mask is not None and "impacted_states" not in read_columns:
+        read_columns.append("impacted_states")
+
+    result = {column: [] for column in columns}
+    for row_group in manifest["row_groups"]:
+        if start_timestamp is not None and row_group["max_notification_dttm"] < start_timestamp:
+            continue
+        if end_timestamp is not None and row_group["min_notification_dttm"] > end_timestamp:
+            continue
+
+        row_group_columns = {}
+        for column in read_columns:
+            with gzip.open(os.path.join(export_dir, row_group["name"], f"{column}.json.gz"), "rt") as f:
+                row_group_columns[column] = json.load(f)
+
+        keep_rows = None
+        if start_timestamp is not None or end_timestamp is not None:
+            keep_rows = [
+                (start_timestamp is None or timestamp >= start_timestamp) and (end_timestamp is None or timestamp <= end_timestamp)
+                for timestamp in row_group_columns["notification_dttm"]
+            ]
+        if states_mask is not None:
+            state_rows = [states_to_mask(row_states or []) & states_mask != 0 for row_states in row_group_columns["impacted_states"]]
+            keep_rows = state_rows if keep_rows is None else [keep_row and state_row for keep_row, state_row in zip(keep_rows, state_rows)]
+
+        for column in columns:
+            values = row_group_columns[column]
+            if keep_rows is not None:
+                values = [value for value, keep_row in zip(values, keep_rows) if keep_row]
+            if column in manifest["dictionary_columns"]:
+                dictionary = manifest["dictionaries"][column]
+                values = [dictionary[code] for code in values]
+            result[column].extend(values)
+
+    return result
+
+# Turns the column lists from read_columnar_export into one dict per recall
+def columns_to_records(columns):
+    column_names = list(columns)
+    return [dict(zip(column_names, row)) for row in zip(*columns.values())]
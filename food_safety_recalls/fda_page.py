@@ -0,0 +1,62 @@
+from datetime import datetime
+
+# Parsing for FDA recall pages. The recall's data is all in the `<dl>` description list and
+# the body `<p>` tags, so only those subtrees are built into the soup. The rest of the page
+# (navigation menus, scripts, the footer) is still read by the parser but never turned into tags.
+# bs4 is imported the first time a page is parsed so importing this module stays cheap.
+
+## CONSTANTS ##
+FDA_PAGE_TAGS = ["dl", "p"]
+
+## CUSTOM FUNCTIONS ##
+def parse_fda_page(page_html, tag_names=FDA_PAGE_TAGS):
+    from bs4 import BeautifulSoup, SoupStrainer
+    return BeautifulSoup(page_html, "html.parser", parse_only=SoupStrainer(tag_names))
+
+def extract_dl_terms(dt_elmnt):
+    dt_str = dt_elmnt.string
+    if dt_str is None:
+        raise TypeError("Data term element was not a one child NavigableString")
+    if dt_str == "Company Announcement Date:":
+        dt_str_name = "company_announce_dttm"
+    elif dt_str == "FDA Publish Date:":
+        dt_str_name = "notification_dttm"
+    elif dt_str == "Product Type:":
+        dt_str_name = "product_type"
+    elif dt_str == "Reason for Announcement:":
+        dt_str_name = "recall_reason"
+    elif dt_str == "Company Name:":
+        dt_str_name = "company_name"
+    elif dt_str == "Brand Name:":
+        dt_str_name = "brand_name"
+    elif dt_str == "Product Description:":
+        dt_str_name = "product_description"
+    else:
+        raise ValueError("Data term element value not recognized.")
+    return dt_str_name
+
+def extract_dd_terms(dd_elmnt):
+    child_count = len(list(dd_elmnt.children))
+    child_list = [child.name for child in dd_elmnt]
+    if child_count == 1:
+        dd_val = str([gchild for gchild in dd_elmnt.stripped_strings][0])
+        if dd_val is None:
+            raise TypeError("Single data description element was not a one child NavigableString")
+    elif 'time' in child_list:
+        time_tag = dd_elmnt.time
+        tag_dict_val_dttm = time_tag.attrs.values()
+        tag_dttm_str = list(tag_dict_val_dttm)[0]
+        format_string = "%Y-%m-%dT%H:%M:%S%z"
+        dd_val = datetime.strptime(tag_dttm_str, format_string)
+    elif 'div' in child_list:
+        item_div_tags = dd_elmnt.find("div", class_="field--item")
+        if len(item_div_tags) == 1:
+            dd_val = str(item_div_tags.string)
+        else:
+            dd_val = [str(div_tag.string) for div_tag in item_div_tags]
+    elif 'br' in child_list:
+        dd_val = [str(gchild) for gchild in dd_elmnt.stripped_strings]
+    else:
+        raise ValueError("Data description element value not recognized.")
+    return dd_val
+
@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from urllib.parse import urlparse
+
+from food_safety_recalls import metrics
+# `requests` and `fake_useragent` are imported the first time a request is made, so scripts that
+# only need the rate limiter or the validators don't pay for importing them at startup
+
+## CONSTANTS ##
+# Seconds to wait to connect to a server and then to wait between bytes of its response
+REQUEST_TIMEOUT = (10, 60)
+# Connections kept open per host, this should be at least the number of threads fetching at once
+POOL_MAXSIZE = 16
+# Bytes read at a time when a download is streamed to a file
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+## CUSTOM CLASSES ##
+class TokenBucket:
+    """Thread-safe token bucket that refills `rate` tokens a second up to `capacity` tokens"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class HostRateLimiter:
+    """Keeps a separate token bucket for each host so one slow site doesn't hold up another"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            bucket = self.buckets[host]
+        bucket.acquire()
+
+## CUSTOM FUNCTIONS ##
+def get_latest_browser_version_number(browser, browser_type, operating_system):
+    from fake_useragent import UserAgent
+
+    ua = UserAgent()
+
+    all_browsers = ua.data_browsers
+
+    ff_linux_desktop_browsers = [d for d in all_browsers if d['type'] == browser_type and d['os'] == operating_system and d['browser'] == browser]
+
+    latest_ff_browser_num = "0.0"
+
+    for i in ff_linux_desktop_browsers:
+        new_num = i["browser_version"]
+        if (float(new_num) > float(latest_ff_browser_num)):
+            latest_ff_browser_num = new_num
+    
+    return(latest_ff_browser_num)
+
+# The User-Agent and the session are built once per process the first time they're needed
+# and then shared by every request, including ones made from other threads
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+    with _session_lock:
+        if _session is None:
+            latest_ff = get_latest_browser_version_number(browser='Firefox', browser_type='desktop', operating_system='Linux')
+            ua = f"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/{latest_ff}"
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': ua
+            })
+            # Reusing kept-alive connections instead of opening a new one for every page
+            adapter = HTTPAdapter(pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+def get_data_from_url(url, headers=None, stream=False):
+    import requests
+    try:
+        session = get_session()
+        metrics.increment("http_requests")
+        with metrics.timer("http_request"):
+            response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=stream)
+        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
+        if response.status_code == 304:
+            metrics.increment("http_not_modified")
+        elif not stream and metrics.METRICS_ENABLED:
+            # Streamed bodies are counted as they're read
+            metrics.increment("http_bytes", len(response.content))
+        return response  # Return the response data
+    except requests.exceptions.HTTPError as err:
+        print(f"HTTP Error {err.response.status_code}: {url}")
+        metrics.increment("http_errors")
+        return None  # Return None to indicate an error
+    except requests.exceptions.ConnectionError as err:
+        print(f"Connection Error: {err}")
+        metrics.increment("http_errors")
+        return None  # Return None to indicate an error
+    except requests.exceptions.Timeout as err:
+        print(f"Timeout Error: {err}")
+        metrics.increment("http_errors")
+        return None  # Return None to indicate an error
+    except requests.exceptions.RequestException as err:
+        print(f"Request Error: {err}")
+        metrics.increment("http_errors")
+        return None  # Return None to indicate an error
+
+def load_validators(validators_path):
+    if not os.path.exists(validators_path):
+        return {}
+    with open(validators_path, "r") as f:
+        return json.load(f)
+
+def save_validators(response, validators_path, content_hash=None):
+    if content_hash is None:
+        content_hash = hashlib.sha256(response.content).hexdigest()
+    validators = {
+        "url": response.url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": content_hash
+    }
+    os.makedirs(os.path.dirname(validators_path), exist_ok=True)
+    with open(validators_path, "w") as f:
+        json.dump(validators, f, indent=4, separators=(",", ": "))
+
+def make_conditional_headers(validators):
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+# Sends a conditional GET with the ETag and Last-Modified saved from the last time the raw file
+# was written. Returns the response and whether its content changed, which is False when the server
+# answers 304 Not Modified or sends back a body that hashes the same as last time.
+# Call save_validators after writing out the raw file so a failed write gets retried next run.
+def get_data_from_url_if_changed(url, validators_path):
+    validators = load_validators(validators_path)
+    response = get_data_from_url(url, headers=make_conditional_headers(validators))
+    if response is None:
+        return None, False
+    if response.status_code == 304:
+        return response, False
+
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    return response, content_hash != validators.get("content_hash")
+
+# Same as get_data_from_url_if_changed but the response body is streamed straight to `output_path`
+# while it's hashed, so it's never held in memory. The file is only replaced and the validators only
+# saved when the content changed. Returns whether the file was rewritten, or None if the download failed.
+def download_to_file_if_changed(url, validators_path, output_path):
+    import requests
+    validators = load_validators(validators_path)
+    response = get_data_from_url(url, headers=make_conditional_headers(validators), stream=True)
+    if response is None:
+        return None
+
+    tmp_output_path = f"{output_path}.tmp"
+    content_hash = hashlib.sha256()
+    downloaded_bytes = 0
+    try:
+        with response:
+            if response.status_code == 304:
+                return False
+            with open(tmp_output_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    content_hash.update(chunk)
+                    f.write(chunk)
+                    downloaded_bytes += len(chunk)
+    except requests.exceptions.RequestException as err:
+        print(f"Request Error: {err}")
+        metrics.increment("http_errors")
+        if os.path.exists(tmp_output_path):
+            os.remove(tmp_output_path)
+        return None
+    finally:
+        metrics.increment("http_bytes", downloaded_bytes)
+
+    if content_hash.hexdigest() == validators.get("content_hash"):
+        os.remove(tmp_output_path)
+        return False
+
+    os.replace(tmp_output_path, output_path)
+    save_validators(response, validators_path, content_hash.hexdigest())
+    return True
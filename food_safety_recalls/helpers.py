@@ -0,0 +1,31 @@
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Small helpers the extract, transform and load scripts all used to keep their own copies of
+
+## CUSTOM CLASSES ##
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super(DateTimeEncoder, self).default(obj)
+
+## CUSTOM FUNCTIONS ##
+def load_json_file(file_path):
+    with open(file_path, "r") as f:
+        json_data = json.load(f)
+
+    return json_data
+
+def change_timezones(dttm, tz_dest):
+    NEW_TZ = ZoneInfo(tz_dest)
+    dttm_new_tz = dttm.astimezone(NEW_TZ)
+    return dttm_new_tz
+
+# FDA description list values are a list of strings when the <dd> holds <br> breaks or several
+# <div>s, those are joined into one string so they can be searched like the single string values
+def join_text_value(value):
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value)
+    return value
@@ -0,0 +1,109 @@
+import os
+import json
+
+# Reading and writing JSON arrays one element at a time, so a file with every USDA recall
+# in it never has to be held in memory all at once
+
+## CONSTANTS ##
+# Characters read from the file at a time while looking for the next array element
+READ_CHUNK_SIZE = 1 << 16
+
+## CUSTOM CLASSES ##
+class JsonArrayWriter:
+    """
+    Writes a JSON array an element at a time in the same format as
+    `json.dump(list, f, indent=4, separators=(",", ": "))`. The file is written to a temporary
+    path and only moved into place when the writer is closed, and nothing is written at all
+    if no elements were.
+    """
+    def __init__(self, file_path, cls=None):
+        self.file_path = file_path
+        self.tmp_file_path = f"{file_path}.tmp"
+        self.cls = cls
+        self.count = 0
+        self.f = None
+
+    def write(self, element):
+        element_json = json.dumps(element, indent=4, separators=(",", ": "), cls=self.cls)
+        if self.f is None:
+            self.f = open(self.tmp_file_path, "w")
+            self.f.write("[\n")
+        else:
+            self.f.write(",\n")
+        # Indenting every line of the element one level to sit inside the array
+        self.f.write("\n".join(f"    {line}" for line in element_json.split("\n")))
+        self.count += 1
+
+    def close(self):
+        if self.f is None:
+            return
+        self.f.write("\n]")
+        self.f.close()
+        self.f = None
+        os.replace(self.tmp_file_path, self.file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.f is not None:
+            # Leaving the previous file in place when the run fails part way through
+            self.f.close()
+            self.f = None
+            os.remove(self.tmp_file_path)
+
+## CUSTOM FUNCTIONS ##
+# Yields the elements of the JSON array in a file one by one, only keeping the
+# element being decoded and the unread part of the current chunk in memory
+def iter_json_array(file_path, chunk_size=READ_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    with open(file_path, "r") as f:
+        buffer = ""
+        position = 0
+        started = False
+        eof = False
+        while True:
+            # Skipping whitespace and the "[" or "," before the next element
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in "[,"):
+                if buffer[position] == "[":
+                    if started:
+                        break
+                    started = True
+                position += 1
+
+            if position < len(buffer) and buffer[position] == "]" and started:
+                return
+
+            if position < len(buffer) and started:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The element runs past the end of the buffer, so read more of the file first
+                    if eof:
+                        raise
+                else:
+                    # The element is only complete once the "," or "]" after it has been read,
+                    # otherwise a number cut off like "12." in the buffer would decode as 12
+                    next_position = end
+                    while next_position < len(buffer) and buffer[next_position].isspace():
+                        next_position += 1
+                    if next_position < len(buffer) and buffer[next_position] in ",]":
+                        yield element
+                        position = next_position
+                        continue
+                    # Anything else is only allowed if it's the rest of a number still being read
+                    if next_position < len(buffer) and (eof or buffer[next_position:].strip("0123456789.eE+-")):
+                        raise ValueError(f"Unexpected {buffer[next_position]!r} after an array element in {file_path}")
+
+            if eof:
+                if not started:
+                    raise ValueError(f"{file_path} does not contain a JSON array")
+                raise ValueError(f"{file_path} ended before its JSON array was closed")
+
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[position:] + chunk
+            position = 0
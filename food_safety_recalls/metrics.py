@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from food_safety_recalls.store import REPO_DIR
+
+# Timers and counters for a pipeline run, written out as a JSON run report when the run finishes
+# so runs can be compared over time. A script calls `start_run` once, code anywhere in the package
+# calls `increment` and `timer`, and the report is written to `metrics/<run name>/<start time>.json`
+# when the script exits (or when the pipeline runner finishes the stage).
+#
+# Metrics are off unless FOOD_SAFETY_RECALLS_METRICS is set to 1. When they're off, `increment`
+# returns right away and `timer` hands back the same do-nothing context manager every time.
+
+## GETTING ENVIRONMENT VARIABLES ##
+METRICS_ENABLED = os.getenv("FOOD_SAFETY_RECALLS_METRICS", "0") == "1"
+
+## CONSTANTS ##
+METRICS_DIR = os.path.join(REPO_DIR, "metrics")
+
+## CUSTOM CLASSES ##
+class Timer:
+    """Context manager that adds how long its block took to a named timer of the current run"""
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        add_timing(self.name, time.perf_counter() - self.start)
+        return False
+
+## OBJECTS ##
+_null_timer = nullcontext()
+_lock = threading.Lock()
+_run = None
+_atexit_registered = False
+
+## CUSTOM FUNCTIONS ##
+def enable_metrics(enabled=True):
+    global METRICS_ENABLED
+    METRICS_ENABLED = enabled
+
+# Starts collecting metrics for a run, finishing whatever run was going on before
+def start_run(run_name):
+    global _run, _atexit_registered
+    if not METRICS_ENABLED:
+        return
+    finish_run()
+    with _lock:
+        _run = {
+            "run_name": run_name,
+            "started_at": datetime.now(timezone.utc),
+            "start": time.perf_counter(),
+            "counters": {},
+            "timers": {}
+        }
+        if not _atexit_registered:
+            atexit.register(finish_run)
+            _atexit_registered = True
+
+def increment(name, amount=1):
+    if not METRICS_ENABLED or _run is None:
+        return
+    with _lock:
+        _run["counters"][name] = _run["counters"].get(name, 0) + amount
+
+def add_timing(name, secs):
+    if not METRICS_ENABLED or _run is None:
+        return
+    with _lock:
+        timing = _run["timers"].setdefault(name, {"count": 0, "total_secs": 0.0, "max_secs": 0.0})
+        timing["count"] += 1
+        timing["total_secs"] += secs
+        timing["max_secs"] = max(timing["max_secs"], secs)
+
+def timer(name):
+    if not METRICS_ENABLED or _run is None:
+        return _null_timer
+    return Timer(name)
+
+# Writes the current run's report and stops collecting, returns the report's path or None if there was no run
+def finish_run(metrics_dir=METRICS_DIR):
+    global _run
+    with _lock:
+        run = _run
+        _run = None
+    if run is None:
+        return None
+
+    report = {
+        "run_name": run["run_name"],
+        "started_at": run["started_at"].isoformat(),
+        "wall_secs": round(time.perf_counter() - run["start"], 6),
+        "counters": dict(sorted(run["counters"].items())),
+        "timers": {
+            name: {
+                "count": timing["count"],
+                "total_secs": round(timing["total_secs"], 6),
+                "max_secs": round(timing["max_secs"], 6)
+            }
+            for name, timing in sorted(run["timers"].items())
+        }
+    }
+    report_path = os.path.join(metrics_dir, run["run_name"], f"{run['started_at'].strftime('%Y%m%dT%H%M%S%fZ')}.json")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4, separators=(",", ": "))
+    print(f"Wrote metrics for {run['run_name']} to {report_path}")
+    return report_path
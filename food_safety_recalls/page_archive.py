@@ -0,0 +1,68 @@
+import os
+import json
+import gzip
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+# Archive of the recall pages the transforms download, so history can be re-transformed
+# without fetching anything. Page bodies are gzipped and stored once per distinct content
+# under `objects/<first two hash characters>/<sha256>.html.gz`, and `index.ndjson` records
+# every fetch as a line with the URL, fetch timestamp, ETag, encoding and content hash.
+# The last line for a URL is the page that's replayed.
+
+## CUSTOM CLASSES ##
+class PageArchive:
+    """Compressed, content-addressed store of fetched pages keyed by URL"""
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, "index.ndjson")
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["url"]] = entry
+
+    def object_path(self, content_hash):
+        return os.path.join(self.archive_dir, "objects", content_hash[:2], f"{content_hash}.html.gz")
+
+    def store(self, url, response):
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        object_path = self.object_path(content_hash)
+        entry = {
+            "url": url,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "etag": response.headers.get("ETag"),
+            "encoding": response.encoding,
+            "content_hash": content_hash
+        }
+        with self.lock:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                # A fixed mtime keeps the gzip bytes the same for the same page
+                with gzip.GzipFile(object_path, "wb", mtime=0) as f:
+                    f.write(response.content)
+            previous_entry = self.entries.get(url)
+            self.entries[url] = entry
+            # Refetching an unchanged page doesn't need another index line
+            if previous_entry is not None and previous_entry["content_hash"] == content_hash:
+                return
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    # Returns the latest archived HTML for a URL, or None if it was never archived
+    def get(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        with gzip.open(self.object_path(entry["content_hash"]), "rb") as f:
+            content = f.read()
+        # Decoding the same way `requests` does for `response.text`
+        return str(content, entry["encoding"] or "utf-8", errors="replace")
+
+    def urls(self):
+        return list(self.entries)
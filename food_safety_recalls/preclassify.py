@@ -0,0 +1,54 @@
+import re
+
+from food_safety_recalls.helpers import join_text_value
+
+# Rules that classify the FDA recalls whose `recall_reason` already makes the class obvious,
+# so only the ambiguous ones need to be sent to OpenAI. Pathogens and radionuclides are Class I
+# hazards. Reasons that match none of those, or that also mention a hazard whose class depends
+# on the amount or the product, are left for the API. Undeclared allergens are one of those:
+# the few-shot examples in the FDA transform have undeclared milk as both Class I and Class III
+# and undeclared sesame and wheat as Class II.
+
+## CONSTANTS ##
+CLASS_I_PATTERNS = [
+    # Pathogens
+    r"listeria|monocytogen",
+    r"salmonella",
+    r"botulinum|botulism|uneviscerated",
+    r"e\. ?coli|escherichia|shiga|\bstec\b",
+    r"cereus|cronobacter|hepatitis|norovirus|cyclospora|vibrio",
+    # Radionuclides
+    r"cesium|radionuclide",
+]
+
+# Major allergens, matched as whole words so "eggplant" or "fishing" don't count
+MAJOR_ALLERGENS = (
+    r"milk|eggs?|fish|shellfish|shrimp|crabs?|lobsters?|tree ?nuts?|almonds?|cashews?|walnuts?|pecans?|"
+    r"hazelnuts?|macadamias?|pistachios?|brazil nuts?|peanuts?|wheat|soy|soybeans?|sesame"
+)
+
+# Hazards like heavy metals, foreign objects and undeclared allergens that can be Class I, II or III
+AMBIGUOUS_PATTERNS = [
+    r"\blead\b|cadmium|arsenic|copper|metal|chemical",
+    r"foreign|plastic|glass|stone|wood|rubber|choking",
+    r"cancel|false positive",
+    # A major allergen that is what's undeclared or contained, like "undeclared milk",
+    # "contains undeclared peanuts" or "undeclared allergen (wheat)"
+    rf"\b(?:undeclared|contains?|containing)\s+(?:undeclared\s+)?(?:allergens?\s*:?\s*\(?\s*)?(?:{MAJOR_ALLERGENS})\b",
+]
+
+## OBJECTS ##
+class_i_regex = re.compile("|".join(f"(?:{pattern})" for pattern in CLASS_I_PATTERNS), re.IGNORECASE)
+ambiguous_regex = re.compile("|".join(f"(?:{pattern})" for pattern in AMBIGUOUS_PATTERNS), re.IGNORECASE)
+
+## CUSTOM FUNCTIONS ##
+# Returns "Class I" when the recall reason clearly implies it and None when OpenAI should decide
+def preclassify_recall(recall_reason):
+    recall_reason = join_text_value(recall_reason)
+    if not recall_reason:
+        return None
+    if ambiguous_regex.search(recall_reason):
+        return None
+    if class_i_regex.search(recall_reason):
+        return "Class I"
+    return None
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+from datetime import datetime, timezone
+
+from food_safety_recalls.store import CLEAN_DATA_DIR, RECALL_LOG_PATH
+from food_safety_recalls.state_codes import states_to_mask, mask_to_states
+
+# Static, sharded index of the recalls so a client on GitHub Pages can answer common queries by
+# fetching a few small files instead of the whole dataset:
+#   month/<YYYY-MM>.json    every recall first published that month, in full
+#   state/<XX>.json         references to the recalls impacting a state
+#   agency/<AGENCY>.json    references to an agency's recalls
+#   tokens/<character>.json words from company names, brand names and titles, by first character,
+#                           each with references to the recalls that use it
+# A reference has the recall's uid, notification_dttm, title and month, and the full recall is in
+# that month's shard. Shards list recalls newest first and `manifest.json` lists every shard.
+#
+# Updates are incremental. Each shard keeps the byte offset of the recall log it covers, so only
+# the shards that new recalls touch are rewritten, and a recall is never added to a shard twice
+# even if an update is interrupted and run again.
+
+## CONSTANTS ##
+QUERY_INDEX_DIR = os.path.join(CLEAN_DATA_DIR, "index")
+TOKEN_FIELDS = ["company_name", "brand_name", "title"]
+TOKEN_STOP_WORDS = {
+    "and", "the", "of", "in", "on", "for", "to", "due", "with", "by", "a", "an", "or", "from",
+    "inc", "llc", "co", "corp", "company", "recalls", "recall", "issues", "possible", "potential",
+    "products", "product", "because"
+}
+
+## CUSTOM FUNCTIONS ##
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if len(token) > 1 and token not in TOKEN_STOP_WORDS]
+
+def recall_tokens(recall):
+    tokens = []
+    for field in TOKEN_FIELDS:
+        values = recall.get(field)
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        for value in values:
+            tokens.extend(tokenize(value))
+    return list(dict.fromkeys(tokens))
+
+def recall_month(recall):
+    return datetime.fromisoformat(recall["notification_dttm"]).astimezone(timezone.utc).strftime("%Y-%m")
+
+def recall_reference(recall):
+    return {
+        "uid": recall["uid"],
+        "notification_dttm": recall["notification_dttm"],
+        "title": recall["title"],
+        "month": recall_month(recall)
+    }
+
+# The shards a recall is added to and what's added to each
+def recall_shard_entries(recall):
+    reference = recall_reference(recall)
+    shard_entries = [(("month", reference["month"]), recall)]
+    shard_entries.extend((("state", state), reference) for state in mask_to_states(states_to_mask(recall.get("impacted_states") or [])))
+    shard_entries.append((("agency", recall["agency"]), reference))
+    for token in recall_tokens(recall):
+        token_reference = {"uid": reference["uid"], "month": reference["month"]}
+        shard_entries.append((("tokens", token[0]), (token, token_reference)))
+    return shard_entries
+
+def shard_path(index_dir, shard_key):
+    shard_kind, shard_name = shard_key
+    return os.path.join(index_dir, shard_kind, f"{shard_name}.json")
+
+def load_shard(index_dir, shard_key):
+    file_path = shard_path(index_dir, shard_key)
+    if os.path.exists(file_path):
+        with open(file_path, "r") as f:
+            return json.load(f)
+    if shard_key[0] == "tokens":
+        return {"log_offset": 0, "tokens": {}}
+    return {"log_offset": 0, "recalls": []}
+
+def write_shard(index_dir, shard_key, shard):
+    file_path = shard_path(index_dir, shard_key)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_file_path = f"{file_path}.tmp"
+    with open(tmp_file_path, "w") as f:
+        json.dump(shard, f, separators=(",", ":"))
+    os.replace(tmp_file_path, file_path)
+
+def write_index_manifest(index_dir, log_offset):
+    manifest = {"log_offset": log_offset, "shards": {}}
+    for shard_kind in ["month", "state", "agency", "tokens"]:
+        shard_folder = os.path.join(index_dir, shard_kind)
+        if os.path.isdir(shard_folder):
+            manifest["shards"][shard_kind] = sorted(
+                file_name[:-len(".json")] for file_name in os.listdir(shard_folder) if file_name.endswith(".json")
+            )
+    with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4, separators=(",", ": "))
+
+# Adds the recalls appended to the log since the last update to the index, rewriting only the
+# shards they belong in. With no manifest yet, the whole log is indexed. Returns how many recalls were added.
+def update_query_index(log_path=RECALL_LOG_PATH, index_dir=QUERY_INDEX_DIR):
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    log_offset = 0
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            log_offset = json.load(f)["log_offset"]
+
+    if os.path.getsize(log_path) == log_offset:
+        print("No new recalls in the log, leaving the query index as is.")
+        return 0
+
+    # Entries for each shard with the log offset of the end of the recall they came from
+    new_shard_entries = {}
+    added_count = 0
+    with open(log_path, "rb") as f:
+        f.seek(log_offset)
+        for line in iter(f.readline, b""):
+            if not line.strip():
+                continue
+            line_end_offset = f.tell()
+            recall = json.loads(line)
+            for shard_key, entry in recall_shard_entries(recall):
+                new_shard_entries.setdefault(shard_key, []).append((line_end_offset, entry))
+            added_count += 1
+        log_offset = f.tell()
+
+    rewritten_count = 0
+    for shard_key, entries in new_shard_entries.items():
+        shard = load_shard(index_dir, shard_key)
+        # Skipping anything this shard already has from an earlier, interrupted update
+        entries = [(line_end_offset, entry) for line_end_offset, entry in entries if line_end_offset > shard["log_offset"]]
+        if not entries:
+            continue
+        if shard_key[0] == "tokens":
+            for _, (token, token_reference) in entries:
+                shard["tokens"].setdefault(token, []).insert(0, token_reference)
+            shard["tokens"] = dict(sorted(shard["tokens"].items()))
+        else:
+            shard["recalls"] = [entry for _, entry in reversed(entries)] + shard["recalls"]
+        shard["log_offset"] = entries[-1][0]
+        write_shard(index_dir, shard_key, shard)
+        rewritten_count += 1
+
+    write_index_manifest(index_dir, log_offset)
+    print(f"Added {added_count} recalls to the query index in {index_dir}, rewrote {rewritten_count} shards")
+    return added_count
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import runpy
+import hashlib
+
+from food_safety_recalls import metrics
+from food_safety_recalls.store import REPO_DIR, RECALL_LOG_PATH
+
+# Runs the extract, transform and load scripts for an agency one after another in this process,
+# instead of as separate workflows that each set up Python and import everything again. The
+# scripts still write and read the same files in `raw_data`, `transformed_staged_data` and
+# `clean_data`, so the workflows and the published data work the same either way.
+#
+# A stage with inputs is skipped when the hash of its input files is the same as the last time it
+# finished, so an hourly run where the feeds haven't changed only runs the extract scripts.
+# Extract stages always run, their input is the agency's website. A script that leaves recalls for
+# the next run, like FDA pages that couldn't be fetched or recalls OpenAI couldn't classify, sets
+# `pending_recall_count` in its globals. Its input hash isn't saved while that's above zero, so it
+# keeps running until they're all done even if its input files don't change.
+
+## CONSTANTS ##
+# Kept with the download validators so updating it doesn't trigger any workflow
+RUNNER_STATE_PATH = os.path.join(REPO_DIR, "raw_data", "validators", "pipeline_runner.json")
+# Stage name, script and the files it reads, relative to the repo root
+AGENCY_STAGES = {
+    "fda": [
+        ("extract_fda_rss", "extract/extract_fda_rss.py", []),
+        ("transform_fda_recall", "transform/transform_fda_recall.py", ["raw_data/fda_food_safety_recalls.xml"]),
+        ("load_fda_recalls", "load/load_fda_recalls.py", ["transformed_staged_data/fda_food_safety_recalls_staged.json"])
+    ],
+    "usda": [
+        ("extract_usda_rss", "extract/extract_usda_rss.py", []),
+        ("extract_usda_api", "extract/extract_usda_api.py", []),
+        ("transform_usda_recall", "transform/transform_usda_recall.py", [
+            "raw_data/usda_food_safety_recalls.json", "raw_data/usda_food_safety_recalls.xml"
+        ]),
+        ("load_usda_recalls", "load/load_usda_recalls.py", ["transformed_staged_data/usda_food_safety_recalls_staged.json"])
+    ]
+}
+# Rebuilds the published JSON once after every agency has been loaded
+COMPACT_STAGE = ("compact_recalls", "load/compact_recalls.py", [os.path.relpath(RECALL_LOG_PATH, REPO_DIR)])
+
+## CUSTOM FUNCTIONS ##
+# Hash of the contents of the input files, a missing file hashes differently than an empty one
+def hash_stage_inputs(input_paths):
+    stage_hash = hashlib.sha256()
+    for input_path in input_paths:
+        stage_hash.update(input_path.encode("utf-8") + b"\0")
+        file_path = os.path.join(REPO_DIR, input_path)
+        if not os.path.exists(file_path):
+            stage_hash.update(b"missing\0")
+            continue
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                stage_hash.update(chunk)
+        stage_hash.update(b"\0")
+    return stage_hash.hexdigest()
+
+def load_runner_state(state_path=RUNNER_STATE_PATH):
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+def write_runner_state(runner_state, state_path=RUNNER_STATE_PATH):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_state_path = f"{state_path}.tmp"
+    with open(tmp_state_path, "w") as f:
+        json.dump(runner_state, f, indent=4, separators=(",", ": "), sort_keys=True)
+    os.replace(tmp_state_path, state_path)
+
+# Runs a stage's script as if it were run on its own. Returns (error message or None if it
+# finished, how many recalls it left for the next run).
+def run_stage_script(script_path):
+    saved_argv = sys.argv
+    sys.argv = [script_path]
+    try:
+        script_globals = runpy.run_path(os.path.join(REPO_DIR, script_path), run_name="__main__")
+    except SystemExit as e:
+        # The scripts call sys.exit with a message when a download fails
+        if e.code not in (None, 0):
+            return str(e.code), 0
+        return None, 0
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", 0
+    finally:
+        sys.argv = saved_argv
+        # Writing the stage's metrics now instead of when the whole pipeline exits
+        metrics.finish_run()
+    return None, script_globals.get("pending_recall_count", 0)
+
+# Runs the stages in order and stops at the first one that fails. Returns a list of
+# (stage name, status, seconds) with status "ran", "skipped" or "failed".
+def run_stages(stages, force=False, state_path=RUNNER_STATE_PATH):
+    runner_state = load_runner_state(state_path)
+    stage_timings = []
+
+    for stage_name, script_path, input_paths in stages:
+        start = time.perf_counter()
+        input_hash = hash_stage_inputs(input_paths) if input_paths else None
+        if input_hash is not None and not force and runner_state.get(stage_name) == input_hash:
+            print(f"Inputs of {stage_name} haven't changed since it last ran, skipping it")
+            stage_timings.append((stage_name, "skipped", time.perf_counter() - start))
+            continue
+
+        print(f"Running {stage_name}")
+        stage_error, pending_recall_count = run_stage_script(script_path)
+        if stage_error is not None:
+            print(f"{stage_name} failed: {stage_error}")
+            stage_timings.append((stage_name, "failed", time.perf_counter() - start))
+            break
+
+        if input_hash is not None and pending_recall_count:
+            print(f"{stage_name} left {pending_recall_count} recalls for the next run, it will run again even if its inputs don't change")
+            runner_state.pop(stage_name, None)
+            write_runner_state(runner_state, state_path)
+        elif input_hash is not None:
+            runner_state[stage_name] = input_hash
+            write_runner_state(runner_state, state_path)
+        stage_timings.append((stage_name, "ran", time.perf_counter() - start))
+
+    return stage_timings
+
+def print_stage_timings(stage_timings, total_secs):
+    name_width = max([len("stage")] + [len(stage_name) for stage_name, _, _ in stage_timings])
+    print(f"\n{'stage':<{name_width}}  {'status':<7}  seconds")
+    for stage_name, status, secs in stage_timings:
+        print(f"{stage_name:<{name_width}}  {status:<7}  {secs:7.2f}")
+    print(f"{'total':<{name_width}}  {'':<7}  {total_secs:7.2f}")
+
+# Runs every stage for `agency` ("fda", "usda" or "all") and then compacts the recall log. A failed
+# stage stops the rest of its agency's stages but not the other agency's. Returns whether every stage that ran finished.
+def run_pipeline(agency="all", force=False, skip_extract=False):
+    agencies = list(AGENCY_STAGES) if agency == "all" else [agency]
+
+    start = time.perf_counter()
+    stage_timings = []
+    for agency_name in agencies:
+        stages = AGENCY_STAGES[agency_name]
+        if skip_extract:
+            stages = [stage for stage in stages if not stage[1].startswith("extract/")]
+        stage_timings.extend(run_stages(stages, force=force))
+    stage_timings.extend(run_stages([COMPACT_STAGE], force=force))
+    print_stage_timings(stage_timings, time.perf_counter() - start)
+    return all(status != "failed" for _, status, _ in stage_timings)
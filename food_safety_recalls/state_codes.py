@@ -0,0 +1,107 @@
+# US state, territory and freely associated state postal codes with the names they're matched on.
+# Each code has a fixed bit so a recall's impacted states fit in one 64-bit integer mask: states
+# are combined with `|`, and a recall impacts any of a set of states if `mask & wanted_mask` is
+# nonzero. Masks are only used internally, `impacted_states` is still written out as a list of
+# postal codes in the order of STATES.
+
+## CONSTANTS ##
+# Never reorder or remove entries, a code's bit is its position in this list. New codes go at the end.
+STATES = [
+    ("AL", "Alabama"),
+    ("AK", "Alaska"),
+    ("AS", "American Samoa"),
+    ("AZ", "Arizona"),
+    ("AR", "Arkansas"),
+    ("CA", "California"),
+    ("CO", "Colorado"),
+    ("CT", "Connecticut"),
+    ("DE", "Delaware"),
+    ("DC", "District of Columbia"),
+    ("FM", "Federated States of Micronesia"),
+    ("FL", "Florida"),
+    ("GA", "Georgia"),
+    ("GU", "Guam"),
+    ("HI", "Hawaii"),
+    ("ID", "Idaho"),
+    ("IL", "Illinois"),
+    ("IN", "Indiana"),
+    ("IA", "Iowa"),
+    ("KS", "Kansas"),
+    ("KY", "Kentucky"),
+    ("LA", "Louisiana"),
+    ("ME", "Maine"),
+    ("MH", "Marshall Islands"),
+    ("MD", "Maryland"),
+    ("MA", "Massachusetts"),
+    ("MI", "Michigan"),
+    ("MN", "Minnesota"),
+    ("MS", "Mississippi"),
+    ("MO", "Missouri"),
+    ("MT", "Montana"),
+    ("US", "nationwide"),
+    ("NE", "Nebraska"),
+    ("NV", "Nevada"),
+    ("NH", "New Hampshire"),
+    ("NJ", "New Jersey"),
+    ("NM", "New Mexico"),
+    ("NY", "New York"),
+    ("NC", "North Carolina"),
+    ("ND", "North Dakota"),
+    ("MP", "Northern Mariana Islands"),
+    ("OH", "Ohio"),
+    ("OK", "Oklahoma"),
+    ("OR", "Oregon"),
+    ("PW", "Palau"),
+    ("PA", "Pennsylvania"),
+    ("PR", "Puerto Rico"),
+    ("RI", "Rhode Island"),
+    ("SC", "South Carolina"),
+    ("SD", "South Dakota"),
+    ("TN", "Tennessee"),
+    ("TX", "Texas"),
+    ("UT", "Utah"),
+    ("VT", "Vermont"),
+    ("VI", "Virgin Islands"),
+    ("VA", "Virginia"),
+    ("WA", "Washington"),
+    ("WV", "West Virginia"),
+    ("WI", "Wisconsin"),
+    ("WY", "Wyoming")
+]
+STATE_CODES = [code for code, _ in STATES]
+STATE_NAMES = [name for _, name in STATES]
+STATE_BITS = {code: 1 << i for i, code in enumerate(STATE_CODES)}
+# Names are looked up case-insensitively so "Nationwide" and "nationwide" are the same
+STATE_CODES_BY_NAME = {name.casefold(): code for code, name in STATES}
+
+## CUSTOM FUNCTIONS ##
+# Postal code for a state name or postal code, or None if it isn't one
+def lookup_state_code(name_or_code):
+    name_or_code = name_or_code.strip()
+    if name_or_code in STATE_BITS:
+        return name_or_code
+    return STATE_CODES_BY_NAME.get(name_or_code.casefold())
+
+def states_to_mask(state_codes):
+    mask = 0
+    for code in state_codes:
+        mask |= STATE_BITS[code]
+    return mask
+
+# Names that aren't a state are skipped
+def state_names_to_mask(state_names):
+    mask = 0
+    for name in state_names:
+        code = STATE_CODES_BY_NAME.get(name.strip().casefold())
+        if code is not None:
+            mask |= STATE_BITS[code]
+    return mask
+
+# The postal codes in a mask as a list, in the order of STATES
+def mask_to_states(mask):
+    state_codes = []
+    while mask:
+        low_bit = mask & -mask
+        state_codes.append(STATE_CODES[low_bit.bit_length() - 1])
+        mask ^= low_bit
+    return state_codes
@@ -0,0 +1,50 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+from food_safety_recalls.state_codes import STATE_CODES, STATE_NAMES, state_names_to_mask, mask_to_states
+
+# Finds the states an FDA recall page mentions in its body paragraphs. The state abbreviations and
+# names are compiled into two alternation regexes once, so every page's paragraphs are searched in
+# one pass instead of one re.search per state, per string, per <p> tag.
+
+## CUSTOM FUNCTIONS ##
+def compile_state_matcher():
+    abb_alternation = "|".join(re.escape(state) for state in STATE_CODES)
+    name_alternation = "|".join(re.escape(state) for state in STATE_NAMES)
+    state_matcher = {
+        # Abbreviations need a non-word character on both sides. The lookarounds don't
+        # consume those characters so back to back abbreviations like "AL, AK" both match
+        "abb_pattern": re.compile(f"(?<=\\W)(?:{abb_alternation})(?=\\W)"),
+        # Names are matched anywhere in the text. The zero-width lookahead lets overlapping
+        # names like "West Virginia" and "Virginia" both match
+        "name_pattern": re.compile(f"(?=({name_alternation}))"),
+        "abb_order": {state: i for i, state in enumerate(STATE_CODES)}
+    }
+    return state_matcher
+
+# Returns the postal codes of the states in the <p> tags' strings: abbreviations first, in the
+# order they're found, and then the states found by name in the order of STATES, without duplicates
+def find_impacted_states(state_matcher, paragraph_list):
+    string_list = [string for paragraph in paragraph_list for string in paragraph.strings]
+    # Joining on "_" (a word character in no state name) keeps a match from spanning two strings
+    # so the results are the same as searching each string of each <p> tag separately
+    joined_strings = "_".join(string_list)
+    string_starts = list(accumulate((len(string) + 1 for string in string_list[:-1]), initial=0))
+
+    # Abbreviations are ordered by the string they were first found in and then by their
+    # place in the states list, names are ordered by their bit in the state mask
+    abb_match_order = {}
+    for abb_match in state_matcher["abb_pattern"].finditer(joined_strings):
+        state = abb_match.group()
+        match_order = (bisect_right(string_starts, abb_match.start()) - 1, state_matcher["abb_order"][state])
+        if state not in abb_match_order or match_order < abb_match_order[state]:
+            abb_match_order[state] = match_order
+
+    name_mask = state_names_to_mask(name_match.group(1) for name_match in state_matcher["name_pattern"].finditer(joined_strings))
+
+    state_abb_matches = sorted(abb_match_order, key=abb_match_order.get)
+    state_abb_matches.extend(mask_to_states(name_mask))
+
+    final_state_abbs = list(dict.fromkeys(state_abb_matches))
+    return final_state_abbs
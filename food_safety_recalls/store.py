@@ -0,0 +1,74 @@
+import os
+import json
+
+from food_safety_recalls.helpers import DateTimeEncoder
+
+# The loaders append new recalls to a line-delimited log instead of rewriting the whole
+# published JSON array every run. The log is oldest first, so the published array
+# (newest first) is the log read backwards. `compact_recall_log` rebuilds the array
+# only when the log has grown since the last time it was compacted.
+
+## CONSTANTS ##
+REPO_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+CLEAN_DATA_DIR = os.path.join(REPO_DIR, "clean_data")
+RECALL_JSON_PATH = os.path.join(CLEAN_DATA_DIR, "food_safety_recalls.json")
+RECALL_LOG_PATH = os.path.join(CLEAN_DATA_DIR, "food_safety_recalls.ndjson")
+COMPACTION_STATE_PATH = os.path.join(CLEAN_DATA_DIR, "food_safety_recalls_compaction.json")
+
+## CUSTOM FUNCTIONS ##
+# Creates the log from the published JSON the first time the loaders run with it
+def bootstrap_recall_log(json_path=RECALL_JSON_PATH, log_path=RECALL_LOG_PATH, state_path=COMPACTION_STATE_PATH):
+    if os.path.exists(log_path):
+        return
+
+    with open(json_path, "r") as f:
+        published_recalls = json.load(f)
+
+    print(f"Creating {log_path} from {len(published_recalls)} published recalls")
+    append_recalls(reversed(published_recalls), log_path)
+    write_compaction_state(os.path.getsize(log_path), state_path)
+
+def read_recall_log(log_path=RECALL_LOG_PATH):
+    recalls = []
+    with open(log_path, "r") as f:
+        for line in f:
+            if line.strip():
+                recalls.append(json.loads(line))
+    return recalls
+
+def append_recalls(recalls, log_path=RECALL_LOG_PATH):
+    # One compact JSON object per line, so a run only writes the recalls it adds
+    with open(log_path, "a") as f:
+        for recall in recalls:
+            f.write(json.dumps(recall, cls=DateTimeEncoder) + "\n")
+
+def read_compaction_state(state_path=COMPACTION_STATE_PATH):
+    if not os.path.exists(state_path):
+        return {"log_size": None}
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+def write_compaction_state(log_size, state_path=COMPACTION_STATE_PATH):
+    with open(state_path, "w") as f:
+        json.dump({"log_size": log_size}, f, indent=4, separators=(",", ": "))
+
+# Writes the published JSON array from the log, returns whether anything was written.
+# The log is append-only, so its size only changes when recalls have been added to it.
+def compact_recall_log(log_path=RECALL_LOG_PATH, json_path=RECALL_JSON_PATH, state_path=COMPACTION_STATE_PATH):
+    log_size = os.path.getsize(log_path)
+    if read_compaction_state(state_path)["log_size"] == log_size:
+        print("No new recalls in the log, leaving the published JSON as is.")
+        return False
+
+    recalls = read_recall_log(log_path)
+    recalls.reverse()
+
+    # Writing to a temporary file first so a failed run never leaves a half-written JSON file
+    tmp_json_path = f"{json_path}.tmp"
+    with open(tmp_json_path, 'w') as f:
+        json.dump(recalls, f, indent=4, separators=(",", ": "), cls=DateTimeEncoder)
+    os.replace(tmp_json_path, json_path)
+
+    write_compaction_state(log_size, state_path)
+    print(f"Wrote {len(recalls)} recalls to {json_path}")
+    return True
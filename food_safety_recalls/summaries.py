@@ -0,0 +1,127 @@
+import os
+import re
+import csv
+import json
+from datetime import datetime, timezone
+
+from food_safety_recalls.store import CLEAN_DATA_DIR, RECALL_LOG_PATH
+from food_safety_recalls.state_codes import states_to_mask, mask_to_states
+from food_safety_recalls.helpers import join_text_value
+
+# Small pre-aggregated count tables for the dashboard, so browsers don't need the whole dataset
+# to chart recalls by month, agency, risk level, reason and state. Each table is written as JSON
+# and CSV in `clean_data/summaries`. The tables are updated incrementally: the state file keeps
+# the counts along with the byte offset of the recall log they cover, and each update only reads
+# and adds the recalls appended to the log after it.
+
+## CONSTANTS ##
+SUMMARIES_DIR = os.path.join(CLEAN_DATA_DIR, "summaries")
+SUMMARY_STATE_PATH = os.path.join(SUMMARIES_DIR, "summary_state.json")
+# Table name and the columns it counts recalls by
+SUMMARY_TABLES = {
+    "recalls_by_month_state": ["month", "state"],
+    "recalls_by_month_agency_risk_level": ["month", "agency", "risk_level"],
+    "recalls_by_month_reason_category": ["month", "agency", "reason_category"],
+    "class_mix_by_agency": ["agency", "recall_classification"]
+}
+# Checked in order, the first category whose pattern matches the recall reason is used
+REASON_CATEGORY_PATTERNS = [
+    ("Pathogen", r"listeria|monocytogen|salmonella|botulinum|botulism|e\. ?coli|escherichia|shiga|cereus|cronobacter|hepatitis|norovirus|cyclospora|vibrio|pathogen|foodborne"),
+    ("Allergen", r"allergen|undeclared|mislabel"),
+    ("Chemical or contaminant", r"\blead\b|cadmium|arsenic|copper|cesium|radionuclide|chemical|toxic|contaminant"),
+    ("Foreign material", r"foreign|plastic|glass|metal|stone|wood|rubber|bone"),
+    ("Process or inspection", r"inspection|processing|temperature|insanitary|import|uneviscerated|misbranding")
+]
+
+## OBJECTS ##
+reason_category_regexes = [(category, re.compile(pattern, re.IGNORECASE)) for category, pattern in REASON_CATEGORY_PATTERNS]
+
+## CUSTOM FUNCTIONS ##
+def categorize_recall_reason(recall_reason):
+    recall_reason = join_text_value(recall_reason)
+    if not recall_reason:
+        return "Unknown"
+    for category, regex in reason_category_regexes:
+        if regex.search(recall_reason):
+            return category
+    return "Other"
+
+# The rows a recall adds to each table. A recall counts once for each state it impacts.
+def summary_keys(recall):
+    month = datetime.fromisoformat(recall["notification_dttm"]).astimezone(timezone.utc).strftime("%Y-%m")
+    agency = recall["agency"]
+    return {
+        "recalls_by_month_state": [(month, state) for state in mask_to_states(states_to_mask(recall.get("impacted_states") or []))],
+        "recalls_by_month_agency_risk_level": [(month, agency, recall.get("risk_level") or "Unknown")],
+        "recalls_by_month_reason_category": [(month, agency, categorize_recall_reason(recall.get("recall_reason")))],
+        "class_mix_by_agency": [(agency, recall.get("recall_classification") or "Unclassified")]
+    }
+
+def load_summary_state(state_path):
+    if not os.path.exists(state_path):
+        return 0, {table_name: {} for table_name in SUMMARY_TABLES}
+    with open(state_path, "r") as f:
+        summary_state = json.load(f)
+    summary_tables = {
+        table_name: {tuple(row[:-1]): row[-1] for row in summary_state["tables"].get(table_name, [])}
+        for table_name in SUMMARY_TABLES
+    }
+    return summary_state["log_offset"], summary_tables
+
+# The counts and the log offset they cover are saved together in one replace so they can't disagree
+def write_summary_state(log_offset, summary_tables, state_path):
+    summary_state = {
+        "log_offset": log_offset,
+        "tables": {
+            table_name: [list(key) + [count] for key, count in sorted(table_counts.items())]
+            for table_name, table_counts in summary_tables.items()
+        }
+    }
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_state_path = f"{state_path}.tmp"
+    with open(tmp_state_path, "w") as f:
+        json.dump(summary_state, f, separators=(",", ":"))
+    os.replace(tmp_state_path, state_path)
+
+def write_summary_tables(summary_tables, summaries_dir):
+    os.makedirs(summaries_dir, exist_ok=True)
+    for table_name, key_columns in SUMMARY_TABLES.items():
+        rows = [
+            {**dict(zip(key_columns, key)), "recall_count": count}
+            for key, count in sorted(summary_tables[table_name].items())
+        ]
+        with open(os.path.join(summaries_dir, f"{table_name}.json"), "w") as f:
+            json.dump(rows, f, indent=4, separators=(",", ": "))
+        with open(os.path.join(summaries_dir, f"{table_name}.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=key_columns + ["recall_count"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+# Adds the recalls appended to the log since the last update to the summary tables.
+# With no state file yet, the whole log is counted. Returns how many recalls were added.
+def update_recall_summaries(log_path=RECALL_LOG_PATH, summaries_dir=SUMMARIES_DIR):
+    state_path = os.path.join(summaries_dir, os.path.basename(SUMMARY_STATE_PATH))
+    log_offset, summary_tables = load_summary_state(state_path)
+
+    if os.path.getsize(log_path) == log_offset:
+        print("No new recalls in the log, leaving the summary tables as is.")
+        return 0
+
+    added_count = 0
+    with open(log_path, "rb") as f:
+        f.seek(log_offset)
+        for line in f:
+            if not line.strip():
+                continue
+            recall = json.loads(line)
+            for table_name, keys in summary_keys(recall).items():
+                for key in keys:
+                    summary_tables[table_name][key] = summary_tables[table_name].get(key, 0) + 1
+            added_count += 1
+        log_offset = f.tell()
+
+    write_summary_state(log_offset, summary_tables, state_path)
+    write_summary_tables(summary_tables, summaries_dir)
+
+    print(f"Added {added_count} recalls to the summary tables in {summaries_dir}")
+    return added_count
@@ -0,0 +1,11 @@
+import uuid
+
+# Namespace for the recall uids. Never change this, every uid in the clean data is derived from it.
+RECALL_UID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://github.com/anesta95/food_safety_recalls")
+
+## CUSTOM FUNCTIONS ##
+# Derives a recall's uid from the fields that identify it instead of minting a random one,
+# so transforming the same input twice gives byte-identical staged output
+def make_recall_uid(agency, *key_parts):
+    uid_name = "|".join([agency] + ["" if part is None else str(part) for part in key_parts])
+    return str(uuid.uuid5(RECALL_UID_NAMESPACE, uid_name))
@@ -0,0 +1,42 @@
+import os
+import json
+import hashlib
+
+from food_safety_recalls.store import REPO_DIR
+
+# Hashes of the raw USDA API records already transformed, so the transform only stages records
+# that are new or have been edited. The transform writes the fingerprints of what it staged to a
+# pending file and the loader only makes them the seen fingerprints once it has loaded the staging
+# file. Until then the transform keeps staging the same records again, so running it twice before
+# the loader doesn't replace a delta that hasn't been loaded yet with an empty one.
+# Both files are kept in a subfolder so writing them doesn't trigger the load workflow.
+
+## CONSTANTS ##
+FINGERPRINTS_DIR = os.path.join(REPO_DIR, "transformed_staged_data", "fingerprints")
+SEEN_FINGERPRINTS_PATH = os.path.join(FINGERPRINTS_DIR, "usda_food_safety_recalls.json")
+PENDING_FINGERPRINTS_PATH = os.path.join(FINGERPRINTS_DIR, "usda_food_safety_recalls_pending.json")
+
+## CUSTOM FUNCTIONS ##
+# Hash of the raw API record so a record that's been edited since the last run gets staged again
+def fingerprint_usda_node(dict):
+    raw_node_str = json.dumps(dict, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw_node_str.encode("utf-8")).hexdigest()
+
+# The fingerprints of every record loaded so far, or None before the first load
+def load_usda_fingerprints(fingerprints_path=SEEN_FINGERPRINTS_PATH):
+    if not os.path.exists(fingerprints_path):
+        return None
+    with open(fingerprints_path, "r") as f:
+        return set(json.load(f))
+
+def write_usda_fingerprints(fingerprints, fingerprints_path=SEEN_FINGERPRINTS_PATH):
+    os.makedirs(os.path.dirname(fingerprints_path), exist_ok=True)
+    tmp_fingerprints_path = f"{fingerprints_path}.tmp"
+    with open(tmp_fingerprints_path, "w") as f:
+        json.dump(sorted(fingerprints), f, indent=4, separators=(",", ": "))
+    os.replace(tmp_fingerprints_path, fingerprints_path)
+
+# Called by the loader once the staging file is loaded, the pending fingerprints become the seen ones
+def commit_pending_usda_fingerprints(pending_path=PENDING_FINGERPRINTS_PATH, seen_path=SEEN_FINGERPRINTS_PATH):
+    if os.path.exists(pending_path):
+        os.replace(pending_path, seen_path)
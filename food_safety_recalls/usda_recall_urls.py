@@ -0,0 +1,237 @@
+import os
+import re
+import html
+import json
+import xml.etree.ElementTree as ET
+from datetime import date, timedelta
+from email.utils import parsedate_to_datetime
+
+from food_safety_recalls.store import REPO_DIR
+
+## CONSTANTS ##
+# Kept in a subfolder of `raw_data` so updating it doesn't trigger the transform workflow
+USDA_RECALL_URL_INDEX_PATH = os.path.join(REPO_DIR, "raw_data", "url_index", "usda_recall_urls.json")
+# How many days apart an API recall date and an RSS publication date can be and still be fuzzy matched
+FUZZY_MATCH_DAYS = 3
+# Share of title words two titles need in common to be fuzzy matched
+FUZZY_MATCH_THRESHOLD = 0.6
+# Words Drupal's pathauto drops when it builds the FSIS recall page slugs from a title
+SLUG_STOP_WORDS = {
+    "an", "as", "at", "before", "but", "by", "for", "from", "is", "in", "into", "like",
+    "of", "off", "on", "onto", "per", "since", "than", "the", "this", "that", "to", "up", "via", "with"
+}
+# Words in nearly every recall title, which would put every recall in the same fuzzy match block
+FUZZY_STOP_WORDS = SLUG_STOP_WORDS | {
+    "a", "and", "or", "recall", "recalls", "recalling", "product", "products", "due", "possible", "alert", "issues",
+    "public", "health", "inc", "llc", "co", "company"
+}
+
+## CUSTOM FUNCTIONS ##
+def normalize_title(title_str):
+    normalized_title = re.sub(r"[^a-z0-9]+", " ", html.unescape(title_str).lower())
+    return normalized_title.strip()
+
+def slugify_title(title_str):
+    words = re.split(r"[\s\-]+", html.unescape(title_str).lower())
+    words = [re.sub(r"[^a-z0-9\-]", "", word.replace(".", "-")) for word in words if word not in SLUG_STOP_WORDS]
+    return "-".join(word for word in words if word)
+
+# FSIS truncates the slug and adds a -0, -1 suffix to duplicate ones, so a URL is looked up by both
+def url_slugs(url):
+    url_slug = url.rstrip("/").rsplit("/", 1)[-1]
+    return {url_slug, re.sub(r"-\d+$", "", url_slug)}
+
+def title_tokens(title_str):
+    return frozenset(word for word in normalize_title(title_str).split() if word not in FUZZY_STOP_WORDS)
+
+# RSS pubDate like "Tue, 04 Nov 2025 12:00:00 +0000" to "2025-11-04", or None if it's missing or can't be parsed
+def parse_pub_date(pub_date_str):
+    if not pub_date_str:
+        return None
+    try:
+        return parsedate_to_datetime(pub_date_str.strip()).date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+## CUSTOM CLASSES ##
+class UsdaRecallUrlIndex:
+    """
+    Every FSIS recall page URL seen in the RSS feed, with its title and publication date,
+    plus the notice ids of API records already matched to a URL. The feed only ever has the
+    latest ~50 recalls, so the extractor adds each snapshot to this file and the transform
+    can find URLs for recalls that have long since dropped out of the feed.
+
+    Lookups are by exact title, normalized title, notice id and URL slug in constant time.
+    Failing those, titles are fuzzy matched only against recalls published within
+    FUZZY_MATCH_DAYS that share a title word with them, never against the whole index.
+    FSIS reuses titles and slugs across years, so every lookup keeps all the URLs with a title
+    or slug and only accepts one published within FUZZY_MATCH_DAYS of the recall date.
+    """
+    def __init__(self, index_path=USDA_RECALL_URL_INDEX_PATH):
+        self.index_path = index_path
+        # {url: {"title": ..., "date": "YYYY-MM-DD" or None}}
+        self.recalls = {}
+        # {notice id: url}
+        self.notice_ids = {}
+        self.changed = False
+        # {title, normalized title or slug: set of urls}
+        self.by_title = {}
+        self.by_normalized_title = {}
+        self.by_slug = {}
+        # {(date, title word): set of urls}
+        self.fuzzy_blocks = {}
+        self.url_tokens = {}
+
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                saved_index = json.load(f)
+            for url, recall in saved_index["recalls"].items():
+                self.add_recall(url, recall["title"], recall["date"])
+            self.notice_ids = saved_index["notice_ids"]
+            self.changed = False
+
+    def __len__(self):
+        return len(self.recalls)
+
+    def add_recall(self, url, title, recall_date=None):
+        url = url.strip()
+        title = title.strip()
+        existing_recall = self.recalls.get(url)
+        if existing_recall is not None and existing_recall["title"] == title and (recall_date is None or existing_recall["date"] == recall_date):
+            return False
+        if existing_recall is not None and recall_date is None:
+            recall_date = existing_recall["date"]
+
+        if existing_recall is not None:
+            self.remove_recall(url)
+        self.recalls[url] = {"title": title, "date": recall_date}
+        self.changed = True
+
+        self.by_title.setdefault(title, set()).add(url)
+        self.by_normalized_title.setdefault(normalize_title(title), set()).add(url)
+        for url_slug in url_slugs(url):
+            self.by_slug.setdefault(url_slug, set()).add(url)
+
+        tokens = title_tokens(title)
+        self.url_tokens[url] = tokens
+        if recall_date is not None:
+            for token in tokens:
+                self.fuzzy_blocks.setdefault((recall_date, token), set()).add(url)
+        return True
+
+    # Drops a URL from the lookups before it's added again with another title or date
+    def remove_recall(self, url):
+        recall = self.recalls.pop(url)
+        self.by_title[recall["title"]].discard(url)
+        self.by_normalized_title[normalize_title(recall["title"])].discard(url)
+        for url_slug in url_slugs(url):
+            self.by_slug[url_slug].discard(url)
+        tokens = self.url_tokens.pop(url)
+        if recall["date"] is not None:
+            for token in tokens:
+                self.fuzzy_blocks[(recall["date"], token)].discard(url)
+
+    def add_notice_id(self, notice_id, url):
+        if notice_id and self.notice_ids.get(notice_id) != url:
+            self.notice_ids[notice_id] = url
+            self.changed = True
+
+    # Adds the items of an RSS XML snapshot, returns how many weren't in the index yet
+    def add_rss_snapshot(self, rss_xml):
+        root = ET.fromstring(rss_xml)
+        new_count = 0
+        for item in root.iterfind(".//item"):
+            title_element = item.find("title")
+            guid_element = item.find("guid")
+            if title_element is None or guid_element is None or not title_element.text or not guid_element.text:
+                continue
+            url = guid_element.text.strip()
+            is_new = url not in self.recalls
+            self.add_recall(url, title_element.text, parse_pub_date(item.findtext("pubDate")))
+            new_count += is_new
+        return new_count
+
+    # Adds the URLs, titles, dates and notice ids of already transformed recalls, like the clean data
+    def add_transformed_recalls(self, recalls):
+        for recall in recalls:
+            if recall["agency"] != "USDA" or not recall.get("recall_url") or not recall.get("title"):
+                continue
+            self.add_recall(recall["recall_url"], recall["title"], recall["notification_dttm"][:10])
+            self.add_notice_id(recall.get("notice_id_number"), recall["recall_url"])
+
+    def find_fuzzy(self, title_str, recall_date):
+        tokens = title_tokens(title_str)
+        if not tokens:
+            return None
+        center_date = date.fromisoformat(recall_date)
+        candidate_urls = set()
+        for day_offset in range(-FUZZY_MATCH_DAYS, FUZZY_MATCH_DAYS + 1):
+            block_date = (center_date + timedelta(days=day_offset)).isoformat()
+            for token in tokens:
+                candidate_urls.update(self.fuzzy_blocks.get((block_date, token), ()))
+
+        best_url = None
+        best_score = FUZZY_MATCH_THRESHOLD
+        for url in sorted(candidate_urls):
+            candidate_tokens = self.url_tokens[url]
+            score = len(tokens & candidate_tokens) / len(tokens | candidate_tokens)
+            if score >= best_score:
+                best_url, best_score = url, score
+        return best_url
+
+    # The candidate URL published closest to `recall_date`, as long as it's within FUZZY_MATCH_DAYS.
+    # Undated candidates, or any candidate when there's no recall date, are only taken if there's one.
+    def pick_by_date(self, candidate_urls, recall_date):
+        if not candidate_urls:
+            return None
+        if recall_date is None:
+            return next(iter(candidate_urls)) if len(candidate_urls) == 1 else None
+        center_date = date.fromisoformat(recall_date)
+        best_url = None
+        best_days = FUZZY_MATCH_DAYS + 1
+        for url in sorted(candidate_urls):
+            candidate_date = self.recalls[url]["date"]
+            if candidate_date is None:
+                days_apart = 0 if len(candidate_urls) == 1 else FUZZY_MATCH_DAYS + 1
+            else:
+                days_apart = abs((date.fromisoformat(candidate_date) - center_date).days)
+            if days_apart < best_days:
+                best_url, best_days = url, days_apart
+        return best_url
+
+    # `recall_date` is the API's "YYYY-MM-DD" recall date, without it titles aren't fuzzy matched
+    def find(self, title_str, notice_id=None, recall_date=None):
+        recall_url = self.pick_by_date(self.by_title.get(title_str), recall_date)
+
+        if not recall_url and notice_id and notice_id in self.notice_ids:
+            recall_url = self.pick_by_date({self.notice_ids[notice_id]}, recall_date)
+
+        if not recall_url and title_str:
+            recall_url = self.pick_by_date(self.by_normalized_title.get(normalize_title(title_str)), recall_date)
+
+        if not recall_url and title_str:
+            # The slug is a truncated version of the title so check the longest prefix first
+            title_slug_words = slugify_title(title_str).split("-")
+            for i in range(len(title_slug_words), 0, -1):
+                recall_url = self.pick_by_date(self.by_slug.get("-".join(title_slug_words[:i])), recall_date)
+                if recall_url:
+                    break
+
+        if not recall_url and title_str and recall_date:
+            recall_url = self.find_fuzzy(title_str, recall_date)
+
+        return recall_url
+
+    def save(self):
+        if not self.changed:
+            return
+        saved_index = {
+            "recalls": dict(sorted(self.recalls.items())),
+            "notice_ids": dict(sorted(self.notice_ids.items()))
+        }
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_index_path = f"{self.index_path}.tmp"
+        with open(tmp_index_path, "w") as f:
+            json.dump(saved_index, f, indent=4, separators=(",", ": "))
+        os.replace(tmp_index_path, self.index_path)
+        self.changed = False
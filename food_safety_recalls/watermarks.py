@@ -0,0 +1,96 @@
+import os
+import json
+from datetime import datetime
+
+from food_safety_recalls.store import CLEAN_DATA_DIR, RECALL_LOG_PATH, bootstrap_recall_log
+
+# Small sidecar of the clean data so the transforms and loaders don't read the whole history
+# on every run just to find out what's already in it. For each agency it keeps the latest
+# `notification_dttm` (the high-water mark new recalls are checked against) and the recall URLs
+# and notice ids already published. Like the summary tables, it's updated from the recall log
+# incrementally: the file keeps the byte offset of the log it covers, and each update only reads
+# the recalls appended after it.
+
+## CONSTANTS ##
+WATERMARKS_PATH = os.path.join(CLEAN_DATA_DIR, "food_safety_recalls_watermarks.json")
+
+## CUSTOM FUNCTIONS ##
+def empty_agency_watermarks():
+    return {"latest_notification_dttm": None, "recall_urls": [], "notice_ids": []}
+
+# Adds the recalls in the log after `log_offset` to `watermarks`, returns the new offset and how many were added
+def add_log_recalls(watermarks, log_path, log_offset):
+    # Sets of the keys already listed so each recall is checked in constant time
+    known_keys = {
+        agency: (set(agency_watermarks["recall_urls"]), set(agency_watermarks["notice_ids"]))
+        for agency, agency_watermarks in watermarks.items()
+    }
+    added_count = 0
+    with open(log_path, "rb") as f:
+        f.seek(log_offset)
+        for line in f:
+            if not line.strip():
+                continue
+            recall = json.loads(line)
+            agency = recall["agency"]
+            if agency not in watermarks:
+                watermarks[agency] = empty_agency_watermarks()
+                known_keys[agency] = (set(), set())
+            agency_watermarks = watermarks[agency]
+            known_urls, known_notice_ids = known_keys[agency]
+
+            latest_dttm_str = agency_watermarks["latest_notification_dttm"]
+            if latest_dttm_str is None or datetime.fromisoformat(recall["notification_dttm"]) > datetime.fromisoformat(latest_dttm_str):
+                agency_watermarks["latest_notification_dttm"] = recall["notification_dttm"]
+            if "recall_url" in recall and recall["recall_url"] not in known_urls:
+                known_urls.add(recall["recall_url"])
+                agency_watermarks["recall_urls"].append(recall["recall_url"])
+            if "notice_id_number" in recall and recall["notice_id_number"] not in known_notice_ids:
+                known_notice_ids.add(recall["notice_id_number"])
+                agency_watermarks["notice_ids"].append(recall["notice_id_number"])
+            added_count += 1
+        log_offset = f.tell()
+    return log_offset, added_count
+
+def load_watermarks(watermarks_path):
+    if not os.path.exists(watermarks_path):
+        return 0, {}
+    with open(watermarks_path, "r") as f:
+        saved_watermarks = json.load(f)
+    return saved_watermarks["log_offset"], saved_watermarks["agencies"]
+
+# The watermarks and the log offset they cover are saved together in one replace so they can't disagree
+def write_watermarks(log_offset, watermarks, watermarks_path):
+    tmp_watermarks_path = f"{watermarks_path}.tmp"
+    with open(tmp_watermarks_path, "w") as f:
+        json.dump({"log_offset": log_offset, "agencies": watermarks}, f, indent=4, separators=(",", ": "))
+    os.replace(tmp_watermarks_path, watermarks_path)
+
+# Returns {agency: {"latest_notification_dttm", "recall_urls", "notice_ids"}} for the whole log.
+# Recalls appended since the sidecar was last written are read from the log without rewriting it.
+def read_recall_watermarks(log_path=RECALL_LOG_PATH, watermarks_path=WATERMARKS_PATH):
+    bootstrap_recall_log(log_path=log_path)
+    log_offset, watermarks = load_watermarks(watermarks_path)
+    if os.path.getsize(log_path) != log_offset:
+        add_log_recalls(watermarks, log_path, log_offset)
+    return watermarks
+
+# Adds the recalls appended to the log since the last update to the sidecar. With no sidecar
+# yet, the whole log is read. Returns how many recalls were added.
+def update_recall_watermarks(log_path=RECALL_LOG_PATH, watermarks_path=WATERMARKS_PATH):
+    log_offset, watermarks = load_watermarks(watermarks_path)
+    if os.path.getsize(log_path) == log_offset:
+        print("No new recalls in the log, leaving the watermarks as is.")
+        return 0
+
+    log_offset, added_count = add_log_recalls(watermarks, log_path, log_offset)
+    write_watermarks(log_offset, watermarks, watermarks_path)
+    print(f"Added {added_count} recalls to the watermarks in {watermarks_path}")
+    return added_count
+
+# An agency's latest `notification_dttm` as a datetime, or the Unix epoch if it has no recalls yet
+def get_latest_notification_dttm(watermarks, agency):
+    latest_dttm_str = watermarks.get(agency, empty_agency_watermarks())["latest_notification_dttm"]
+    if latest_dttm_str is None:
+        return datetime.fromisoformat("1970-01-01T00:00:00+00:00")
+    return datetime.fromisoformat(latest_dttm_str)
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.store import RECALL_JSON_PATH, read_recall_log
+from food_safety_recalls.columnar import (
+    COLUMNS, read_columnar_export, write_columnar_export, columns_to_records, encode_timestamp
+)
+
+# Compares the size and load time of the published JSON with the columnar export, and checks
+# that reading the export back gives the same recalls as the log. The export is written to a
+# temporary folder so the published one in `clean_data/columnar` is left as it is.
+# Usage: python ./load/benchmark_columnar.py
+
+## CUSTOM FUNCTIONS ##
+def folder_size(folder_path):
+    return sum(
+        os.path.getsize(os.path.join(dir_path, file_name))
+        for dir_path, _, file_names in os.walk(folder_path) for file_name in file_names
+    )
+
+def time_it(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+def load_json():
+    with open(RECALL_JSON_PATH, "r") as f:
+        return json.load(f)
+
+## ACTUAL SCRIPT ##
+recalls = read_recall_log()
+
+with tempfile.TemporaryDirectory() as export_dir:
+    write_columnar_export(recalls, export_dir)
+
+    # Timestamps come back as integer seconds, so the log's ISO strings are encoded the same way to compare
+    expected_records = [
+        {
+            **{column: recall.get(column) for column in COLUMNS},
+            "notification_dttm": encode_timestamp(recall["notification_dttm"]),
+            "company_announce_dttm": encode_timestamp(recall["company_announce_dttm"])
+        }
+        for recall in recalls
+    ]
+    if columns_to_records(read_columnar_export(export_dir=export_dir)) != expected_records:
+        sys.exit("Reading the columnar export back didn't give the same recalls as the log")
+
+    latest_dttm = max(datetime.fromisoformat(recall["notification_dttm"]) for recall in recalls)
+    window_start = (latest_dttm - timedelta(days=90)).astimezone(timezone.utc)
+
+    _, json_secs = time_it(load_json)
+    _, all_columns_secs = time_it(lambda: read_columnar_export(export_dir=export_dir))
+    _, dashboard_columns_secs = time_it(lambda: read_columnar_export(["notification_dttm", "agency", "risk_level", "impacted_states"], export_dir=export_dir))
+    window_columns, window_secs = time_it(lambda: read_columnar_export(["notification_dttm", "agency", "impacted_states"], start=window_start, export_dir=export_dir))
+
+    print(f"{len(recalls)} recalls")
+    print(f"Published JSON: {os.path.getsize(RECALL_JSON_PATH) / 1e3:.1f} KB, loads in {json_secs * 1e3:.2f} ms")
+    print(f"Columnar export: {folder_size(export_dir) / 1e3:.1f} KB")
+    print(f"All columns: {all_columns_secs * 1e3:.2f} ms")
+    print(f"Date, agency, risk level and states: {dashboard_columns_secs * 1e3:.2f} ms")
+    print(f"Date, agency and states for the last 90 days ({len(window_columns['agency'])} recalls): {window_secs * 1e3:.2f} ms")
@@ -0,0 +1,80 @@
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Compares merging a staging file into clean data of 10k to 1M recalls the way the loaders used to,
+# a list of every published notice id with a linear `in` test and a `list.insert(0, ...)` for each new
+# recall, with a set of the notice ids and one batched prepend. The clean data and the staging file
+# are synthetic: the staging file has 2,000 USDA recalls, half of them already published. Both merges
+# have to give the same list, which is what was written out as the published JSON.
+# Usage: python ./load/benchmark_merge.py [clean data sizes, 10000,100000,1000000 by default]
+
+## CONSTANTS ##
+STAGED_COUNT = 2000
+CLEAN_START_DTTM = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+## CUSTOM FUNCTIONS ##
+# Notice ids are unique, the rest of the fields are shared between recalls to keep a million of them small
+def make_recall(i, notification_dttm_str):
+    return {
+        "title": "Synthetic recall",
+        "notification_dttm": notification_dttm_str,
+        "agency": "USDA",
+        "notice_id_number": f"{i:07d}-{2015 + i % 10}",
+        "recall_url": None
+    }
+
+def make_clean_recalls(clean_count):
+    dttm_strs = [(CLEAN_START_DTTM + timedelta(hours=hour)).isoformat() for hour in range(1000)]
+    # Newest first like the published JSON
+    return [make_recall(i, dttm_strs[(clean_count - i) * 1000 // clean_count - 1]) for i in range(clean_count)]
+
+def make_staged_recalls(clean_recalls):
+    latest_dttm_str = clean_recalls[0]["notification_dttm"]
+    new_dttm_str = (datetime.fromisoformat(latest_dttm_str) + timedelta(days=1)).isoformat()
+    # The first half were already published at the latest date, the second half are new
+    already_published = [dict(recall) for recall in clean_recalls[:STAGED_COUNT // 2]]
+    new_recalls = [make_recall(len(clean_recalls) + i, new_dttm_str) for i in range(STAGED_COUNT - len(already_published))]
+    return already_published + new_recalls
+
+# The merge from before, one scan of the notice id list and one insert at the front per staged recall
+def merge_with_list(staged_recalls, clean_recalls, latest_dttm):
+    recall_notice_ids = [recall.get("notice_id_number") for recall in clean_recalls if "notice_id_number" in recall]
+    for recall in staged_recalls:
+        if datetime.fromisoformat(recall["notification_dttm"]) >= latest_dttm and recall["notice_id_number"] not in recall_notice_ids:
+            clean_recalls.insert(0, recall)
+    return clean_recalls
+
+def merge_with_set(staged_recalls, clean_recalls, latest_dttm):
+    recall_notice_ids = {recall.get("notice_id_number") for recall in clean_recalls if "notice_id_number" in recall}
+    new_recalls = [
+        recall for recall in staged_recalls
+        if datetime.fromisoformat(recall["notification_dttm"]) >= latest_dttm and recall["notice_id_number"] not in recall_notice_ids
+    ]
+    clean_recalls[:0] = reversed(new_recalls)
+    return clean_recalls
+
+def time_merge(merge, staged_recalls, clean_recalls, latest_dttm):
+    # Merging into a copy of the list so both merges start from the same clean data
+    clean_recalls = list(clean_recalls)
+    start = time.perf_counter()
+    merged_recalls = merge(staged_recalls, clean_recalls, latest_dttm)
+    return time.perf_counter() - start, merged_recalls
+
+## ACTUAL SCRIPT ##
+clean_counts = [int(count) for count in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10000, 100000, 1000000]
+
+print(f"Merging {STAGED_COUNT} staged recalls, {STAGED_COUNT // 2} of them new")
+print(f"{'clean recalls':>13}  {'list':>9}  {'set':>9}  speedup")
+for clean_count in clean_counts:
+    clean_recalls = make_clean_recalls(clean_count)
+    staged_recalls = make_staged_recalls(clean_recalls)
+    latest_dttm = datetime.fromisoformat(clean_recalls[0]["notification_dttm"])
+
+    list_secs, list_merged = time_merge(merge_with_list, staged_recalls, clean_recalls, latest_dttm)
+    set_secs, set_merged = time_merge(merge_with_set, staged_recalls, clean_recalls, latest_dttm)
+    if list_merged != set_merged:
+        sys.exit(f"The two merges gave different lists with {clean_count} clean recalls")
+    print(f"{clean_count:>13}  {list_secs:>8.3f}s  {set_secs:>8.3f}s  {list_secs / set_secs:>6.0f}x")
+
+print("Both merges gave the same list at every size")
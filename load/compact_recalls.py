@@ -0,0 +1,20 @@
+import os
+import sys
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls import metrics
+from food_safety_recalls.store import bootstrap_recall_log, compact_recall_log, read_recall_log
+from food_safety_recalls.columnar import COLUMNAR_EXPORT_DIR, COLUMNAR_MANIFEST_NAME, write_columnar_export
+
+## ACTUAL SCRIPT ##
+metrics.start_run("compact_recalls")
+# Rebuilding the published `clean_data/food_safety_recalls.json` array from the
+# append-only recall log, only if the load scripts have added recalls since the last run
+bootstrap_recall_log()
+recall_log_compacted = compact_recall_log()
+
+# Rebuilding the compressed column files for the dashboard alongside it
+if recall_log_compacted or not os.path.exists(os.path.join(COLUMNAR_EXPORT_DIR, COLUMNAR_MANIFEST_NAME)):
+    columnar_file_count = write_columnar_export(read_recall_log())
+    print(f"Rewrote {columnar_file_count} columnar export files in {COLUMNAR_EXPORT_DIR}")
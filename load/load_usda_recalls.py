@@ -1,65 +1,71 @@
 import os
-import json
-from zoneinfo import ZoneInfo
+import sys
 from datetime import datetime
 
-## CUSTOM CLASSES ##
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super(DateTimeEncoder, self).default(obj)
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls import metrics
+from food_safety_recalls.helpers import load_json_file
+from food_safety_recalls.store import append_recalls
+from food_safety_recalls.summaries import update_recall_summaries
+from food_safety_recalls.query_index import update_query_index
+from food_safety_recalls.usda_fingerprints import commit_pending_usda_fingerprints
+from food_safety_recalls.watermarks import (
+    read_recall_watermarks, update_recall_watermarks, get_latest_notification_dttm, empty_agency_watermarks
+)
 
 ## CUSTOM FUNCTIONS ##
-def load_json_file(file_name, rel_file_folder_path):
-    script_dir = os.path.dirname(__file__)
-    data_file_path = os.path.join(script_dir, rel_file_folder_path, file_name)
-
-    with open(data_file_path, "r") as f:
-        json_data = json.load(f)
-    
-    return json_data
-
-def get_latest_json_dttm(json_list, agency="all"):
-    if agency == "all":
-        latest_dttm = datetime.fromtimestamp(0, tz=ZoneInfo("UTC"))
-        for recall in json_list:
-            recall_ddtm = datetime.strptime(recall["notification_dttm"], "%Y-%m-%dT%H:%M:%S%z")
-            if recall_ddtm > latest_dttm:
-                latest_dttm = recall_ddtm
-    else:
-        latest_dttm = datetime.fromtimestamp(0, tz=ZoneInfo("UTC"))
-        for recall in json_list:
-            recall_ddtm = datetime.strptime(recall["notification_dttm"], "%Y-%m-%dT%H:%M:%S%z")
-            if (recall["agency"] == agency and recall_ddtm > latest_dttm):
-                latest_dttm = recall_ddtm
-    return latest_dttm
-
-def add_latest_json(staged_json_list, overall_json_list, latest_dttm, overall_file_name, overall_rel_file_folder_path):
-    script_dir = os.path.dirname(__file__)
-    data_file_path = os.path.join(script_dir, overall_rel_file_folder_path, overall_file_name)
-
-    recall_notice_ids = [recall.get("notice_id_number") for recall in overall_json_list if "notice_id_number" in recall]
+def add_latest_json(staged_json_list, recall_watermarks, latest_dttm):
+    # The keys already published come from the watermarks sidecar instead of the whole history
+    recall_notice_ids = set(recall_watermarks.get("USDA", empty_agency_watermarks())["notice_ids"])
+    new_recalls = []
+    # Recalls without a notice id can't be told apart from ones already published, so they're skipped
+    # on purpose. Before the watermarks, the keys of every agency were checked together and always
+    # included the FDA recalls' null notice ids, which skipped these without saying so.
+    keyless_count = 0
 
     for recall in staged_json_list:
-        recall_ddtm = datetime.strptime(recall["notification_dttm"], "%Y-%m-%dT%H:%M:%S%z")
+        if recall["notice_id_number"] is None:
+            keyless_count += 1
+            continue
+        recall_ddtm = datetime.fromisoformat(recall["notification_dttm"])
         recall_notice_id = recall["notice_id_number"]
         recall_date_check = recall_ddtm >= latest_dttm
         new_recall_check = recall_notice_id not in recall_notice_ids
 
         if recall_date_check and new_recall_check:
             print(f"Adding data from recall {recall["title"]} at {recall["recall_url"]}.\n")
-            overall_json_list.insert(0, recall)
-        else:
-            print("This recall is already present in the data.")
-    
-    with open(data_file_path, 'w') as f:
-        json.dump(overall_json_list, f, indent=4, separators=(",", ": "), cls=DateTimeEncoder)
+            new_recalls.append(recall)
+
+    # One line for the skipped recalls instead of one per recall
+    skipped_count = len(staged_json_list) - len(new_recalls) - keyless_count
+    if skipped_count:
+        print(f"{skipped_count} of {len(staged_json_list)} staged recalls are already present in the data.")
+    if keyless_count:
+        print(f"{keyless_count} staged recalls have no notice id and were skipped.")
+    metrics.increment("records_added", len(new_recalls))
+    metrics.increment("records_skipped", skipped_count + keyless_count)
+
+    # Only the new recalls get written, the published JSON is rebuilt from the log by compact_recalls.py
+    with metrics.timer("append_recalls"):
+        append_recalls(new_recalls)
+    # Counting only the recalls just appended into the dashboard's summary tables, query index and the watermarks
+    with metrics.timer("update_summaries"):
+        update_recall_summaries()
+    with metrics.timer("update_query_index"):
+        update_query_index()
+    with metrics.timer("update_watermarks"):
+        update_recall_watermarks()
+    # The transform can stop staging these records again now that they're loaded
+    commit_pending_usda_fingerprints()
+
+    return new_recalls
 
 ## ACTUAL SCRIPT ##
-overall_food_recalls = load_json_file("food_safety_recalls.json", "../clean_data")
-usda_staged_recalls = load_json_file("usda_food_safety_recalls_staged.json", "../transformed_staged_data")
+metrics.start_run("load_usda_recalls")
+recall_watermarks = read_recall_watermarks()
+usda_staged_recalls = load_json_file(os.path.join(os.path.dirname(__file__), "../transformed_staged_data", "usda_food_safety_recalls_staged.json"))
 
-overall_latest_dttm = get_latest_json_dttm(overall_food_recalls, agency="USDA")
+overall_latest_dttm = get_latest_notification_dttm(recall_watermarks, "USDA")
 
-add_latest_json(usda_staged_recalls, overall_food_recalls, overall_latest_dttm, "food_safety_recalls.json", "../clean_data")
\ No newline at end of file
+add_latest_json(usda_staged_recalls, recall_watermarks, overall_latest_dttm)
\ No newline at end of file
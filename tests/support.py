@@ -0,0 +1,201 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import types
+import runpy
+import shutil
+import threading
+import contextlib
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Shared pieces for the tests: a copy of the repo's code with empty data folders to run the
+# pipeline scripts in, a local HTTP server that counts the connections it accepts, and a stand-in
+# for the OpenAI client. Nothing here touches the network or the data in the repo itself.
+
+## CONSTANTS ##
+REPO_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FDA_PAGE_FIXTURES_DIR = os.path.join(FIXTURES_DIR, "fda_pages")
+CODE_FOLDERS = ["food_safety_recalls", "extract", "transform", "load"]
+
+# Making the shared `food_safety_recalls` package in the repo root importable from the tests
+sys.path.append(REPO_DIR)
+
+## CUSTOM CLASSES ##
+class LocalServer:
+    """
+    HTTP/1.1 server on a free local port in a background thread. `respond(handler)` gets the
+    request handler and returns (status, headers dict, body bytes). Every request is recorded in
+    `requests` as (monotonic time, path, headers) and every TCP connection accepted is counted.
+    """
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.connection_count = 0
+        self.lock = threading.Lock()
+        local_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keeping connections open between requests like a real server would
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with local_server.lock:
+                    local_server.requests.append((time.monotonic(), self.path, dict(self.headers)))
+                status, headers, body = local_server.respond(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            # POST bodies are left for `respond` to read, like the chat completions an OpenAI client sends
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def get_request(self):
+                request = super().get_request()
+                with local_server.lock:
+                    local_server.connection_count += 1
+                return request
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+## CUSTOM FUNCTIONS ##
+def read_fda_page_fixtures():
+    fda_pages = {}
+    for page_path in sorted(glob.glob(os.path.join(FDA_PAGE_FIXTURES_DIR, "*.html"))):
+        with open(page_path, "r") as f:
+            fda_pages[os.path.basename(page_path)[:-len(".html")]] = f.read()
+    return fda_pages
+
+# Copies the code folders into `dest_dir` with empty data folders next to them and returns `dest_dir`.
+# The published JSON starts out as an empty array so the loaders and watermarks have something to read.
+def copy_repo(dest_dir):
+    for folder in CODE_FOLDERS:
+        shutil.copytree(os.path.join(REPO_DIR, folder), os.path.join(dest_dir, folder), ignore=shutil.ignore_patterns("__pycache__"))
+    for folder in ["raw_data", "transformed_staged_data", "clean_data"]:
+        os.makedirs(os.path.join(dest_dir, folder), exist_ok=True)
+    with open(os.path.join(dest_dir, "clean_data", "food_safety_recalls.json"), "w") as f:
+        f.write("[]")
+    return dest_dir
+
+def write_rss(file_path, items):
+    rss_items = "".join(
+        f"<item><title>{title}</title><link>{url}</link><guid>{url}</guid></item>" for url, title in items
+    )
+    with open(file_path, "w") as f:
+        f.write(f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>{rss_items}</channel></rss>')
+
+# A raw FSIS API record with made up values, `i` sets its title, date and notice id within `year`
+def make_usda_api_record(i, year):
+    return {
+        "field_title": f"Example Farms Recalls Pork Product {i}",
+        "field_recall_date": f"{year}-03-{i + 1:02d}",
+        "field_recall_reason": "Misbranding, Unreported Allergens",
+        "field_establishment": "Example Farms",
+        "field_product_items": f"12-oz. packages of pork product {i}",
+        "field_states": "Iowa, West Virginia",
+        "field_recall_number": f"{i + 1:03d}-{year}",
+        "field_recall_type": "Active Recall",
+        "field_risk_level": "High - Class I",
+        "field_recall_classification": "Class I",
+        "langcode": "English"
+    }
+
+# Runs one of the pipeline scripts in a copy of the repo in this process, the way
+# `python <script> <argv>` would, and returns its globals and what it printed. The copy's own
+# `food_safety_recalls` package is imported for it, so its paths point into the copy, and the
+# package modules it imported are dropped again afterwards. `modules` replaces modules like `openai`.
+def run_repo_script(repo_dir, script_path, argv=(), env=None, modules=None):
+    replaced_names = [name for name in sys.modules if name == "food_safety_recalls" or name.startswith("food_safety_recalls.")]
+    replaced_names.extend(modules or {})
+    saved_modules = {name: sys.modules[name] for name in replaced_names if name in sys.modules}
+    for name in replaced_names:
+        sys.modules.pop(name, None)
+    sys.modules.update(modules or {})
+
+    stdout = io.StringIO()
+    try:
+        with mock.patch.object(sys, "path", [repo_dir] + sys.path), \
+                mock.patch.object(sys, "argv", [script_path, *argv]), \
+                mock.patch.dict(os.environ, env or {}), \
+                contextlib.redirect_stdout(stdout):
+            script_globals = runpy.run_path(os.path.join(repo_dir, script_path), run_name="__main__")
+    finally:
+        for name in [name for name in sys.modules if name == "food_safety_recalls" or name.startswith("food_safety_recalls.")]:
+            del sys.modules[name]
+        for name in modules or {}:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved_modules)
+    return script_globals, stdout.getvalue()
+
+# A module to stand in for `openai`. Its client answers every chat completion with
+# `answer(recall_text)` and appends the recall text of each call to the returned list.
+def make_fake_openai(answer):
+    calls = []
+    calls_lock = threading.Lock()
+
+    def create(model, messages, temperature=0, **kwargs):
+        recall_text = messages[-1]["content"]
+        with calls_lock:
+            calls.append(recall_text)
+        message = types.SimpleNamespace(content=answer(recall_text))
+        usage = types.SimpleNamespace(prompt_tokens=len(recall_text.split()), completion_tokens=2)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    class OpenAI:
+        def __init__(self, *args, **kwargs):
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+
+    fake_openai = types.ModuleType("openai")
+    fake_openai.OpenAI = OpenAI
+    fake_openai.APIError = type("APIError", (Exception,), {})
+    return fake_openai, calls
+
+# Answers a LocalServer request the way the OpenAI chat completions API would, with the class
+# `answer(recall_text)` returns or, if it returns an int, that HTTP error status
+def respond_chat_completion(handler, answer):
+    request_body = json.loads(handler.rfile.read(int(handler.headers["Content-Length"])))
+    recall_text = request_body["messages"][-1]["content"]
+    recall_class = answer(recall_text)
+    # The client would otherwise retry server errors itself after a backoff
+    headers = {"Content-Type": "application/json", "x-should-retry": "false"}
+    if isinstance(recall_class, int):
+        error = {"error": {"message": "The server had an error", "type": "server_error", "code": None, "param": None}}
+        return recall_class, headers, json.dumps(error).encode("utf-8")
+    completion = {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request_body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": recall_class}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+    }
+    return 200, headers, json.dumps(completion).encode("utf-8")
+
+def load_json(file_path):
+    with open(file_path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from support import LocalServer, copy_repo, load_json, run_repo_script
+from food_safety_recalls import fetch
+
+# The extractors send the ETag and Last-Modified saved with the last raw file they wrote and only
+# rewrite it when the feed changed. These run the FDA and USDA extracts and the streamed download
+# helper against a local server that answers 304 when the ETag matches.
+
+## CONSTANTS ##
+FDA_RSS_HOST = "https://www.fda.gov"
+USDA_HOST = "https://www.fsis.usda.gov"
+LAST_MODIFIED = "Wed, 15 Oct 2025 12:00:00 GMT"
+
+## CUSTOM CLASSES ##
+class ConditionalGetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.body = b"<rss><channel><item><title>First</title></item></channel></rss>"
+        self.etag = '"v1"'
+        # Servers that don't send validators can only be checked by hashing what they send
+        self.send_validators = True
+        self.server = LocalServer(self.respond)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        session_patch = mock.patch.object(fetch, "_session", None)
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        if not self.send_validators:
+            return 200, {"Content-Type": "application/xml"}, self.body
+        headers = {"Content-Type": "application/xml", "ETag": self.etag, "Last-Modified": LAST_MODIFIED}
+        if handler.headers.get("If-None-Match") == self.etag:
+            return 304, headers, b""
+        return 200, headers, self.body
+
+    def run_fda_rss_extract(self):
+        session_request = requests.Session.request
+
+        # Sending the FDA requests to the local server instead
+        def local_request(session, method, url, *args, **kwargs):
+            return session_request(session, method, url.replace(FDA_RSS_HOST, self.server.url), *args, **kwargs)
+
+        with mock.patch.object(requests.Session, "request", local_request):
+            return run_repo_script(self.repo_dir, "extract/extract_fda_rss.py")[1]
+
+    def raw_path(self):
+        return os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml")
+
+    def read_raw(self):
+        with open(self.raw_path(), "rb") as f:
+            return f.read()
+
+    def test_not_modified_keeps_the_raw_file(self):
+        self.run_fda_rss_extract()
+        raw_mtime = os.stat(self.raw_path()).st_mtime_ns
+        validators = load_json(os.path.join(self.repo_dir, "raw_data", "validators", "fda_food_safety_recalls.json"))
+        self.assertEqual((validators["etag"], validators["last_modified"]), (self.etag, LAST_MODIFIED))
+
+        output = self.run_fda_rss_extract()
+        _, _, request_headers = self.server.requests[-1]
+        self.assertEqual(request_headers["If-None-Match"], self.etag)
+        self.assertEqual(request_headers["If-Modified-Since"], LAST_MODIFIED)
+        self.assertIn("hasn't changed", output)
+        self.assertEqual(self.read_raw(), self.body)
+        self.assertEqual(os.stat(self.raw_path()).st_mtime_ns, raw_mtime)
+
+    def test_changed_etag_refetches(self):
+        self.run_fda_rss_extract()
+        self.body = b"<rss><channel><item><title>Second</title></item></channel></rss>"
+        self.etag = '"v2"'
+
+        output = self.run_fda_rss_extract()
+        self.assertNotIn("hasn't changed", output)
+        self.assertEqual(self.read_raw(), self.body)
+        validators = load_json(os.path.join(self.repo_dir, "raw_data", "validators", "fda_food_safety_recalls.json"))
+        self.assertEqual(validators["etag"], '"v2"')
+
+    def test_matching_content_hash_skips_the_rewrite(self):
+        self.send_validators = False
+        self.run_fda_rss_extract()
+        raw_mtime = os.stat(self.raw_path()).st_mtime_ns
+
+        # The whole body is sent again, but it hashes the same so the raw file isn't written
+        output = self.run_fda_rss_extract()
+        _, _, request_headers = self.server.requests[-1]
+        self.assertNotIn("If-None-Match", request_headers)
+        self.assertIn("hasn't changed", output)
+        self.assertEqual(os.stat(self.raw_path()).st_mtime_ns, raw_mtime)
+
+    def test_streamed_download_handles_all_three_cases(self):
+        validators_path = os.path.join(self.tmp_dir.name, "validators.json")
+        output_path = os.path.join(self.tmp_dir.name, "raw.json")
+        url = f"{self.server.url}/recalls"
+
+        self.assertTrue(fetch.download_to_file_if_changed(url, validators_path, output_path))
+        # Not modified
+        self.assertFalse(fetch.download_to_file_if_changed(url, validators_path, output_path))
+        # Changed ETag and body
+        self.body, self.etag = b"[2]", '"v2"'
+        self.assertTrue(fetch.download_to_file_if_changed(url, validators_path, output_path))
+        with open(output_path, "rb") as f:
+            self.assertEqual(f.read(), b"[2]")
+        # Same body without validators
+        self.send_validators = False
+        self.assertFalse(fetch.download_to_file_if_changed(url, validators_path, output_path))
+        self.assertFalse(os.path.exists(f"{output_path}.tmp"))
+
+class UsdaConditionalGetTest(unittest.TestCase):
+    """The USDA RSS feed and the API are different payloads and each keeps its own validators"""
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.payloads = {
+            "/fsis-content/rss/recalls.xml": ('"rss-v1"', b'<?xml version="1.0"?><rss version="2.0"><channel></channel></rss>'),
+            "/fsis/api/recall/v/1": ('"api-v1"', b'[{"field_title": "Example recall"}]')
+        }
+        self.server = LocalServer(self.respond)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        session_patch = mock.patch.object(fetch, "_session", None)
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        # No year filter on the recalls page, so the API is pulled whole in one request
+        if handler.path not in self.payloads:
+            return 404, {"Content-Type": "text/plain"}, b"Not Found"
+        etag, body = self.payloads[handler.path]
+        headers = {"Content-Type": "application/octet-stream", "ETag": etag, "Last-Modified": LAST_MODIFIED}
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, headers, b""
+        return 200, headers, body
+
+    def run_usda_extracts(self):
+        session_request = requests.Session.request
+
+        # Sending the FSIS requests to the local server instead
+        def local_request(session, method, url, *args, **kwargs):
+            return session_request(session, method, url.replace(USDA_HOST, self.server.url), *args, **kwargs)
+
+        with mock.patch.object(requests.Session, "request", local_request):
+            rss_output = run_repo_script(self.repo_dir, "extract/extract_usda_rss.py")[1]
+            api_output = run_repo_script(self.repo_dir, "extract/extract_usda_api.py")[1]
+        return rss_output, api_output
+
+    def api_requests(self):
+        return [headers for _, path, headers in self.server.requests if path == "/fsis/api/recall/v/1"]
+
+    def test_rss_and_api_validators_are_kept_apart(self):
+        self.run_usda_extracts()
+        validators_dir = os.path.join(self.repo_dir, "raw_data", "validators")
+        self.assertEqual(load_json(os.path.join(validators_dir, "usda_food_safety_recalls.json"))["etag"], '"rss-v1"')
+        self.assertEqual(load_json(os.path.join(validators_dir, "usda_food_safety_recalls_api.json"))["etag"], '"api-v1"')
+
+        # Neither payload changed, so both get a 304 for their own ETag and neither raw file is rewritten
+        rss_output, api_output = self.run_usda_extracts()
+        self.assertIn("RSS XML hasn't changed", rss_output)
+        self.assertIn("API JSON hasn't changed", api_output)
+        self.assertEqual(self.api_requests()[-1]["If-None-Match"], '"api-v1"')
+
+        # A new API payload isn't hidden by the RSS feed's ETag
+        self.payloads["/fsis/api/recall/v/1"] = ('"api-v2"', b'[{"field_title": "Newer recall"}]')
+        rss_output, api_output = self.run_usda_extracts()
+        self.assertIn("RSS XML hasn't changed", rss_output)
+        self.assertIn("Wrote out USDA Food Safety Recall API JSON", api_output)
+        self.assertEqual(load_json(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.json")), [{"field_title": "Newer recall"}])
+
+if __name__ == "__main__":
+    unittest.main()
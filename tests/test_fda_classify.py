@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+
+from support import (
+    LocalServer, copy_repo, load_json, make_fake_openai, read_fda_page_fixtures, respond_chat_completion, run_repo_script, write_rss
+)
+
+# The FDA transform classifies the recalls it stages with OpenAI. These run it in a copy of the
+# repo against a local server serving the saved recall pages, with a stand-in OpenAI client, or
+# with the real one sending its chat completions to the same local server.
+
+## CONSTANTS ##
+TRANSFORM_SCRIPT = "transform/transform_fda_recall.py"
+CLASSIFICATION_CACHE_PATH = os.path.join("transformed_staged_data", "cache", "fda_recall_classifications.jsonl")
+# The saved pages are the few-shot examples' recalls, each one is answered with its few-shot class
+FEW_SHOT_CLASSES = {
+    "element-112-llc-dba-madelines-patisserie": ("Madeline’s Pâtisserie", "Class II"),
+    "firehook-virginia": ("Firehook of Virginia", "Class II"),
+    "fresh-ready-foods": ("Fresh & Ready Foods", "Class I"),
+    "homegrown-family-foods": ("Homegrown Family Foods", "Class I"),
+    "publix-voluntarily-recalls": ("Publix Super Markets", "Class II"),
+    "rm-trading-llc": ("R&M Trading LLC", "Class III"),
+    "supreme-service-solutions": ("Supreme Service Solutions", "Class I"),
+    "us-trading-company-hayward": ("U.S. Trading Company", "Class III")
+}
+
+## CUSTOM FUNCTIONS ##
+def few_shot_class(recall_text):
+    for company_name, recall_class in FEW_SHOT_CLASSES.values():
+        if company_name in recall_text:
+            return recall_class
+    raise AssertionError("Recall text isn't from one of the saved pages")
+
+def expected_class(recall_url):
+    page_slug = recall_url.rsplit("/", 1)[-1]
+    return next(recall_class for slug_start, (_, recall_class) in FEW_SHOT_CLASSES.items() if page_slug.startswith(slug_start))
+
+## CUSTOM CLASSES ##
+class FdaClassifyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.fda_pages = read_fda_page_fixtures()
+        self.staged_path = os.path.join(self.repo_dir, "transformed_staged_data", "fda_food_safety_recalls_staged.json")
+        self.server = LocalServer(self.respond)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.rss_items = [(f"{self.server.url}/recalls/{page_slug}", f"Recall {i}") for i, page_slug in enumerate(self.fda_pages)]
+        write_rss(os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml"), self.rss_items)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        if handler.command == "POST":
+            return self.respond_chat_completion(handler)
+        page_slug = handler.path.rsplit("/", 1)[-1]
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, self.fda_pages[page_slug].encode("utf-8")
+
+    def respond_chat_completion(self, handler):
+        def answer(recall_text):
+            self.chat_requests.append(recall_text)
+            return self.chat_answer(recall_text)
+        return respond_chat_completion(handler, answer)
+
+    def run_transform_with_openai_client(self, chat_answer):
+        self.chat_answer = chat_answer
+        self.chat_requests = []
+        return run_repo_script(
+            self.repo_dir, TRANSFORM_SCRIPT,
+            env={"FDA_REQUESTS_PER_SECOND": "1000", "OPENAI_BASE_URL": f"{self.server.url}/v1", "OPENAI_API_KEY": "test-key"}
+        )
+
+    def run_transform(self, fake_openai):
+        return run_repo_script(
+            self.repo_dir, TRANSFORM_SCRIPT,
+            env={"FDA_REQUESTS_PER_SECOND": "1000"},
+            modules={"openai": fake_openai}
+        )
+
+    def test_rerun_makes_no_openai_calls(self):
+        fake_openai, calls = make_fake_openai(lambda recall_text: "Class II")
+        self.run_transform(fake_openai)
+        first_calls = len(calls)
+        first_staged_recalls = load_json(self.staged_path)
+        self.assertGreater(first_calls, 0)
+
+        cache_path = os.path.join(self.repo_dir, CLASSIFICATION_CACHE_PATH)
+        cache_mtime = os.stat(cache_path).st_mtime_ns
+        self.run_transform(fake_openai)
+
+        # Every text comes from the cache the second time, and the cache file isn't rewritten for hits
+        self.assertEqual(len(calls), first_calls)
+        self.assertEqual(load_json(self.staged_path), first_staged_recalls)
+        self.assertEqual(os.stat(cache_path).st_mtime_ns, cache_mtime)
+
+    def test_classifications_map_back_to_their_recalls_in_order(self):
+        fake_openai, calls = make_fake_openai(few_shot_class)
+        self.run_transform(fake_openai)
+
+        staged_recalls = load_json(self.staged_path)
+        self.assertEqual([(recall["recall_url"], recall["title"]) for recall in staged_recalls], self.rss_items)
+        for recall in staged_recalls:
+            with self.subTest(recall_url=recall["recall_url"]):
+                self.assertEqual(recall["recall_classification"], f"Potentially {expected_class(recall['recall_url'])}")
+        # The pathogen recalls were classified from their recall reason without a call
+        self.assertLess(len(calls), len(self.rss_items))
+
+    def test_failed_request_leaves_only_its_recall_for_the_next_run(self):
+        def fail_publix(recall_text):
+            if "Publix Super Markets" in recall_text:
+                return 500
+            return few_shot_class(recall_text)
+
+        _, output = self.run_transform_with_openai_client(fail_publix)
+        self.assertIn("Could not classify recall text with OpenAI", output)
+        self.assertIn("Leaving 1 recalls OpenAI couldn't classify for the next run", output)
+        staged_urls = [recall["recall_url"] for recall in load_json(self.staged_path)]
+        self.assertEqual(staged_urls, [recall_url for recall_url, _ in self.rss_items if "publix" not in recall_url])
+
+        # The failed text wasn't cached, so the next run only sends that one and stages everything
+        self.run_transform_with_openai_client(few_shot_class)
+        self.assertEqual(len(self.chat_requests), 1)
+        self.assertIn("Publix Super Markets", self.chat_requests[0])
+        staged_recalls = load_json(self.staged_path)
+        self.assertEqual([(recall["recall_url"], recall["title"]) for recall in staged_recalls], self.rss_items)
+        for recall in staged_recalls:
+            with self.subTest(recall_url=recall["recall_url"]):
+                self.assertEqual(recall["recall_classification"], f"Potentially {expected_class(recall['recall_url'])}")
+
+    def test_run_fails_when_every_classification_fails(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.run_transform_with_openai_client(lambda recall_text: 500)
+        self.assertRegex(str(raised.exception.code), r"OpenAI couldn't classify any of the \d+ recalls sent to it")
+        self.assertGreater(len(self.chat_requests), 0)
+        self.assertFalse(os.path.exists(self.staged_path))
+
+    def test_unexpected_errors_are_not_swallowed(self):
+        def broken_client(recall_text):
+            raise KeyError("choices")
+
+        broken_openai, _ = make_fake_openai(broken_client)
+        with self.assertRaises(KeyError):
+            self.run_transform(broken_openai)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+
+from support import LocalServer, copy_repo, load_json, make_fake_openai, read_fda_page_fixtures, run_repo_script, write_rss
+
+# The FDA transform fetches the new recall pages on a thread pool under a per-host rate limit.
+# These run it against a local server serving the saved recall pages, with the earlier pages
+# answered slowest so they finish last, and check the staged recalls still come out in RSS order.
+
+## CONSTANTS ##
+REQUESTS_PER_SECOND = 20
+FETCH_CONCURRENCY = 4
+
+## CUSTOM CLASSES ##
+class FdaFetchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.fda_pages = read_fda_page_fixtures()
+        self.page_slugs = list(self.fda_pages)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.in_flight_lock = threading.Lock()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        page_slug = handler.path.rsplit("/", 1)[-1]
+        with self.in_flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # The first page takes the longest to answer and the last one the shortest
+        time.sleep(0.05 * (len(self.page_slugs) - self.page_slugs.index(page_slug)))
+        with self.in_flight_lock:
+            self.in_flight -= 1
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, self.fda_pages[page_slug].encode("utf-8")
+
+    def test_recalls_are_staged_in_rss_order_under_the_rate_limit(self):
+        fake_openai, _ = make_fake_openai(lambda recall_text: "Class II")
+        with LocalServer(self.respond) as server:
+            rss_items = [(f"{server.url}/recalls/{page_slug}", f"Recall {i}") for i, page_slug in enumerate(self.page_slugs)]
+            write_rss(os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml"), rss_items)
+            run_repo_script(
+                self.repo_dir, "transform/transform_fda_recall.py",
+                env={"FDA_REQUESTS_PER_SECOND": str(REQUESTS_PER_SECOND), "FDA_FETCH_CONCURRENCY": str(FETCH_CONCURRENCY)},
+                modules={"openai": fake_openai}
+            )
+
+        staged_recalls = load_json(os.path.join(self.repo_dir, "transformed_staged_data", "fda_food_safety_recalls_staged.json"))
+        self.assertEqual([(recall["recall_url"], recall["title"]) for recall in staged_recalls], rss_items)
+
+        # The pages were fetched at the same time, but never faster than the rate limit allows
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertLessEqual(self.max_in_flight, FETCH_CONCURRENCY)
+        request_times = sorted(request_time for request_time, _, _ in server.requests)
+        self.assertEqual(len(request_times), len(rss_items))
+        # The n-th request can't go out before n tokens have refilled, give or take thread scheduling
+        for i, request_time in enumerate(request_times):
+            self.assertGreaterEqual(request_time - request_times[0], i / REQUESTS_PER_SECOND - 0.02)
+
+    def test_page_that_fails_to_fetch_is_skipped_and_not_archived(self):
+        failing_slug = self.page_slugs[2]
+
+        def respond(handler):
+            page_slug = handler.path.rsplit("/", 1)[-1]
+            if page_slug == failing_slug:
+                return 500, {"Content-Type": "text/plain"}, b"Internal Server Error"
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, self.fda_pages[page_slug].encode("utf-8")
+
+        fake_openai, _ = make_fake_openai(lambda recall_text: "Class II")
+        with LocalServer(respond) as server:
+            rss_items = [(f"{server.url}/recalls/{page_slug}", f"Recall {i}") for i, page_slug in enumerate(self.page_slugs)]
+            write_rss(os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml"), rss_items)
+            run_repo_script(
+                self.repo_dir, "transform/transform_fda_recall.py",
+                env={"FDA_REQUESTS_PER_SECOND": "1000"},
+                modules={"openai": fake_openai}
+            )
+
+        failing_url = rss_items[2][0]
+        staged_recalls = load_json(os.path.join(self.repo_dir, "transformed_staged_data", "fda_food_safety_recalls_staged.json"))
+        self.assertEqual([(recall["recall_url"], recall["title"]) for recall in staged_recalls], rss_items[:2] + rss_items[3:])
+        with open(os.path.join(self.repo_dir, "raw_data", "page_archive", "fda", "index.ndjson"), "r") as f:
+            archived_urls = [json.loads(line)["url"] for line in f if line.strip()]
+        self.assertEqual(sorted(archived_urls), sorted(url for url, _ in rss_items if url != failing_url))
+
+if __name__ == "__main__":
+    unittest.main()
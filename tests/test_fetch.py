@@ -0,0 +1,65 @@
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_useragent
+
+from support import LocalServer
+from food_safety_recalls import fetch
+
+# The fetch helpers share one User-Agent and one pooled session per process. These count the
+# User-Agents built and the TCP connections a local keep-alive server accepts while many pages are fetched.
+
+## CUSTOM CLASSES ##
+class CountingUserAgent:
+    """Stands in for `fake_useragent.UserAgent` and counts how many times it's built"""
+    count = 0
+    lock = threading.Lock()
+    data_browsers = [
+        {"type": "desktop", "os": "Linux", "browser": "Firefox", "browser_version": "128.0"},
+        {"type": "desktop", "os": "Linux", "browser": "Firefox", "browser_version": "131.0"},
+        {"type": "desktop", "os": "Windows", "browser": "Firefox", "browser_version": "140.0"},
+        {"type": "mobile", "os": "Linux", "browser": "Firefox", "browser_version": "139.0"}
+    ]
+
+    def __init__(self, *args, **kwargs):
+        with CountingUserAgent.lock:
+            CountingUserAgent.count += 1
+
+class SharedSessionTest(unittest.TestCase):
+    def setUp(self):
+        CountingUserAgent.count = 0
+        # Every test starts without a session, as a new process would
+        session_patch = mock.patch.object(fetch, "_session", None)
+        user_agent_patch = mock.patch.object(fake_useragent, "UserAgent", CountingUserAgent)
+        session_patch.start()
+        user_agent_patch.start()
+        self.addCleanup(session_patch.stop)
+        self.addCleanup(user_agent_patch.stop)
+
+    def respond(self, handler):
+        return 200, {"Content-Type": "text/plain"}, handler.headers["User-Agent"].encode("utf-8")
+
+    def test_sequential_fetches_share_one_user_agent_and_connection(self):
+        with LocalServer(self.respond) as server:
+            responses = [fetch.get_data_from_url(f"{server.url}/page-{i}") for i in range(20)]
+
+        self.assertEqual(CountingUserAgent.count, 1)
+        self.assertEqual(server.connection_count, 1)
+        self.assertEqual(len(server.requests), 20)
+        # The latest desktop Linux Firefox version is the one sent
+        self.assertEqual({response.text for response in responses}, {"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/131.0"})
+
+    def test_threaded_fetches_open_at_most_one_connection_per_thread(self):
+        with LocalServer(self.respond) as server:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                responses = list(executor.map(fetch.get_data_from_url, [f"{server.url}/page-{i}" for i in range(40)]))
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(CountingUserAgent.count, 1)
+        self.assertLessEqual(server.connection_count, 4)
+        self.assertEqual(len(server.requests), 40)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import json
+import tempfile
+import unittest
+
+from support import (
+    LocalServer, copy_repo, make_fake_openai, make_usda_api_record, read_fda_page_fixtures, run_repo_script, write_rss
+)
+
+# Recall uids are derived from the identifying fields, so transforming the same input again has to
+# give a byte-identical staging file, and once it's loaded, the next transform has nothing to stage.
+
+## CUSTOM CLASSES ##
+class TransformIdempotenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_bytes(self, file_path):
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def assert_staged_twice_the_same(self, run_transform, staged_path):
+        run_transform()
+        first_staged_bytes = self.read_bytes(staged_path)
+        first_uids = [recall["uid"] for recall in json.loads(first_staged_bytes)]
+        self.assertEqual(len(set(first_uids)), len(first_uids))
+
+        run_transform()
+        second_staged_bytes = self.read_bytes(staged_path)
+        self.assertEqual(second_staged_bytes, first_staged_bytes)
+        self.assertEqual([recall["uid"] for recall in json.loads(second_staged_bytes)], first_uids)
+        return first_staged_bytes
+
+    def test_usda_transform_is_idempotent(self):
+        write_rss(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.xml"), [
+            ("https://www.fsis.usda.gov/recalls-alerts/example-farms-recalls-pork-product-0", "Example Farms Recalls Pork Product 0")
+        ])
+        with open(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.json"), "w") as f:
+            json.dump([make_usda_api_record(i, 2025) for i in range(5)], f)
+        staged_path = os.path.join(self.repo_dir, "transformed_staged_data", "usda_food_safety_recalls_staged.json")
+
+        run_transform = lambda: run_repo_script(self.repo_dir, "transform/transform_usda_recall.py")[1]
+        staged_bytes = self.assert_staged_twice_the_same(run_transform, staged_path)
+
+        run_repo_script(self.repo_dir, "load/load_usda_recalls.py")
+        output = run_transform()
+        self.assertIn("0 of 5 USDA recalls are new or changed", output)
+        self.assertEqual(self.read_bytes(staged_path), staged_bytes)
+
+    def test_fda_transform_is_idempotent(self):
+        fda_pages = read_fda_page_fixtures()
+        fake_openai, _ = make_fake_openai(lambda recall_text: "Class II")
+        staged_path = os.path.join(self.repo_dir, "transformed_staged_data", "fda_food_safety_recalls_staged.json")
+
+        def respond(handler):
+            page_slug = handler.path.rsplit("/", 1)[-1]
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, fda_pages[page_slug].encode("utf-8")
+
+        with LocalServer(respond) as server:
+            rss_items = [(f"{server.url}/recalls/{page_slug}", f"Recall {i}") for i, page_slug in enumerate(fda_pages)]
+            write_rss(os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml"), rss_items)
+            run_transform = lambda: run_repo_script(
+                self.repo_dir, "transform/transform_fda_recall.py",
+                env={"FDA_REQUESTS_PER_SECOND": "1000"},
+                modules={"openai": fake_openai}
+            )[1]
+            staged_bytes = self.assert_staged_twice_the_same(run_transform, staged_path)
+
+            run_repo_script(self.repo_dir, "load/load_fda_recalls.py")
+            output = run_transform()
+
+        self.assertIn("No new FDA data to add to the staging file.", output)
+        self.assertEqual(self.read_bytes(staged_path), staged_bytes)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import json
+import tempfile
+import unittest
+import tracemalloc
+
+from support import make_usda_api_record
+from food_safety_recalls.json_stream import iter_json_array, JsonArrayWriter
+
+# The USDA extract and transform stream the API's JSON array through iter_json_array and
+# JsonArrayWriter. These copy generated arrays of different sizes through both and check that the
+# copy round-trips and that peak memory stays under the same bound whatever the size of the array.
+
+## CONSTANTS ##
+RECORD_COUNTS = [2000, 20000]
+# Enough for the read buffer, one decoded record and tracemalloc's own bookkeeping, far less than the arrays
+PEAK_MEMORY_BOUND = 1 << 20
+
+## CUSTOM FUNCTIONS ##
+def make_record(i):
+    return make_usda_api_record(i % 28, 2000 + i // 28 % 26) | {"field_summary": f"<p>Summary of recall {i}</p>" * 4}
+
+# Writes the generated array a record at a time so the test itself never holds all of it
+def write_generated_array(file_path, record_count):
+    with open(file_path, "w") as f:
+        f.write("[\n")
+        for i in range(record_count):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(make_record(i), indent=4, separators=(",", ": ")))
+        f.write("\n]")
+
+## CUSTOM CLASSES ##
+class JsonStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def copy_array(self, input_path, output_path):
+        tracemalloc.start()
+        try:
+            with JsonArrayWriter(output_path) as writer:
+                for record in iter_json_array(input_path):
+                    writer.write(record)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return writer.count, peak_memory
+
+    def test_peak_memory_is_bounded_and_the_copy_round_trips(self):
+        peak_memories = []
+        for record_count in RECORD_COUNTS:
+            with self.subTest(record_count=record_count):
+                input_path = os.path.join(self.tmp_dir.name, f"input_{record_count}.json")
+                output_path = os.path.join(self.tmp_dir.name, f"output_{record_count}.json")
+                write_generated_array(input_path, record_count)
+
+                copied_count, peak_memory = self.copy_array(input_path, output_path)
+                peak_memories.append(peak_memory)
+                self.assertEqual(copied_count, record_count)
+                self.assertLess(peak_memory, PEAK_MEMORY_BOUND)
+                self.assertLess(PEAK_MEMORY_BOUND, os.path.getsize(input_path))
+
+                # Same records in the same order
+                for i, record in enumerate(iter_json_array(output_path)):
+                    self.assertEqual(record, make_record(i))
+
+        # Ten times the records doesn't take noticeably more memory
+        self.assertLess(peak_memories[-1], peak_memories[0] * 1.5)
+
+    def test_small_array_matches_json_dump(self):
+        records = [make_record(i) for i in range(3)]
+        output_path = os.path.join(self.tmp_dir.name, "small.json")
+        with JsonArrayWriter(output_path) as writer:
+            for record in records:
+                writer.write(record)
+        with open(output_path, "r") as f:
+            self.assertEqual(f.read(), json.dumps(records, indent=4, separators=(",", ": ")))
+        self.assertEqual(list(iter_json_array(output_path)), records)
+
+if __name__ == "__main__":
+    unittest.main()
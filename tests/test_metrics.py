@@ -0,0 +1,42 @@
+import os
+import json
+import tempfile
+import unittest
+
+from support import copy_repo, load_json, make_usda_api_record, run_repo_script, write_rss
+
+# The workflows set FOOD_SAFETY_RECALLS_METRICS=1 and upload the `metrics` folder. These run a
+# script in a copy of the repo with and without it and then finish its run the way exiting would.
+
+## CUSTOM CLASSES ##
+class MetricsReportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.metrics_dir = os.path.join(self.repo_dir, "metrics")
+        write_rss(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.xml"), [])
+        with open(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.json"), "w") as f:
+            json.dump([make_usda_api_record(i, 2026) for i in range(3)], f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    # Runs the USDA transform and returns what finishing its metrics run wrote, which atexit would do otherwise
+    def run_transform(self, env):
+        script_globals, _ = run_repo_script(self.repo_dir, "transform/transform_usda_recall.py", env=env)
+        return script_globals["metrics"].finish_run()
+
+    def test_enabled_metrics_write_a_report(self):
+        report_path = self.run_transform({"FOOD_SAFETY_RECALLS_METRICS": "1"})
+        self.assertEqual(os.path.dirname(report_path), os.path.join(self.metrics_dir, "transform_usda_recall"))
+        report = load_json(report_path)
+        self.assertEqual(report["run_name"], "transform_usda_recall")
+        self.assertEqual(report["counters"]["records_staged"], 3)
+        self.assertGreater(report["wall_secs"], 0)
+
+    def test_disabled_metrics_write_nothing(self):
+        self.assertIsNone(self.run_transform({"FOOD_SAFETY_RECALLS_METRICS": "0"}))
+        self.assertFalse(os.path.exists(self.metrics_dir))
+
+if __name__ == "__main__":
+    unittest.main()
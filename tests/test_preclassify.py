@@ -0,0 +1,69 @@
+import os
+import ast
+import unittest
+
+from support import REPO_DIR
+from food_safety_recalls.preclassify import preclassify_recall
+
+# The local rules must only answer "Class I" when OpenAI would too, anything else is left for the API.
+
+## CONSTANTS ##
+FDA_TRANSFORM_PATH = os.path.join(REPO_DIR, "transform", "transform_fda_recall.py")
+
+## CUSTOM FUNCTIONS ##
+# The few-shot recall texts from the FDA transform by their variable names, read without running the script
+def read_few_shot_examples():
+    with open(FDA_TRANSFORM_PATH, "r") as f:
+        module = ast.parse(f.read())
+    examples = {}
+    for node in module.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.startswith("recall_class_"):
+                    examples[target.id] = node.value.value
+    return examples
+
+## CUSTOM CLASSES ##
+class PreclassifyTest(unittest.TestCase):
+    def test_pathogens_are_class_i(self):
+        for recall_reason in ["Listeria monocytogenes", "Potential Salmonella contamination", "E. coli O157:H7", "Clostridium botulinum"]:
+            with self.subTest(recall_reason=recall_reason):
+                self.assertEqual(preclassify_recall(recall_reason), "Class I")
+
+    def test_ambiguous_or_unrelated_reasons_are_left_for_openai(self):
+        for recall_reason in [
+            "Undeclared sulfites",
+            "Undeclared eggplant extract",
+            "Mislabeled expiration date on milk",
+            "Undeclared FD&C Red No. 3 in milk candy",
+            "Undeclared milk",
+            "Undeclared Sesame",
+            "Contains undeclared peanuts",
+            "Undeclared allergen (wheat)",
+            "Listeria monocytogenes and undeclared egg",
+            "Elevated levels of lead",
+            "Foreign material (plastic)",
+            "",
+            None
+        ]:
+            with self.subTest(recall_reason=recall_reason):
+                self.assertIsNone(preclassify_recall(recall_reason))
+
+    def test_list_valued_reasons_are_joined(self):
+        # extract_dd_terms gives a list for a <dd> with <br> breaks or several <div>s
+        self.assertEqual(preclassify_recall(["Potential", "Listeria monocytogenes"]), "Class I")
+        self.assertIsNone(preclassify_recall(["Listeria monocytogenes", "Undeclared milk"]))
+        self.assertIsNone(preclassify_recall([]))
+
+    def test_few_shot_examples_are_never_given_another_class(self):
+        examples = read_few_shot_examples()
+        self.assertEqual(len(examples), 9)
+        for name, recall_text in examples.items():
+            with self.subTest(name=name):
+                if name.startswith("recall_class_I_"):
+                    self.assertIn(preclassify_recall(recall_text), ["Class I", None])
+                else:
+                    self.assertIsNone(preclassify_recall(recall_text))
+
+if __name__ == "__main__":
+    unittest.main()
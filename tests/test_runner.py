@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from support import (
+    LocalServer, copy_repo, load_json, read_fda_page_fixtures, respond_chat_completion, run_repo_script, write_rss
+)
+
+# The pipeline runner skips a stage whose input files haven't changed since it last finished, but
+# not a transform that left recalls for the next run. These run the FDA transform and load through
+# `python -m food_safety_recalls run` in a copy of the repo, against a local server serving the
+# saved recall pages and answering the OpenAI client's chat completions.
+
+## CONSTANTS ##
+RUN_ARGV = ["run", "--agency", "fda", "--skip-extract"]
+
+## CUSTOM CLASSES ##
+class RunnerSkipTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.fda_pages = read_fda_page_fixtures()
+        self.failing_page_slugs = set()
+        self.server = LocalServer(self.respond)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.rss_items = [(f"{self.server.url}/recalls/{page_slug}", f"Recall {i}") for i, page_slug in enumerate(self.fda_pages)]
+        write_rss(os.path.join(self.repo_dir, "raw_data", "fda_food_safety_recalls.xml"), self.rss_items)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        if handler.command == "POST":
+            return respond_chat_completion(handler, lambda recall_text: "Class II")
+        page_slug = handler.path.rsplit("/", 1)[-1]
+        if page_slug in self.failing_page_slugs:
+            return 500, {"Content-Type": "text/plain"}, b"Internal Server Error"
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, self.fda_pages[page_slug].encode("utf-8")
+
+    def run_pipeline(self):
+        return run_repo_script(
+            self.repo_dir, "food_safety_recalls/__main__.py", argv=RUN_ARGV,
+            env={"FDA_REQUESTS_PER_SECOND": "1000", "OPENAI_BASE_URL": f"{self.server.url}/v1", "OPENAI_API_KEY": "test-key"}
+        )[1]
+
+    def loaded_urls(self):
+        return set(load_json(os.path.join(self.repo_dir, "clean_data", "food_safety_recalls_watermarks.json"))["agencies"]["FDA"]["recall_urls"])
+
+    def test_unchanged_inputs_skip_the_transform(self):
+        output = self.run_pipeline()
+        self.assertIn("Running transform_fda_recall", output)
+        self.assertEqual(self.loaded_urls(), {recall_url for recall_url, _ in self.rss_items})
+
+        output = self.run_pipeline()
+        self.assertIn("Inputs of transform_fda_recall haven't changed since it last ran, skipping it", output)
+        self.assertIn("Inputs of load_fda_recalls haven't changed since it last ran, skipping it", output)
+
+    def test_transform_with_unfetched_pages_runs_again(self):
+        failing_page_slug = next(iter(self.fda_pages))
+        self.failing_page_slugs = {failing_page_slug}
+        output = self.run_pipeline()
+        self.assertIn("transform_fda_recall left 1 recalls for the next run", output)
+        failing_url = f"{self.server.url}/recalls/{failing_page_slug}"
+        self.assertNotIn(failing_url, self.loaded_urls())
+
+        # The RSS XML is the same, but the page that failed is fetched, classified and loaded this time
+        self.failing_page_slugs = set()
+        output = self.run_pipeline()
+        self.assertIn("Running transform_fda_recall", output)
+        self.assertNotIn("left 1 recalls for the next run", output)
+        self.assertEqual(self.loaded_urls(), {recall_url for recall_url, _ in self.rss_items})
+
+        # Nothing is left, so now it's skipped
+        output = self.run_pipeline()
+        self.assertIn("Inputs of transform_fda_recall haven't changed since it last ran, skipping it", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from support import load_json
+from food_safety_recalls.store import append_recalls
+from food_safety_recalls.summaries import categorize_recall_reason, update_recall_summaries
+
+# The summary tables count the recalls in the log by month, agency, risk level, reason category and state.
+
+## CUSTOM CLASSES ##
+class RecallSummariesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_list_valued_reasons_are_categorized(self):
+        # extract_dd_terms gives a list for a <dd> with <br> breaks or several <div>s
+        self.assertEqual(categorize_recall_reason(["Potential", "Listeria monocytogenes"]), "Pathogen")
+        self.assertEqual(categorize_recall_reason(["Undeclared", "milk"]), "Allergen")
+        self.assertEqual(categorize_recall_reason([]), "Unknown")
+
+    def test_log_with_a_list_valued_reason_is_counted(self):
+        log_path = os.path.join(self.tmp_dir.name, "recalls.ndjson")
+        summaries_dir = os.path.join(self.tmp_dir.name, "summaries")
+        append_recalls([
+            {
+                "notification_dttm": "2025-05-16T04:00:00+00:00",
+                "agency": "FDA",
+                "recall_reason": ["Undeclared wheat", "Undeclared milk"],
+                "impacted_states": ["OH", "MI"],
+                "risk_level": "Unknown",
+                "recall_classification": "Potentially Unknown"
+            },
+            {
+                "notification_dttm": "2025-05-20T04:00:00+00:00",
+                "agency": "FDA",
+                "recall_reason": "Salmonella",
+                "impacted_states": ["OH"],
+                "risk_level": "Potentially High - Class I",
+                "recall_classification": "Potentially Class I"
+            }
+        ], log_path)
+
+        self.assertEqual(update_recall_summaries(log_path, summaries_dir), 2)
+        reason_rows = load_json(os.path.join(summaries_dir, "recalls_by_month_reason_category.json"))
+        self.assertEqual(reason_rows, [
+            {"month": "2025-05", "agency": "FDA", "reason_category": "Allergen", "recall_count": 1},
+            {"month": "2025-05", "agency": "FDA", "reason_category": "Pathogen", "recall_count": 1}
+        ])
+        state_rows = load_json(os.path.join(summaries_dir, "recalls_by_month_state.json"))
+        self.assertEqual({row["state"]: row["recall_count"] for row in state_rows}, {"MI": 1, "OH": 2})
+
+if __name__ == "__main__":
+    unittest.main()
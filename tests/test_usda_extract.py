@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import requests
+
+from support import LocalServer, copy_repo, load_json, run_repo_script
+
+# The USDA extract pulls the FSIS API one year at a time. An hourly run only re-fetches the
+# years since the latest USDA recall, these check the raw file it writes still has every year on disk.
+
+## CONSTANTS ##
+USDA_API_HOST = "https://www.fsis.usda.gov"
+OLD_YEAR = 2015
+OLD_YEAR_ID = "100"
+CURRENT_YEAR_ID = "200"
+
+## CUSTOM CLASSES ##
+class UsdaPartitionExtractTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.current_year = datetime.now(ZoneInfo("America/New_York")).year
+        self.partitions_dir = os.path.join(self.repo_dir, "raw_data", "partitions")
+        os.makedirs(os.path.join(self.partitions_dir, "usda"))
+        # A year pulled by an earlier backfill and the cached year ids, so the recalls page isn't needed
+        self.old_recalls = [{"field_title": "Old recall", "field_recall_number": "001-2015", "field_recall_date": "2015-03-01"}]
+        with open(os.path.join(self.partitions_dir, "usda", f"{OLD_YEAR}.json"), "w") as f:
+            json.dump(self.old_recalls, f)
+        with open(os.path.join(self.partitions_dir, "usda_year_ids.json"), "w") as f:
+            json.dump({str(self.current_year): CURRENT_YEAR_ID, str(OLD_YEAR): OLD_YEAR_ID}, f)
+        self.current_recalls = [
+            {"field_title": "New recall", "field_recall_number": f"001-{self.current_year}", "field_recall_date": f"{self.current_year}-03-01"}
+        ]
+        self.raw_path = os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def respond(self, handler):
+        self.assertIn(f"field_year_id={CURRENT_YEAR_ID}", handler.path)
+        return 200, {"Content-Type": "application/json"}, json.dumps(self.current_recalls).encode("utf-8")
+
+    def run_extract(self):
+        with LocalServer(self.respond) as server:
+            session_request = requests.Session.request
+
+            # Sending the FSIS requests to the local server instead
+            def local_request(session, method, url, *args, **kwargs):
+                return session_request(session, method, url.replace(USDA_API_HOST, server.url), *args, **kwargs)
+
+            with mock.patch.object(requests.Session, "request", local_request):
+                output = run_repo_script(self.repo_dir, "extract/extract_usda_api.py")[1]
+        return server, output
+
+    def test_windowed_run_keeps_older_partitions_in_the_raw_file(self):
+        server, _ = self.run_extract()
+
+        # Only the current year was fetched, the old year still comes after it in the raw file
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(load_json(self.raw_path), self.current_recalls + self.old_recalls)
+
+    def test_first_partitioned_run_seeds_the_partitions_from_the_raw_file(self):
+        # The raw file the unpartitioned extract wrote, with no partition files yet
+        os.remove(os.path.join(self.partitions_dir, "usda", f"{OLD_YEAR}.json"))
+        older_recalls = [{"field_title": "Older recall", "field_recall_number": "001-2010", "field_recall_date": "2010-06-01"}]
+        stale_current_recalls = [dict(self.current_recalls[0], field_title="Stale recall")]
+        with open(self.raw_path, "w") as f:
+            json.dump(stale_current_recalls + self.old_recalls + older_recalls, f)
+
+        server, output = self.run_extract()
+        self.assertIn("Seeded the USDA partitions with the 3 recalls", output)
+        self.assertEqual(len(server.requests), 1)
+        # The fetched current year replaces its seeded partition, the older years are kept
+        self.assertEqual(load_json(self.raw_path), self.current_recalls + self.old_recalls + older_recalls)
+        self.assertEqual(load_json(os.path.join(self.partitions_dir, "usda", "2010.json")), older_recalls)
+
+if __name__ == "__main__":
+    unittest.main()
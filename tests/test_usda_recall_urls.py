@@ -0,0 +1,72 @@
+import os
+import json
+import tempfile
+import unittest
+
+from support import copy_repo, load_json, make_usda_api_record, run_repo_script, write_rss
+from food_safety_recalls.usda_recall_urls import UsdaRecallUrlIndex
+
+# FSIS reuses recall titles, and the slugs built from them, from one year to the next. The URL
+# index has to give each API record the page published around its own recall date, not whichever
+# page with that title it saw last, and never remember a wrong page under the record's notice id.
+
+## CONSTANTS ##
+TITLE = "Example Farms Recalls Pork Product 0"
+URL_2015 = "https://www.fsis.usda.gov/recalls-alerts/example-farms-recalls-pork-product-0"
+URL_2026 = "https://www.fsis.usda.gov/recalls-alerts/example-farms-recalls-pork-product-0-1"
+
+## CUSTOM CLASSES ##
+class UsdaRecallUrlIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp_dir.name, "usda_recall_urls.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reused_title_is_matched_by_date(self):
+        url_index = UsdaRecallUrlIndex(self.index_path)
+        url_index.add_recall(URL_2015, TITLE, "2015-03-01")
+        url_index.add_recall(URL_2026, TITLE, "2026-03-02")
+        url_index.save()
+
+        # Also after the index is read back from its file
+        for url_index in [url_index, UsdaRecallUrlIndex(self.index_path)]:
+            self.assertEqual(url_index.find(TITLE, recall_date="2015-03-01"), URL_2015)
+            self.assertEqual(url_index.find(TITLE, recall_date="2026-03-01"), URL_2026)
+            self.assertEqual(url_index.find(TITLE.upper(), recall_date="2015-03-02"), URL_2015)
+            self.assertEqual(url_index.find(f"{TITLE} Due to Misbranding", recall_date="2015-03-01"), URL_2015)
+            # No page within FUZZY_MATCH_DAYS, whatever the title
+            self.assertIsNone(url_index.find(TITLE, recall_date="2020-03-01"))
+
+    def test_notice_id_is_only_trusted_near_its_date(self):
+        url_index = UsdaRecallUrlIndex(self.index_path)
+        url_index.add_recall(URL_2015, TITLE, "2015-03-01")
+        url_index.add_notice_id("001-2026", URL_2015)
+        self.assertIsNone(url_index.find("Another Title", "001-2026", "2026-03-01"))
+        self.assertEqual(url_index.find("Another Title", "001-2026", "2015-03-01"), URL_2015)
+
+    def test_transform_does_not_map_a_new_recall_to_last_years_page(self):
+        repo_dir = copy_repo(self.tmp_dir.name)
+        # Only the 2015 page is in the feed when the 2026 recall with the same title comes out
+        url_index = UsdaRecallUrlIndex(os.path.join(repo_dir, "raw_data", "url_index", "usda_recall_urls.json"))
+        url_index.add_recall(URL_2015, TITLE, "2015-03-01")
+        url_index.save()
+        write_rss(os.path.join(repo_dir, "raw_data", "usda_food_safety_recalls.xml"), [])
+        with open(os.path.join(repo_dir, "raw_data", "usda_food_safety_recalls.json"), "w") as f:
+            json.dump([make_usda_api_record(0, 2026), make_usda_api_record(0, 2015)], f)
+
+        run_repo_script(repo_dir, "transform/transform_usda_recall.py")
+        staged_path = os.path.join(repo_dir, "transformed_staged_data", "usda_food_safety_recalls_staged.json")
+        recall_urls = {recall["notice_id_number"]: recall["recall_url"] for recall in load_json(staged_path)}
+        self.assertEqual(recall_urls, {"001-2015": URL_2015, "001-2026": None})
+        saved_notice_ids = load_json(url_index.index_path)["notice_ids"]
+        self.assertEqual(saved_notice_ids, {"001-2015": URL_2015})
+
+        # Once its own page is in the feed, the 2026 recall gets it
+        url_index = UsdaRecallUrlIndex(url_index.index_path)
+        url_index.add_recall(URL_2026, TITLE, "2026-03-01")
+        self.assertEqual(url_index.find(TITLE, "001-2026", "2026-03-01"), URL_2026)
+
+if __name__ == "__main__":
+    unittest.main()
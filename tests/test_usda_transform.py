@@ -0,0 +1,92 @@
+import os
+import json
+import tempfile
+import unittest
+
+from support import copy_repo, load_json, make_usda_api_record, run_repo_script, write_rss
+
+# The USDA transform only stages raw API records it hasn't fingerprinted yet. These run it and
+# the loader in a copy of the repo on a few made up API records, the way the workflows would.
+
+## CONSTANTS ##
+TRANSFORM_SCRIPT = "transform/transform_usda_recall.py"
+LOAD_SCRIPT = "load/load_usda_recalls.py"
+
+## CUSTOM CLASSES ##
+class UsdaFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_dir = copy_repo(self.tmp_dir.name)
+        self.raw_path = os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.json")
+        self.staged_path = os.path.join(self.repo_dir, "transformed_staged_data", "usda_food_safety_recalls_staged.json")
+        self.fingerprints_path = os.path.join(self.repo_dir, "transformed_staged_data", "fingerprints", "usda_food_safety_recalls.json")
+        write_rss(os.path.join(self.repo_dir, "raw_data", "usda_food_safety_recalls.xml"), [])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_raw(self, records):
+        with open(self.raw_path, "w") as f:
+            json.dump(records, f)
+
+    def staged_notice_ids(self):
+        return [recall["notice_id_number"] for recall in load_json(self.staged_path)]
+
+    def test_unloaded_delta_is_staged_again_until_the_loader_runs(self):
+        old_records = [make_usda_api_record(i, 2015) for i in range(3)]
+        self.write_raw(old_records)
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        run_repo_script(self.repo_dir, LOAD_SCRIPT)
+
+        self.write_raw([make_usda_api_record(0, 2026)] + old_records)
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        # A second transform before the loader, with another new record, keeps the first one in the staging file
+        new_records = [make_usda_api_record(1, 2026), make_usda_api_record(0, 2026)]
+        self.write_raw(new_records + old_records)
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        self.assertEqual(self.staged_notice_ids(), ["002-2026", "001-2026"])
+
+        run_repo_script(self.repo_dir, LOAD_SCRIPT)
+        with open(os.path.join(self.repo_dir, "clean_data", "food_safety_recalls.ndjson"), "r") as f:
+            loaded_notice_ids = [json.loads(line)["notice_id_number"] for line in f if line.strip()]
+        self.assertEqual(sorted(loaded_notice_ids), ["001-2015", "001-2026", "002-2015", "002-2026", "003-2015"])
+
+        # Once loaded, the same raw file stages nothing
+        _, output = run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        self.assertIn("0 of 5 USDA recalls are new or changed", output)
+
+    def test_windowed_raw_file_keeps_older_fingerprints(self):
+        old_records = [make_usda_api_record(i, 2015) for i in range(3)]
+        self.write_raw(old_records)
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        run_repo_script(self.repo_dir, LOAD_SCRIPT)
+        old_fingerprints = set(load_json(self.fingerprints_path))
+        self.assertEqual(len(old_fingerprints), 3)
+
+        # A raw file with only the latest year in it doesn't forget the older records
+        self.write_raw([make_usda_api_record(0, 2026)])
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        run_repo_script(self.repo_dir, LOAD_SCRIPT)
+        self.assertLess(old_fingerprints, set(load_json(self.fingerprints_path)))
+
+        # So a full raw file afterwards doesn't stage the history again
+        self.write_raw([make_usda_api_record(0, 2026)] + old_records)
+        _, output = run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        self.assertIn("0 of 4 USDA recalls are new or changed", output)
+
+    def test_recalls_without_a_notice_id_are_skipped_by_the_loader(self):
+        # FSIS public health alerts come without a recall number
+        alert_record = make_usda_api_record(1, 2026) | {"field_recall_number": "", "field_title": "FSIS Issues Public Health Alert"}
+        self.write_raw([make_usda_api_record(0, 2026), alert_record])
+        run_repo_script(self.repo_dir, TRANSFORM_SCRIPT)
+        self.assertEqual(self.staged_notice_ids(), ["001-2026", None])
+
+        _, output = run_repo_script(self.repo_dir, LOAD_SCRIPT)
+        self.assertIn("1 staged recalls have no notice id and were skipped.", output)
+        self.assertNotIn("already present", output)
+        with open(os.path.join(self.repo_dir, "clean_data", "food_safety_recalls.ndjson"), "r") as f:
+            loaded_titles = [json.loads(line)["title"] for line in f if line.strip()]
+        self.assertEqual(loaded_titles, ["Example Farms Recalls Pork Product 0"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+from bs4 import BeautifulSoup
+import os
+import sys
+import glob
+import time
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.page_archive import PageArchive
+from food_safety_recalls.fda_page import parse_fda_page, extract_dl_terms, extract_dd_terms
+
+# Times parsing saved FDA recall pages with the full `html.parser` soup and with
+# the soup restricted to the description list and paragraphs, and checks that both give the
+# same description list terms and paragraph strings for every page.
+# The pages come from a folder of .html files if one is given, otherwise from the FDA page
+# archive, or from the eight hand-built pages in `tests/fixtures/fda_pages` if the archive is empty.
+# Those follow the FDA site's markup but weren't saved from it, so they only give a rough speedup.
+# Usage: python ./transform/benchmark_fda_parser.py [folder of saved .html pages]
+
+## CUSTOM FUNCTIONS ##
+def extract_page_data(soup):
+    key_list = []
+    val_list = []
+    description_list = soup.find("dl", class_="lcds-description-list--grid")
+    for child in description_list.children:
+        if child.name == "dt":
+            key_list.append(extract_dl_terms(child))
+        elif child.name == "dd":
+            val_list.append(extract_dd_terms(child))
+    paragraph_strings = [list(paragraph.strings) for paragraph in soup.find_all("p")]
+    return key_list, val_list, paragraph_strings
+
+def time_parser(page_htmls, parse_page):
+    start = time.perf_counter()
+    page_data = [extract_page_data(parse_page(page_html)) for page_html in page_htmls]
+    return time.perf_counter() - start, page_data
+
+def read_page_folder(page_folder_path):
+    page_paths = sorted(glob.glob(os.path.join(page_folder_path, "*.html")))
+    page_htmls = []
+    for page_path in page_paths:
+        with open(page_path, "r") as f:
+            page_htmls.append(f.read())
+    return page_paths, page_htmls
+
+## ACTUAL SCRIPT ##
+script_dir = os.path.dirname(__file__)
+if len(sys.argv) > 1:
+    page_paths, page_htmls = read_page_folder(sys.argv[1])
+else:
+    fda_page_archive = PageArchive(os.path.join(script_dir, "../raw_data/page_archive/fda"))
+    page_paths = fda_page_archive.urls()
+    page_htmls = [fda_page_archive.get(url) for url in page_paths]
+    if not page_htmls:
+        print("The FDA page archive is empty, parsing the hand-built pages in tests/fixtures/fda_pages")
+        page_paths, page_htmls = read_page_folder(os.path.join(script_dir, "../tests/fixtures/fda_pages"))
+
+if not page_htmls:
+    sys.exit("No saved pages to parse")
+
+full_secs, full_page_data = time_parser(page_htmls, lambda page_html: BeautifulSoup(page_html, "html.parser"))
+strained_secs, strained_page_data = time_parser(page_htmls, parse_fda_page)
+
+mismatched_paths = [
+    page_path for page_path, full_data, strained_data in zip(page_paths, full_page_data, strained_page_data)
+    if full_data != strained_data
+]
+
+print(f"Parsed {len(page_htmls)} pages")
+print(f"Full soup: {full_secs:.2f}s, description list and paragraphs only: {strained_secs:.2f}s ({full_secs / strained_secs:.1f}x)")
+if mismatched_paths:
+    print(f"{len(mismatched_paths)} pages parsed differently:")
+    for page_path in mismatched_paths:
+        print(page_path)
+else:
+    print("Both parsers extracted identical data from every page")
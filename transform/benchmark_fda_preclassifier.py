@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+from collections import Counter
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.preclassify import preclassify_recall
+
+# Reports how many FDA recalls in the clean data the local rules would classify without
+# OpenAI, and how often the rules agree with the classification that was published. Most of the
+# published classifications are Class I, so the agreement is printed next to how they're split up.
+
+## ACTUAL SCRIPT ##
+script_dir = os.path.dirname(__file__)
+clean_data_file_path = os.path.join(script_dir, "../clean_data/food_safety_recalls.json")
+
+with open(clean_data_file_path, "r") as f:
+    fda_recalls = [recall for recall in json.load(f) if recall["agency"] == "FDA"]
+
+labeled_recalls = [recall for recall in fda_recalls if recall.get("recall_classification")]
+
+preclassified_count = 0
+agreement_count = 0
+disagreements = []
+for recall in labeled_recalls:
+    preclassification = preclassify_recall(recall.get("recall_reason"))
+    if preclassification is None:
+        continue
+    preclassified_count += 1
+    if recall["recall_classification"] == f"Potentially {preclassification}":
+        agreement_count += 1
+    else:
+        disagreements.append((recall.get("recall_reason"), preclassification, recall["recall_classification"]))
+
+all_preclassified_count = sum(preclassify_recall(recall.get("recall_reason")) is not None for recall in fda_recalls)
+
+label_counts = Counter(recall["recall_classification"] for recall in labeled_recalls)
+print(f"FDA recalls: {len(fda_recalls)}, with a published classification: {len(labeled_recalls)}")
+print("Published classifications: " + ", ".join(f"{label} {count}" for label, count in sorted(label_counts.items())))
+print(
+    f"Classified locally: {all_preclassified_count} of {len(fda_recalls)} "
+    f"({all_preclassified_count / len(fda_recalls):.1%} fewer OpenAI calls)"
+)
+print(
+    f"Agreement on labeled recalls: {agreement_count} of {preclassified_count} classified locally "
+    f"({agreement_count / max(preclassified_count, 1):.1%}), "
+    f"{len(labeled_recalls) - preclassified_count} left for OpenAI"
+)
+for recall_reason, preclassification, recall_classification in disagreements:
+    print(f"Disagreement: {recall_reason!r} classified as {preclassification}, published as {recall_classification}")
@@ -0,0 +1,73 @@
+import os
+import ast
+import sys
+import json
+import subprocess
+
+# Measures what each pipeline script pays at startup for its imports. The import statements at the
+# top of each script (up to its first other statement) are run on their own in a fresh interpreter
+# with `-X importtime`, and the heavy third-party modules that got loaded are listed.
+# Usage: python ./transform/benchmark_import_time.py [runs per script, 5 by default]
+
+## CONSTANTS ##
+ENTRY_POINTS = [
+    "extract/extract_fda_rss.py",
+    "extract/extract_usda_rss.py",
+    "extract/extract_usda_api.py",
+    "transform/transform_fda_recall.py",
+    "transform/transform_fda_recall_refill.py",
+    "transform/transform_usda_recall.py",
+    "load/load_fda_recalls.py",
+    "load/load_usda_recalls.py",
+    "load/compact_recalls.py"
+]
+HEAVY_MODULES = ["requests", "fake_useragent", "bs4", "openai", "retry"]
+
+## CUSTOM FUNCTIONS ##
+def is_import_header_node(node):
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return True
+    # The `sys.path.append` that makes the shared package importable
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and ast.unparse(node.value.func) == "sys.path.append"
+
+def get_import_header(script_path):
+    with open(script_path, "r") as f:
+        module = ast.parse(f.read())
+    header_nodes = []
+    for node in module.body:
+        if not is_import_header_node(node):
+            break
+        header_nodes.append(node)
+    return ast.unparse(ast.Module(body=header_nodes, type_ignores=[]))
+
+# Runs the import header in a fresh interpreter, returns the total import microseconds and the heavy modules loaded
+def time_import_header(script_path):
+    header_code = get_import_header(script_path)
+    code = "\n".join([
+        f"__file__ = {os.path.abspath(script_path)!r}",
+        header_code,
+        "import sys, json",
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    ])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", top-level imports have no indent
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, package = line[len("import time:"):].split("|")
+        if not package.startswith(" ") or package.startswith("  "):
+            continue
+        total_us += int(cumulative_us)
+    return total_us, json.loads(result.stdout.strip().splitlines()[-1])
+
+## ACTUAL SCRIPT ##
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+name_width = max(len(entry_point) for entry_point in ENTRY_POINTS)
+print(f"{'script':<{name_width}}  import ms  heavy modules loaded")
+for entry_point in ENTRY_POINTS:
+    timings = [time_import_header(os.path.join(repo_dir, entry_point)) for _ in range(runs)]
+    median_ms = sorted(total_us for total_us, _ in timings)[len(timings) // 2] / 1e3
+    print(f"{entry_point:<{name_width}}  {median_ms:9.1f}  {', '.join(timings[-1][1]) or '-'}")
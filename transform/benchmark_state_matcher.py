@@ -0,0 +1,88 @@
+import re
+import os
+import sys
+import glob
+import time
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.page_archive import PageArchive
+from food_safety_recalls.fda_page import parse_fda_page
+from food_safety_recalls.state_codes import STATE_CODES, STATE_NAMES
+from food_safety_recalls.state_matcher import compile_state_matcher, find_impacted_states
+
+# Times finding the impacted states in saved FDA recall pages with the nested loops the transform
+# used to run, one re.search per state, per string, per <p> tag, against the compiled single pass
+# matcher, and checks that both give the same postal codes for every page. The pages come from a
+# folder of .html files if one is given, otherwise from the FDA page archive, or from the hand-built
+# pages in `tests/fixtures/fda_pages` if the archive is empty. Each page is searched `repeat` times.
+# Usage: python ./transform/benchmark_state_matcher.py [folder of saved .html pages, or - for the default pages] [repeat, 20 by default]
+
+## CUSTOM FUNCTIONS ##
+# The state search from before the compiled matcher
+def search_paragraphs(state_list, paragraph_list):
+    match_list = []
+    for paragraph in paragraph_list:
+        for string in paragraph.strings:
+            for state in state_list:
+                state_pattern = f'\\W{state}\\W' if len(state) == 2 else state
+                if re.search(state_pattern, string) is not None:
+                    match_list.append(state)
+    return match_list
+
+def find_impacted_states_nested(paragraph_list):
+    dedup_state_abb_matches = list(dict.fromkeys(search_paragraphs(STATE_CODES, paragraph_list)))
+    dedup_state_name_matches = list(dict.fromkeys(search_paragraphs(STATE_NAMES, paragraph_list)))
+
+    if dedup_state_name_matches:
+        matching_indices = [i for i, element in enumerate(STATE_NAMES) if element in dedup_state_name_matches]
+        dedup_state_abb_matches.extend(STATE_CODES[i] for i in matching_indices)
+
+    return list(dict.fromkeys(dedup_state_abb_matches))
+
+def read_page_folder(page_folder_path):
+    page_htmls = []
+    for page_path in sorted(glob.glob(os.path.join(page_folder_path, "*.html"))):
+        with open(page_path, "r") as f:
+            page_htmls.append(f.read())
+    return page_htmls
+
+def time_matcher(paragraph_lists, find_states, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        page_states = [find_states(paragraph_list) for paragraph_list in paragraph_lists]
+    return time.perf_counter() - start, page_states
+
+## ACTUAL SCRIPT ##
+script_dir = os.path.dirname(__file__)
+page_folder_path = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+if page_folder_path is not None:
+    page_htmls = read_page_folder(page_folder_path)
+else:
+    fda_page_archive = PageArchive(os.path.join(script_dir, "../raw_data/page_archive/fda"))
+    page_htmls = [fda_page_archive.get(url) for url in fda_page_archive.urls()]
+    if not page_htmls:
+        print("The FDA page archive is empty, searching the hand-built pages in tests/fixtures/fda_pages")
+        page_htmls = read_page_folder(os.path.join(script_dir, "../tests/fixtures/fda_pages"))
+
+if not page_htmls:
+    sys.exit("No saved pages to search")
+
+paragraph_lists = [parse_fda_page(page_html).find_all("p") for page_html in page_htmls]
+
+state_matcher = compile_state_matcher()
+nested_secs, nested_states = time_matcher(paragraph_lists, find_impacted_states_nested, repeat)
+compiled_secs, compiled_states = time_matcher(
+    paragraph_lists, lambda paragraph_list: find_impacted_states(state_matcher, paragraph_list), repeat
+)
+
+page_count = len(paragraph_lists)
+print(f"Searched {page_count} pages {repeat} times, {sum(len(states) for states in compiled_states)} states found")
+print(f"Nested re.search loops: {nested_secs / (page_count * repeat) * 1e3:.2f} ms a page")
+print(f"Compiled single pass: {compiled_secs / (page_count * repeat) * 1e3:.3f} ms a page ({nested_secs / compiled_secs:.0f}x)")
+if nested_states != compiled_states:
+    mismatch_count = sum(nested != compiled for nested, compiled in zip(nested_states, compiled_states))
+    sys.exit(f"{mismatch_count} pages got different states from the two matchers")
+print("Both matchers found the same states on every page")
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.json_stream import iter_json_array, JsonArrayWriter
+
+# Compares the peak memory of loading the raw USDA API JSON all at once against reading it a
+# record at a time with `iter_json_array`, and of writing it back out with `json.dump` against
+# `JsonArrayWriter`. Both ways of writing have to produce the same bytes. The raw JSON isn't
+# committed, so without it (like on a fresh checkout) a synthetic payload of made up API records is used.
+# Usage: python ./transform/benchmark_usda_streaming.py [raw USDA API JSON file]
+
+## CONSTANTS ##
+SYNTHETIC_RECORD_COUNT = 20000
+
+## CUSTOM FUNCTIONS ##
+def measure_peak(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    secs = time.perf_counter() - start
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak_bytes
+
+# A made up raw API record, the fields the transform reads with values about as long as the real ones
+def make_synthetic_record(i):
+    year = 2000 + i % 26
+    return {
+        "field_title": f"Synthetic Farms Recalls Pork Product {i}",
+        "field_recall_date": f"{year}-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "field_recall_reason": "Misbranding, Unreported Allergens",
+        "field_establishment": "Synthetic Farms",
+        "field_product_items": f"12-oz. packages of pork product {i}",
+        "field_states": "Iowa, West Virginia",
+        "field_recall_number": f"{i:03d}-{year}",
+        "field_recall_type": "Active Recall",
+        "field_risk_level": "High - Class I",
+        "field_recall_classification": "Class I",
+        "field_summary": f"<p>Synthetic Farms is recalling pork product {i}.</p>" * 8,
+        "langcode": "English"
+    }
+
+# Writes the synthetic payload a record at a time, in the same layout as `json.dump` with indent=4
+def write_synthetic_payload(file_path, record_count):
+    with JsonArrayWriter(file_path) as writer:
+        for i in range(record_count):
+            writer.write(make_synthetic_record(i))
+
+def load_and_dump(raw_data_file_path, output_file_path):
+    with open(raw_data_file_path, "r") as f:
+        raw_usda_json = json.load(f)
+    with open(output_file_path, "w") as f:
+        json.dump(raw_usda_json, f, indent=4, separators=(",", ": "))
+    return len(raw_usda_json)
+
+def stream_and_write(raw_data_file_path, output_file_path):
+    with JsonArrayWriter(output_file_path) as writer:
+        for recall in iter_json_array(raw_data_file_path):
+            writer.write(recall)
+    return writer.count
+
+## ACTUAL SCRIPT ##
+script_dir = os.path.dirname(__file__)
+if len(sys.argv) > 1:
+    raw_data_file_path = sys.argv[1]
+else:
+    raw_data_file_path = os.path.join(script_dir, "../raw_data/usda_food_safety_recalls.json")
+
+# Both outputs, and the synthetic payload if there's no raw JSON, go in a temporary folder
+with tempfile.TemporaryDirectory() as output_dir:
+    if not os.path.exists(raw_data_file_path):
+        print(f"No raw USDA API JSON at {raw_data_file_path}, using {SYNTHETIC_RECORD_COUNT} synthetic records instead")
+        raw_data_file_path = os.path.join(output_dir, "synthetic_usda_food_safety_recalls.json")
+        write_synthetic_payload(raw_data_file_path, SYNTHETIC_RECORD_COUNT)
+        raw_data_name = "the synthetic payload"
+    else:
+        raw_data_name = raw_data_file_path
+    raw_data_file_size = os.path.getsize(raw_data_file_path)
+
+    loaded_output_path = os.path.join(output_dir, "loaded.json")
+    streamed_output_path = os.path.join(output_dir, "streamed.json")
+
+    loaded_count, loaded_secs, loaded_peak = measure_peak(lambda: load_and_dump(raw_data_file_path, loaded_output_path))
+    streamed_count, streamed_secs, streamed_peak = measure_peak(lambda: stream_and_write(raw_data_file_path, streamed_output_path))
+
+    with open(loaded_output_path, "rb") as f:
+        loaded_bytes = f.read()
+    with open(streamed_output_path, "rb") as f:
+        streamed_bytes = f.read()
+
+print(f"{loaded_count} records in {raw_data_name} ({raw_data_file_size / 1e6:.1f} MB)")
+print(f"json.load and json.dump: peak {loaded_peak / 1e6:.1f} MB, {loaded_secs:.2f}s")
+print(f"iter_json_array and JsonArrayWriter: peak {streamed_peak / 1e6:.1f} MB, {streamed_secs:.2f}s")
+if streamed_count != loaded_count or streamed_bytes != loaded_bytes:
+    sys.exit("The streamed output doesn't match json.dump")
+print("Streamed output matches json.dump byte for byte")
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import xml.etree.ElementTree as ET
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from datetime import date
+
+from food_safety_recalls.usda_recall_urls import FUZZY_MATCH_DAYS, UsdaRecallUrlIndex, parse_pub_date
+
+# Compares looking up each USDA recall's URL the way the transform used to, parsing the RSS XML
+# again for every record and walking all of its items, with building the URL index from the RSS
+# once and looking every record up in it. Every URL the old lookup finds has to be found by the index too,
+# unless the page it found was published more than FUZZY_MATCH_DAYS from the record, since FSIS reuses titles.
+# The records are the titles in the committed USDA staging file and the feed is the committed RSS XML.
+# Usage: python ./transform/benchmark_usda_url_lookup.py [USDA RSS XML file] [USDA staged or clean JSON file]
+
+## CUSTOM FUNCTIONS ##
+# The lookup from before the index, one parse of the feed per record
+def find_usda_recall_url_per_record(title_str, xml_data_file_path):
+    tree = ET.parse(xml_data_file_path)
+    root = tree.getroot()
+
+    recall_url = None
+    pub_date = None
+
+    for item in root.iterfind(".//item"):
+        recall_title = item.find("title").text.strip()
+        xml_recall_url = item.find("guid").text.strip()
+        if title_str == recall_title:
+            recall_url = xml_recall_url
+            pub_date = parse_pub_date(item.findtext("pubDate"))
+
+    return recall_url, pub_date
+
+# Whether the page the old lookup found could be the record's own, the old lookup never checked
+def published_near(pub_date, recall_date):
+    return pub_date is None or abs((date.fromisoformat(pub_date) - date.fromisoformat(recall_date)).days) <= FUZZY_MATCH_DAYS
+
+def find_usda_recall_urls_indexed(records, xml_data_file_path):
+    # An index path that doesn't exist so only this RSS snapshot is in it and nothing is written
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url_index = UsdaRecallUrlIndex(os.path.join(tmp_dir, "usda_recall_urls.json"))
+        with open(xml_data_file_path, "r") as f:
+            url_index.add_rss_snapshot(f.read())
+        return [url_index.find(title, notice_id, recall_date) for title, notice_id, recall_date in records]
+
+## ACTUAL SCRIPT ##
+script_dir = os.path.dirname(__file__)
+xml_data_file_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(script_dir, "../raw_data/usda_food_safety_recalls.xml")
+records_file_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(script_dir, "../transformed_staged_data/usda_food_safety_recalls_staged.json")
+
+with open(records_file_path, "r") as f:
+    records = [
+        (recall["title"], recall["notice_id_number"], recall["notification_dttm"][:10])
+        for recall in json.load(f) if recall["agency"] == "USDA"
+    ]
+
+start = time.perf_counter()
+per_record_matches = [find_usda_recall_url_per_record(title, xml_data_file_path) for title, _, _ in records]
+per_record_urls = [recall_url for recall_url, _ in per_record_matches]
+per_record_secs = time.perf_counter() - start
+
+start = time.perf_counter()
+indexed_urls = find_usda_recall_urls_indexed(records, xml_data_file_path)
+indexed_secs = time.perf_counter() - start
+
+missed_count = sum(
+    per_record_url is not None and published_near(pub_date, recall_date) and indexed_url != per_record_url
+    for (per_record_url, pub_date), (_, _, recall_date), indexed_url in zip(per_record_matches, records, indexed_urls)
+)
+
+print(f"Looked up {len(records)} USDA recalls in {xml_data_file_path}")
+print(f"Parsing the RSS per record: {per_record_secs:.2f}s, {sum(url is not None for url in per_record_urls)} URLs found")
+print(f"Index built once: {indexed_secs:.3f}s, {sum(url is not None for url in indexed_urls)} URLs found ({per_record_secs / indexed_secs:.0f}x)")
+if missed_count:
+    sys.exit(f"The index found a different URL than the per record lookup for {missed_count} recalls")
+print("The index found every URL the per record lookup did")
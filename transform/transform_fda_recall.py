@@ -1,19 +1,36 @@
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-from zoneinfo import ZoneInfo
-import re
-import uuid
 import xml.etree.ElementTree as ET
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import json
-from fake_useragent import UserAgent
-from openai import OpenAI
-from retry import retry
+import hashlib
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.fetch import get_data_from_url, get_session, HostRateLimiter
+from food_safety_recalls import metrics
+from food_safety_recalls.helpers import DateTimeEncoder
+from food_safety_recalls.uids import make_recall_uid
+from food_safety_recalls.watermarks import read_recall_watermarks, empty_agency_watermarks
+from food_safety_recalls.state_matcher import compile_state_matcher, find_impacted_states
+from food_safety_recalls.page_archive import PageArchive
+from food_safety_recalls.fda_page import parse_fda_page, extract_dl_terms, extract_dd_terms
+from food_safety_recalls.classification_cache import ClassificationCache
+from food_safety_recalls.preclassify import preclassify_recall
 
 ## GETTING ENVIRONMENT VARIABLES ##
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# How many FDA recall pages are fetched at once and how many requests a second are sent to each host
+FDA_FETCH_CONCURRENCY = int(os.getenv("FDA_FETCH_CONCURRENCY", "4"))
+FDA_REQUESTS_PER_SECOND = float(os.getenv("FDA_REQUESTS_PER_SECOND", "1"))
+# How many OpenAI classification requests are sent at once
+FDA_CLASSIFY_CONCURRENCY = int(os.getenv("FDA_CLASSIFY_CONCURRENCY", "4"))
+
+## CONSTANTS ##
+CLASSIFICATION_MODEL = "gpt-4-turbo-2024-04-09"
+# Running with `--replay` reads the recall pages from the page archive instead of downloading them
+REPLAY = "--replay" in sys.argv[1:]
 
 ## CUSTOM CLASSES ##
 class CustomError(Exception):
@@ -22,277 +39,53 @@ class CustomError(Exception):
         self.message = message
         super().__init__(message)
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super(DateTimeEncoder, self).default(obj)
-
 ## CUSTOM FUNCTIONS ##
-def get_latest_browser_version_number(browser, browser_type, operating_system):
-
-    ua = UserAgent()
-
-    all_browsers = ua.data_browsers
-
-    ff_linux_desktop_browsers = [d for d in all_browsers if d['type'] == browser_type and d['os'] == operating_system and d['browser'] == browser]
-
-    latest_ff_browser_num = "0.0"
-
-    for i in ff_linux_desktop_browsers:
-        new_num = i["browser_version"]
-        if (float(new_num) > float(latest_ff_browser_num)):
-            latest_ff_browser_num = new_num
-    
-    return(latest_ff_browser_num)
-
-def get_data_from_url(url):
-    try:
-        latest_ff = get_latest_browser_version_number(browser='Firefox', browser_type='desktop', operating_system='Linux')
-        ua = f"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/{latest_ff}"
-        headers = {
-        'User-Agent': ua
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-        return response  # Return the response data
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error {err.response.status_code}: {url}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.ConnectionError as err:
-        print(f"Connection Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.Timeout as err:
-        print(f"Timeout Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.RequestException as err:
-        print(f"Request Error: {err}")
-        return None  # Return None to indicate an error
-
-def load_json_file(file_name, rel_file_folder_path):
-    script_dir = os.path.dirname(__file__)
-    data_file_path = os.path.join(script_dir, rel_file_folder_path, file_name)
-
-    with open(data_file_path, "r") as f:
-        json_data = json.load(f)
-    
-    return json_data
-
-def extract_dl_terms(dt_elmnt):
-    dt_str = dt_elmnt.string
-    if dt_str is None:
-        raise TypeError("Data term element was not a one child NavigableString")
-    if dt_str == "Company Announcement Date:":
-        dt_str_name = "company_announce_dttm"
-    elif dt_str == "FDA Publish Date:":
-        dt_str_name = "notification_dttm"
-    elif dt_str == "Product Type:":
-        dt_str_name = "product_type"
-    elif dt_str == "Reason for Announcement:":
-        dt_str_name = "recall_reason"
-    elif dt_str == "Company Name:":
-        dt_str_name = "company_name"
-    elif dt_str == "Brand Name:":
-        dt_str_name = "brand_name"
-    elif dt_str == "Product Description:":
-        dt_str_name = "product_description"
-    else:
-        raise ValueError("Data term element value not recognized.")
-    return dt_str_name
-
-def extract_dd_terms(dd_elmnt):
-    child_count = len(list(dd_elmnt.children))
-    child_list = [child.name for child in dd_elmnt] 
-    if child_count == 1:
-        dd_val = str([gchild for gchild in dd_elmnt.stripped_strings][0])
-        if dd_val is None:
-            raise TypeError("Single data description element was not a one child NavigableString")
-    elif 'time' in child_list:
-        time_tag = dd_elmnt.time
-        tag_dict_val_dttm = time_tag.attrs.values()
-        tag_dttm_str = list(tag_dict_val_dttm)[0]
-        format_string = "%Y-%m-%dT%H:%M:%S%z"
-        dd_val = datetime.strptime(tag_dttm_str, format_string)
-    elif 'div' in child_list:
-        item_div_tags = dd_elmnt.find("div", class_="field--item")
-        if len(item_div_tags) == 1:
-            dd_val = str(item_div_tags.string)
-        else:
-            dd_val = [str(div_tag.string) for div_tag in item_div_tags]
-    elif 'br' in child_list:
-        dd_val = [str(gchild) for gchild in dd_elmnt.stripped_strings]
-    else:
-        raise ValueError("Data description element value not recognized.")
-    return dd_val
-
-# These functions handle the three nested loops that look through <p> tags and try to match state names and abbreviations.
-# The start from inner-most and go to outer-most
-def match_state_names_abbs(state, string):
-    match_list = []
-    if len(state) == 2:
-        state_pattern = f'\\W{state}\\W'
-    else:
-        state_pattern = state
-    p_match = re.search(state_pattern, string)
-    if p_match is not None:
-        print(f"Found a match for {state} in the string: {string}\n")
-        match_list.append(state)
-        return match_list
-    else:
-        return match_list
-
-def run_state_matches(state_list, string):
-    match_list = []
-    for state in state_list:
-        match_list.extend(match_state_names_abbs(state, string))
-    return match_list
-
-def search_strings(state_list, string_list):
-    match_list = []
-    for string in string_list:
-        match_list.extend(run_state_matches(state_list, string))
-    return match_list
-
-def search_paragraphs(state_list, paragraph_list):
-    match_list = []
-    for paragraph in paragraph_list:
-        string_list = paragraph.strings
-        match_list.extend(search_strings(state_list, string_list))
-    return match_list
-
-# Function to create FDA food safety recall data dict
+# Function to create FDA food safety recall data dict. The recall's text is returned
+# alongside it so all the new recalls can be classified together once they're fetched
 def create_fda_dict(url, title):
-    key_list, val_list = extract_fda_recall_data(url)
-    time.sleep(1)
+    recall_data = extract_fda_recall_data(url)
+    if recall_data is None:
+        return None
+    key_list, val_list, recall_text = recall_data
     key_list.insert(0, "title")
     val_list.insert(0, title)
     recall_dict = dict(zip(key_list, val_list))
     # Deleting this key/value from the dictionary because I don't see a need for it in the final data
     del recall_dict['product_type']
     print(f"Finished with recall {recall_dict["title"]} at {url}")
-    return recall_dict
-
-def change_timezones(dttm, tz_dest):
-    NEW_TZ = ZoneInfo(tz_dest)
-    dttm_new_tz = dttm.astimezone(NEW_TZ)
-    return dttm_new_tz
-
-# Function to send extracted recall text to OpenAI prompt
-@retry(ValueError, tries=3, delay=3)
-def classify_recall(recall_text):
-    client = OpenAI()
+    return recall_dict, recall_text
+
+# Function to create the FDA food safety recall data dicts and texts for a list of (url, title) RSS items.
+# Pages are fetched on a bounded thread pool and the results come back in the same order as the items,
+# leaving out the pages that couldn't be fetched
+def fetch_fda_recall_dicts(rss_items, max_workers):
+    # Building the shared session before any thread takes a rate limit token, otherwise the pages
+    # queued behind the first one building it would all be requested at once when it's done
+    if rss_items and not REPLAY:
+        get_session()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        recall_futures = [executor.submit(create_fda_dict, url, title) for url, title in rss_items]
+        recalls = [recall_future.result() for recall_future in recall_futures]
+    return [recall for recall in recalls if recall is not None]
+
+# openai and retry are only imported once there are recalls to send to OpenAI, so runs with
+# nothing new to classify don't pay for importing them
+def make_openai_client():
+    from openai import OpenAI
+    return OpenAI()
+
+# Function to send extracted recall text to OpenAI prompt, tried up to 3 times if the answer isn't a class
+def classify_recall(recall_text, client=None):
+    from retry.api import retry_call
+    return retry_call(request_recall_classification, fargs=[recall_text, client], exceptions=ValueError, tries=3, delay=3)
+
+def request_recall_classification(recall_text, client=None):
+    if client is None:
+        client = make_openai_client()
 
     response = client.chat.completions.create(
-        model="gpt-4-turbo-2024-04-09",
-        messages=[
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {
-                "role": "user",
-                "content": recall_class_I_example_1,
-            },
-            {
-                "role": "assistant",
-                "content": "Class I",
-            },
-            {
-                "role": "user",
-                "content": recall_class_II_example_1,
-            },
-            {
-                "role": "assistant",
-                "content": "Class II",
-            },
-            {
-                "role": "user",
-                "content": recall_class_III_example_1,
-            },
-            {
-                "role": "assistant",
-                "content": "Class III",
-            },
-            {
-                "role": "user",
-                "content": recall_unk_example_1,
-            },
-            {
-                "role": "assistant",
-                "content": "Unknown",
-            },
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {
-                "role": "user",
-                "content": recall_class_I_example_2,
-            },
-            {
-                "role": "assistant",
-                "content": "Class I",
-            },
-            {
-                "role": "user",
-                "content": recall_class_II_example_2,
-            },
-            {
-                "role": "assistant",
-                "content": "Class II",
-            },
-            {
-                "role": "user",
-                "content": recall_class_III_example_2,
-            },
-            {
-                "role": "assistant",
-                "content": "Class III",
-            },
-            {
-                "role": "user",
-                "content": recall_unk_example_2,
-            },
-            {
-                "role": "assistant",
-                "content": "Unknown",
-            },
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {
-                "role": "user",
-                "content": recall_class_I_example_3,
-            },
-            {
-                "role": "assistant",
-                "content": "Class I",
-            },
-            {
-                "role": "user",
-                "content": recall_class_II_example_3,
-            },
-            {
-                "role": "assistant",
-                "content": "Class II",
-            },
-            {
-                "role": "user",
-                "content": recall_class_III_example_3,
-            },
-            {
-                "role": "assistant",
-                "content": "Class III",
-            },
-            {
-                "role": "user",
-                "content": recall_unk_example_3,
-            },
-            {
-                "role": "assistant",
-                "content": "Unknown",
-            },
+        model=CLASSIFICATION_MODEL,
+        messages=few_shot_messages + [
             {
                 "role": "user",
                 "content": recall_text,
@@ -301,6 +94,11 @@ def classify_recall(recall_text):
         temperature=0,
     )
 
+    metrics.increment("llm_calls")
+    if metrics.METRICS_ENABLED and getattr(response, "usage", None) is not None:
+        metrics.increment("llm_prompt_tokens", response.usage.prompt_tokens)
+        metrics.increment("llm_completion_tokens", response.usage.completion_tokens)
+
     answer = response.choices[0].message.content.strip()
 
     acceptable_answers = [
@@ -314,16 +112,104 @@ def classify_recall(recall_text):
 
     return answer
 
+# Function that gives up on a recall text instead of failing the whole run when OpenAI can't
+# classify it, returns None in that case so the recall is left for the next run. Only API errors
+# and answers that aren't a class are given up on, anything else is a bug and fails the run.
+def classify_recall_or_none(recall_text, client):
+    from openai import APIError
+    try:
+        return classify_recall(recall_text, client)
+    except (APIError, ValueError) as err:
+        print(f"Could not classify recall text with OpenAI: {err}")
+        metrics.increment("llm_failures")
+        return None
+
+# Function to classify many recall texts at once. Recalls whose reason already makes the class
+# obvious are classified locally, texts that were classified before with the same model and prompt
+# come from the cache, and the rest are sent to OpenAI through one shared client with at most
+# `max_workers` requests in flight. Classifications are returned in the same order as `recall_texts`,
+# with None for the texts OpenAI couldn't classify, which aren't cached.
+def classify_recalls(recall_texts, recall_reasons, max_workers, client=None):
+    preclassifications = [preclassify_recall(recall_reason) for recall_reason in recall_reasons]
+
+    recall_classifications = {}
+    uncached_texts = []
+    for recall_text in dict.fromkeys(
+        recall_text for recall_text, preclassification in zip(recall_texts, preclassifications)
+        if preclassification is None
+    ):
+        recall_classification = classification_cache.get(recall_text, CLASSIFICATION_MODEL, PROMPT_VERSION)
+        if recall_classification is None:
+            uncached_texts.append(recall_text)
+        else:
+            recall_classifications[recall_text] = recall_classification
+
+    preclassified_count = sum(preclassification is not None for preclassification in preclassifications)
+    metrics.increment("recalls_preclassified", preclassified_count)
+    print(
+        f"Classifying {len(uncached_texts)} recalls with OpenAI, {len(recall_classifications)} already classified, "
+        f"{preclassified_count} classified from their recall reason"
+    )
+
+    if uncached_texts:
+        if client is None:
+            client = make_openai_client()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            new_classifications = executor.map(lambda recall_text: classify_recall_or_none(recall_text, client), uncached_texts)
+            for recall_text, recall_classification in zip(uncached_texts, new_classifications):
+                if recall_classification is not None:
+                    classification_cache.set(recall_text, CLASSIFICATION_MODEL, PROMPT_VERSION, recall_classification)
+                recall_classifications[recall_text] = recall_classification
+        # A bad key, an outage or a retired model fails every request, which should fail the workflow
+        if all(recall_classifications[recall_text] is None for recall_text in uncached_texts):
+            sys.exit(f"OpenAI couldn't classify any of the {len(uncached_texts)} recalls sent to it")
+
+    return [
+        preclassification or recall_classifications[recall_text]
+        for recall_text, preclassification in zip(recall_texts, preclassifications)
+    ]
+
+# Function to fill in a recall dict's risk level and classification from its local or OpenAI classification
+def add_recall_classification(recall_dict, recall_classification):
+    if recall_classification == "Class I":
+        risk_level = "Potentially High - Class I"
+    elif recall_classification == "Class II":
+        risk_level = "Potentially Low - Class II"
+    elif recall_classification == "Class III":
+        risk_level = "Potentially Marginal - Class III"
+    elif recall_classification == "Unknown":
+        risk_level = "Unknown"
+    
+    hedge_recall_classification = f"Potentially {recall_classification}"
+
+    recall_dict["risk_level"] = risk_level
+    recall_dict["recall_classification"] = hedge_recall_classification
+    return recall_dict
+
 # Function to extract all data from the URL
 def extract_fda_recall_data(url):
     key_list = []
     val_list = []
 
-    page = get_data_from_url(url)
-
-    page_html = page.text
-
-    soup = BeautifulSoup(page_html, "html.parser")
+    if REPLAY:
+        page_html = fda_page_archive.get(url)
+        if page_html is None:
+            raise CustomError(f"{url} is not in the page archive so it can't be replayed.")
+        metrics.increment("page_archive_replays")
+    else:
+        # Waiting on the per-host rate limit instead of sleeping a fixed second after every page
+        fda_rate_limiter.acquire(url)
+        with metrics.timer("fda_page_fetch"):
+            page = get_data_from_url(url)
+        # Pages that couldn't be fetched are skipped and not archived, they're tried again next run
+        if page is None:
+            print(f"Skipping {url}, the page couldn't be fetched")
+            metrics.increment("fda_pages_skipped")
+            return None
+        fda_page_archive.store(url, page)
+        page_html = page.text
+
+    soup = parse_fda_page(page_html)
 
     description_list = soup.find("dl", class_="lcds-description-list--grid")
 
@@ -360,31 +246,7 @@ def extract_fda_recall_data(url):
     combined_p_txt_list = [p.get_text() for p in paragraph_list]
     combined_p_txt_str = ' '.join(combined_p_txt_list)
 
-    recall_classification = classify_recall(combined_p_txt_str)
-
-    if recall_classification == "Class I":
-        risk_level = "Potentially High - Class I"
-    elif recall_classification == "Class II":
-        risk_level = "Potentially Low - Class II"
-    elif recall_classification == "Class III":
-        risk_level = "Potentially Marginal - Class III"
-    elif recall_classification == "Unknown":
-        risk_level = "Unknown"
-    
-    hedge_recall_classification = f"Potentially {recall_classification}"
-
-    all_state_abb_matches = search_paragraphs(states[0], paragraph_list)
-    all_state_name_matches = search_paragraphs(states[1], paragraph_list)
-
-    dedup_state_abb_matches = list(dict.fromkeys(all_state_abb_matches))
-    dedup_state_name_matches = list(dict.fromkeys(all_state_name_matches))
-
-    if dedup_state_name_matches:
-        matching_indices = [i for i, element in enumerate(states[1]) if element in dedup_state_name_matches]
-        addl_matched_state_abbs = [states[0][i] for i in matching_indices]
-        dedup_state_abb_matches.extend(addl_matched_state_abbs)
-
-    final_state_abbs = list(dict.fromkeys(dedup_state_abb_matches))
+    final_state_abbs = find_impacted_states(state_matcher, paragraph_list)
 
     key_list.append("impacted_states")
     val_list.append(final_state_abbs)
@@ -393,7 +255,8 @@ def extract_fda_recall_data(url):
     val_list.append("FDA")
 
     key_list.append("uid")
-    fda_uuid = str(uuid.uuid4())
+    # The recall URL is what identifies an FDA recall so the uid is derived from it
+    fda_uuid = make_recall_uid("FDA", url)
     val_list.append(fda_uuid)
 
     key_list.append("recall_url")
@@ -406,11 +269,12 @@ def extract_fda_recall_data(url):
     key_list.append("recall_type")
     val_list.append(None)
 
+    # Filled in by add_recall_classification once all the new recalls have been classified
     key_list.append("risk_level")
-    val_list.append(risk_level)
+    val_list.append(None)
 
     key_list.append("recall_classification")
-    val_list.append(hedge_recall_classification)
+    val_list.append(None)
 
     if len(key_list) != len(val_list):
         raise CustomError(f"Key list has a length of {len(key_list)} but the value list has a length of {len(val_list)}.")
@@ -419,135 +283,15 @@ def extract_fda_recall_data(url):
     # Not using the meta tag date anymore since it gets updated anytime edits are made to recall page
     # val_list[1] = meta_notification_dttm_utc
 
-    return [key_list, val_list]
+    return [key_list, val_list, combined_p_txt_str]
 
 ## OBJECTS ##
-states = [
-    [
-        "AL",
-        "AK",
-        "AS",
-        "AZ",
-        "AR",
-        "CA",
-        "CO",
-        "CT",
-        "DE",
-        "DC",
-        "FM",
-        "FL",
-        "GA",
-        "GU",
-        "HI",
-        "ID",
-        "IL",
-        "IN",
-        "IA",
-        "KS",
-        "KY",
-        "LA",
-        "ME",
-        "MH",
-        "MD",
-        "MA",
-        "MI",
-        "MN",
-        "MS",
-        "MO",
-        "MT",
-        "US",
-        "NE",
-        "NV",
-        "NH",
-        "NJ",
-        "NM",
-        "NY",
-        "NC",
-        "ND",
-        "MP",
-        "OH",
-        "OK",
-        "OR",
-        "PW",
-        "PA",
-        "PR",
-        "RI",
-        "SC",
-        "SD",
-        "TN",
-        "TX",
-        "UT",
-        "VT",
-        "VI",
-        "VA",
-        "WA",
-        "WV",
-        "WI",
-        "WY"
-    ],
-    [
-        "Alabama",
-        "Alaska",
-        "American Samoa",
-        "Arizona",
-        "Arkansas",	
-        "California",
-        "Colorado",
-        "Connecticut",
-        "Delaware",
-        "District of Columbia",
-        "Federated States of Micronesia",
-        "Florida",
-        "Georgia",
-        "Guam",
-        "Hawaii",
-        "Idaho",
-        "Illinois",
-        "Indiana",
-        "Iowa",
-        "Kansas",
-        "Kentucky",
-        "Louisiana",
-        "Maine",
-        "Marshall Islands",
-        "Maryland",
-        "Massachusetts",
-        "Michigan",
-        "Minnesota",
-        "Mississippi",
-        "Missouri",
-        "Montana",
-        "nationwide",
-        "Nebraska",
-        "Nevada",
-        "New Hampshire",
-        "New Jersey",
-        "New Mexico",
-        "New York",
-        "North Carolina",
-        "North Dakota",
-        "Northern Mariana Islands",
-        "Ohio",
-        "Oklahoma",
-        "Oregon",
-        "Palau",
-        "Pennsylvania",
-        "Puerto Rico",
-        "Rhode Island",
-        "South Carolina",
-        "South Dakota",
-        "Tennessee",
-        "Texas",
-        "Utah",
-        "Vermont",
-        "Virgin Islands",
-        "Virginia",
-        "Washington",
-        "West Virginia",
-        "Wisconsin",
-        "Wyoming"
-    ]
-]
+state_matcher = compile_state_matcher()
+
+fda_rate_limiter = HostRateLimiter(FDA_REQUESTS_PER_SECOND)
+
+# Every downloaded recall page is archived so the pages can be transformed again with `--replay`
+fda_page_archive = PageArchive(os.path.join(os.path.dirname(__file__), "../raw_data/page_archive/fda"))
 
 # Initial prompt to OpenAI model
 prompt = """
@@ -776,6 +520,126 @@ My stomach roars, not once but twice.
 A love betrayed by food so nice.
 """
 
+# Prompt and few-shot examples sent ahead of every recall's text
+few_shot_messages = [
+    {
+        "role": "system",
+        "content": prompt,
+    },
+    {
+        "role": "user",
+        "content": recall_class_I_example_1,
+    },
+    {
+        "role": "assistant",
+        "content": "Class I",
+    },
+    {
+        "role": "user",
+        "content": recall_class_II_example_1,
+    },
+    {
+        "role": "assistant",
+        "content": "Class II",
+    },
+    {
+        "role": "user",
+        "content": recall_class_III_example_1,
+    },
+    {
+        "role": "assistant",
+        "content": "Class III",
+    },
+    {
+        "role": "user",
+        "content": recall_unk_example_1,
+    },
+    {
+        "role": "assistant",
+        "content": "Unknown",
+    },
+    {
+        "role": "system",
+        "content": prompt,
+    },
+    {
+        "role": "user",
+        "content": recall_class_I_example_2,
+    },
+    {
+        "role": "assistant",
+        "content": "Class I",
+    },
+    {
+        "role": "user",
+        "content": recall_class_II_example_2,
+    },
+    {
+        "role": "assistant",
+        "content": "Class II",
+    },
+    {
+        "role": "user",
+        "content": recall_class_III_example_2,
+    },
+    {
+        "role": "assistant",
+        "content": "Class III",
+    },
+    {
+        "role": "user",
+        "content": recall_unk_example_2,
+    },
+    {
+        "role": "assistant",
+        "content": "Unknown",
+    },
+    {
+        "role": "system",
+        "content": prompt,
+    },
+    {
+        "role": "user",
+        "content": recall_class_I_example_3,
+    },
+    {
+        "role": "assistant",
+        "content": "Class I",
+    },
+    {
+        "role": "user",
+        "content": recall_class_II_example_3,
+    },
+    {
+        "role": "assistant",
+        "content": "Class II",
+    },
+    {
+        "role": "user",
+        "content": recall_class_III_example_3,
+    },
+    {
+        "role": "assistant",
+        "content": "Class III",
+    },
+    {
+        "role": "user",
+        "content": recall_unk_example_3,
+    },
+    {
+        "role": "assistant",
+        "content": "Unknown",
+    }
+]
+
+# Hash of the prompt and examples so saved classifications are only reused with the exact prompt that made them
+PROMPT_VERSION = hashlib.sha256(json.dumps(few_shot_messages).encode("utf-8")).hexdigest()[:16]
+
+# Saved classifications, kept in a subfolder so writing it doesn't trigger the load workflow
+classification_cache = ClassificationCache(
+    os.path.join(os.path.dirname(__file__), "../transformed_staged_data/cache/fda_recall_classifications.jsonl")
+)
+
 # More FDA resources
 # FDA Recalls data dashboard: https://datadashboard.fda.gov/oii/cd/recalls.htm
 # FDA's Recall Weekly Enforcement Report: https://www.accessdata.fda.gov/scripts/ires/index.cfm
@@ -784,6 +648,7 @@ A love betrayed by food so nice.
 # FDA Recalls Background and Definitions: https://www.fda.gov/safety/industry-guidance-recalls/recalls-background-and-definitions 
 
 ## ACTUAL SCRIPT ##
+metrics.start_run("transform_fda_recall")
 
 # Read in and parse FDA Food Safety Recalls RSS XML
 # Getting script folder
@@ -794,10 +659,10 @@ xml_data_file_path = os.path.join(script_dir, xml_data_folder_rel_path, "fda_foo
 tree = ET.parse(xml_data_file_path)
 root = tree.getroot()
 
-staging_data = []
+new_rss_items = []
 
-full_clean_json = load_json_file("food_safety_recalls.json", "../clean_data")
-full_clean_url_list = [recall["recall_url"] for recall in full_clean_json if "recall_url" in recall]
+# The URLs already in the clean data come from the watermarks sidecar so the whole history isn't loaded
+clean_recall_urls = set(read_recall_watermarks().get("FDA", empty_agency_watermarks())["recall_urls"])
 
 for item in root.iterfind(".//item"):
     recall_title = item.find("title").text.strip()
@@ -807,9 +672,39 @@ for item in root.iterfind(".//item"):
     # recall_pub_dttm_str = item.find("pubDate").text
     # format_string = "%a, %d %b %Y %H:%M:%S %Z"
     # recall_pub_dttm = datetime.strptime(recall_pub_dttm_str, format_string)
-    if recall_url not in full_clean_url_list:
-        recall_dict = create_fda_dict(recall_url, recall_title)
-        staging_data.append(recall_dict)
+    metrics.increment("rss_items")
+    if recall_url not in clean_recall_urls:
+        new_rss_items.append((recall_url, recall_title))
+
+metrics.increment("rss_items_new", len(new_rss_items))
+
+with metrics.timer("fetch_pages"):
+    fetched_recalls = fetch_fda_recall_dicts(new_rss_items, FDA_FETCH_CONCURRENCY)
+
+with metrics.timer("classify"):
+    try:
+        recall_classifications = classify_recalls(
+            [recall_text for _, recall_text in fetched_recalls],
+            [recall_dict.get("recall_reason") for recall_dict, _ in fetched_recalls],
+            FDA_CLASSIFY_CONCURRENCY
+        )
+    finally:
+        # Saved even if classifying fails partway so the classifications already paid for aren't lost
+        classification_cache.save()
+
+# Recalls OpenAI couldn't classify aren't staged, they're still new to the clean data so the next run tries them again
+staging_data = [
+    add_recall_classification(recall_dict, recall_classification)
+    for (recall_dict, _), recall_classification in zip(fetched_recalls, recall_classifications)
+    if recall_classification is not None
+]
+unclassified_count = len(fetched_recalls) - len(staging_data)
+if unclassified_count:
+    print(f"Leaving {unclassified_count} recalls OpenAI couldn't classify for the next run")
+# Read by the pipeline runner so it runs the transform again even if the RSS XML doesn't change
+pending_recall_count = len(new_rss_items) - len(fetched_recalls) + unclassified_count
+
+metrics.increment("records_staged", len(staging_data))
 
 if not staging_data:
     print("No new FDA data to add to the staging file.")
@@ -823,4 +718,7 @@ else:
     print("Writing out staged FDA JSON")
     # Writing out dict as JSON
     with open(staged_data_file_path, 'w') as f:
-        json.dump(staging_data, f, indent=4, separators=(",", ": "), cls=DateTimeEncoder)
\ No newline at end of file
+        json.dump(staging_data, f, indent=4, separators=(",", ": "), cls=DateTimeEncoder)
+
+metrics.increment("classification_cache_hits", classification_cache.hits)
+metrics.increment("classification_cache_misses", classification_cache.misses)
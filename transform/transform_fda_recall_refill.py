@@ -1,14 +1,28 @@
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-from zoneinfo import ZoneInfo
-import re
-import uuid
 import xml.etree.ElementTree as ET
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import json
-from fake_useragent import UserAgent
+
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls.fetch import get_data_from_url, get_session, HostRateLimiter
+from food_safety_recalls import metrics
+from food_safety_recalls.helpers import DateTimeEncoder
+from food_safety_recalls.uids import make_recall_uid
+from food_safety_recalls.state_matcher import compile_state_matcher, find_impacted_states
+from food_safety_recalls.page_archive import PageArchive
+from food_safety_recalls.fda_page import FDA_PAGE_TAGS, parse_fda_page, extract_dl_terms, extract_dd_terms
+
+## GETTING ENVIRONMENT VARIABLES ##
+# How many FDA recall pages are fetched at once and how many requests a second are sent to each host
+FDA_FETCH_CONCURRENCY = int(os.getenv("FDA_FETCH_CONCURRENCY", "4"))
+FDA_REQUESTS_PER_SECOND = float(os.getenv("FDA_REQUESTS_PER_SECOND", "1"))
+
+## CONSTANTS ##
+# Running with `--replay` reads the recall pages from the page archive instead of downloading them
+REPLAY = "--replay" in sys.argv[1:]
 
 ## CUSTOM CLASSES ##
 class CustomError(Exception):
@@ -17,140 +31,13 @@ class CustomError(Exception):
         self.message = message
         super().__init__(message)
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super(DateTimeEncoder, self).default(obj)
-
 ## CUSTOM FUNCTIONS ##
-def get_latest_browser_version_number(browser, browser_type, operating_system):
-
-    ua = UserAgent()
-
-    all_browsers = ua.data_browsers
-
-    ff_linux_desktop_browsers = [d for d in all_browsers if d['type'] == browser_type and d['os'] == operating_system and d['browser'] == browser]
-
-    latest_ff_browser_num = "0.0"
-
-    for i in ff_linux_desktop_browsers:
-        new_num = i["browser_version"]
-        if (float(new_num) > float(latest_ff_browser_num)):
-            latest_ff_browser_num = new_num
-    
-    return(latest_ff_browser_num)
-
-def get_data_from_url(url):
-    try:
-        latest_ff = get_latest_browser_version_number(browser='Firefox', browser_type='desktop', operating_system='Linux')
-        ua = f"Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/{latest_ff}"
-        headers = {
-        'User-Agent': ua
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-        return response  # Return the response data
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error {err.response.status_code}: {url}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.ConnectionError as err:
-        print(f"Connection Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.Timeout as err:
-        print(f"Timeout Error: {err}")
-        return None  # Return None to indicate an error
-    except requests.exceptions.RequestException as err:
-        print(f"Request Error: {err}")
-        return None  # Return None to indicate an error
-
-
-def extract_dl_terms(dt_elmnt):
-    dt_str = dt_elmnt.string
-    if dt_str is None:
-        raise TypeError("Data term element was not a one child NavigableString")
-    if dt_str == "Company Announcement Date:":
-        dt_str_name = "company_announce_dttm"
-    elif dt_str == "FDA Publish Date:":
-        dt_str_name = "notification_dttm"
-    elif dt_str == "Product Type:":
-        dt_str_name = "product_type"
-    elif dt_str == "Reason for Announcement:":
-        dt_str_name = "recall_reason"
-    elif dt_str == "Company Name:":
-        dt_str_name = "company_name"
-    elif dt_str == "Brand Name:":
-        dt_str_name = "brand_name"
-    elif dt_str == "Product Description:":
-        dt_str_name = "product_description"
-    else:
-        raise ValueError("Data term element value not recognized.")
-    return dt_str_name
-
-def extract_dd_terms(dd_elmnt):
-    child_count = len(list(dd_elmnt.children))
-    child_list = [child.name for child in dd_elmnt] 
-    if child_count == 1:
-        dd_val = str([gchild for gchild in dd_elmnt.stripped_strings][0])
-        if dd_val is None:
-            raise TypeError("Single data description element was not a one child NavigableString")
-    elif 'time' in child_list:
-        time_tag = dd_elmnt.time
-        tag_dict_val_dttm = time_tag.attrs.values()
-        tag_dttm_str = list(tag_dict_val_dttm)[0]
-        format_string = "%Y-%m-%dT%H:%M:%S%z"
-        dd_val = datetime.strptime(tag_dttm_str, format_string)
-    elif 'div' in child_list:
-        item_div_tags = dd_elmnt.find("div", class_="field--item")
-        if len(item_div_tags) == 1:
-            dd_val = str(item_div_tags.string)
-        else:
-            dd_val = [str(div_tag.string) for div_tag in item_div_tags]
-    elif 'br' in child_list:
-        dd_val = [str(gchild) for gchild in dd_elmnt.stripped_strings]
-    else:
-        raise ValueError("Data description element value not recognized.")
-    return dd_val
-
-# These functions handle the three nested loops that look through <p> tags and try to match state names and abbreviations.
-# The start from inner-most and go to outer-most
-def match_state_names_abbs(state, string):
-    match_list = []
-    if len(state) == 2:
-        state_pattern = f'\\W{state}\\W'
-    else:
-        state_pattern = state
-    p_match = re.search(state_pattern, string)
-    if p_match is not None:
-        print(f"Found a match for {state} in the string: {string}\n")
-        match_list.append(state)
-        return match_list
-    else:
-        return match_list
-
-def run_state_matches(state_list, string):
-    match_list = []
-    for state in state_list:
-        match_list.extend(match_state_names_abbs(state, string))
-    return match_list
-
-def search_strings(state_list, string_list):
-    match_list = []
-    for string in string_list:
-        match_list.extend(run_state_matches(state_list, string))
-    return match_list
-
-def search_paragraphs(state_list, paragraph_list):
-    match_list = []
-    for paragraph in paragraph_list:
-        string_list = paragraph.strings
-        match_list.extend(search_strings(state_list, string_list))
-    return match_list
-
 # Function to create FDA food safety recall data dict
 def create_fda_dict(url):
-    key_list, val_list = extract_fda_recall_data(url)
-    time.sleep(1)
+    recall_data = extract_fda_recall_data(url)
+    if recall_data is None:
+        return None
+    key_list, val_list = recall_data
     key_title = key_list.pop(15)
     key_list.insert(0, key_title)
     val_title = val_list.pop(15)
@@ -161,21 +48,43 @@ def create_fda_dict(url):
     print(f"Finished with recall {recall_dict["title"]} at {url}")
     return recall_dict
 
-def change_timezones(dttm, tz_dest):
-    NEW_TZ = ZoneInfo(tz_dest)
-    dttm_new_tz = dttm.astimezone(NEW_TZ)
-    return dttm_new_tz
+# Function to create the FDA food safety recall data dicts for a list of URLs.
+# Pages are fetched on a bounded thread pool and the results come back in the same order as the URLs,
+# leaving out the pages that couldn't be fetched
+def fetch_fda_recall_dicts(urls, max_workers):
+    # Building the shared session before any thread takes a rate limit token, otherwise the pages
+    # queued behind the first one building it would all be requested at once when it's done
+    if urls and not REPLAY:
+        get_session()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        recall_futures = [executor.submit(create_fda_dict, url) for url in urls]
+        recalls = [recall_future.result() for recall_future in recall_futures]
+    return [recall for recall in recalls if recall is not None]
 
 # Function to extract all data from the URL
 def extract_fda_recall_data(url):
     key_list = []
     val_list = []
 
-    page = get_data_from_url(url)
-
-    page_html = page.text
-
-    soup = BeautifulSoup(page_html, "html.parser")
+    if REPLAY:
+        page_html = fda_page_archive.get(url)
+        if page_html is None:
+            raise CustomError(f"{url} is not in the page archive so it can't be replayed.")
+    else:
+        # Waiting on the per-host rate limit instead of sleeping a fixed second after every page
+        fda_rate_limiter.acquire(url)
+        with metrics.timer("fda_page_fetch"):
+            page = get_data_from_url(url)
+        # Pages that couldn't be fetched are skipped and not archived, they're tried again next run
+        if page is None:
+            print(f"Skipping {url}, the page couldn't be fetched")
+            metrics.increment("fda_pages_skipped")
+            return None
+        fda_page_archive.store(url, page)
+        page_html = page.text
+
+    # The title comes from the page here so the <h1> is built along with the description list and paragraphs
+    soup = parse_fda_page(page_html, FDA_PAGE_TAGS + ["h1"])
 
     description_list = soup.find("dl", class_="lcds-description-list--grid")
 
@@ -211,18 +120,7 @@ def extract_fda_recall_data(url):
 
     paragraph_list = soup.find_all("p")
 
-    all_state_abb_matches = search_paragraphs(states[0], paragraph_list)
-    all_state_name_matches = search_paragraphs(states[1], paragraph_list)
-
-    dedup_state_abb_matches = list(dict.fromkeys(all_state_abb_matches))
-    dedup_state_name_matches = list(dict.fromkeys(all_state_name_matches))
-
-    if dedup_state_name_matches:
-        matching_indices = [i for i, element in enumerate(states[1]) if element in dedup_state_name_matches]
-        addl_matched_state_abbs = [states[0][i] for i in matching_indices]
-        dedup_state_abb_matches.extend(addl_matched_state_abbs)
-
-    final_state_abbs = list(dict.fromkeys(dedup_state_abb_matches))
+    final_state_abbs = find_impacted_states(state_matcher, paragraph_list)
 
     key_list.append("impacted_states")
     val_list.append(final_state_abbs)
@@ -231,7 +129,8 @@ def extract_fda_recall_data(url):
     val_list.append("FDA")
 
     key_list.append("uid")
-    fda_uuid = str(uuid.uuid4())
+    # The recall URL is what identifies an FDA recall so the uid is derived from it
+    fda_uuid = make_recall_uid("FDA", url)
     val_list.append(fda_uuid)
 
     key_list.append("recall_url")
@@ -263,133 +162,15 @@ def extract_fda_recall_data(url):
     return [key_list, val_list]
 
 ## OBJECTS ##
-states = [
-    [
-        "AL",
-        "AK",
-        "AS",
-        "AZ",
-        "AR",
-        "CA",
-        "CO",
-        "CT",
-        "DE",
-        "DC",
-        "FM",
-        "FL",
-        "GA",
-        "GU",
-        "HI",
-        "ID",
-        "IL",
-        "IN",
-        "IA",
-        "KS",
-        "KY",
-        "LA",
-        "ME",
-        "MH",
-        "MD",
-        "MA",
-        "MI",
-        "MN",
-        "MS",
-        "MO",
-        "MT",
-        "US",
-        "NE",
-        "NV",
-        "NH",
-        "NJ",
-        "NM",
-        "NY",
-        "NC",
-        "ND",
-        "MP",
-        "OH",
-        "OK",
-        "OR",
-        "PW",
-        "PA",
-        "PR",
-        "RI",
-        "SC",
-        "SD",
-        "TN",
-        "TX",
-        "UT",
-        "VT",
-        "VI",
-        "VA",
-        "WA",
-        "WV",
-        "WI",
-        "WY"
-    ],
-    [
-        "Alabama",
-        "Alaska",
-        "American Samoa",
-        "Arizona",
-        "Arkansas",	
-        "California",
-        "Colorado",
-        "Connecticut",
-        "Delaware",
-        "District of Columbia",
-        "Federated States of Micronesia",
-        "Florida",
-        "Georgia",
-        "Guam",
-        "Hawaii",
-        "Idaho",
-        "Illinois",
-        "Indiana",
-        "Iowa",
-        "Kansas",
-        "Kentucky",
-        "Louisiana",
-        "Maine",
-        "Marshall Islands",
-        "Maryland",
-        "Massachusetts",
-        "Michigan",
-        "Minnesota",
-        "Mississippi",
-        "Missouri",
-        "Montana",
-        "nationwide",
-        "Nebraska",
-        "Nevada",
-        "New Hampshire",
-        "New Jersey",
-        "New Mexico",
-        "New York",
-        "North Carolina",
-        "North Dakota",
-        "Northern Mariana Islands",
-        "Ohio",
-        "Oklahoma",
-        "Oregon",
-        "Palau",
-        "Pennsylvania",
-        "Puerto Rico",
-        "Rhode Island",
-        "South Carolina",
-        "South Dakota",
-        "Tennessee",
-        "Texas",
-        "Utah",
-        "Vermont",
-        "Virgin Islands",
-        "Virginia",
-        "Washington",
-        "West Virginia",
-        "Wisconsin",
-        "Wyoming"
-    ]
-]
+state_matcher = compile_state_matcher()
+
+fda_rate_limiter = HostRateLimiter(FDA_REQUESTS_PER_SECOND)
+
+# Every downloaded recall page is archived so the pages can be transformed again with `--replay`
+fda_page_archive = PageArchive(os.path.join(os.path.dirname(__file__), "../raw_data/page_archive/fda"))
+
 ## ACTUAL SCRIPT ##
+metrics.start_run("transform_fda_recall_refill")
 
 # Using handmade array of URLs
 target_urls = [
@@ -433,11 +214,9 @@ target_urls = [
                ]
 
 target_urls.reverse()
-staging_data = []
-
-for url in target_urls:
-    recall_dict = create_fda_dict(url)
-    staging_data.append(recall_dict)
+with metrics.timer("fetch_pages"):
+    staging_data = fetch_fda_recall_dicts(target_urls, FDA_FETCH_CONCURRENCY)
+metrics.increment("records_staged", len(staging_data))
 
 # Write out FDA Food Safety Recalls as JSON into `transformed_staged_data` folder
 # Getting script folder
@@ -1,27 +1,22 @@
 import os
-import json
+import sys
 from datetime import datetime
-from zoneinfo import ZoneInfo
-import uuid
-import xml.etree.ElementTree as ET
 
-## CUSTOM CLASSES ##
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super(DateTimeEncoder, self).default(obj)
+# Making the shared `food_safety_recalls` package in the repo root importable when this file is run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from food_safety_recalls import metrics
+from food_safety_recalls.store import bootstrap_recall_log, read_recall_log
+from food_safety_recalls.helpers import DateTimeEncoder, change_timezones
+from food_safety_recalls.uids import make_recall_uid
+from food_safety_recalls.watermarks import read_recall_watermarks, empty_agency_watermarks
+from food_safety_recalls.state_codes import state_names_to_mask, mask_to_states
+from food_safety_recalls.json_stream import iter_json_array, JsonArrayWriter
+from food_safety_recalls.usda_recall_urls import UsdaRecallUrlIndex
+from food_safety_recalls.usda_fingerprints import (
+    PENDING_FINGERPRINTS_PATH, fingerprint_usda_node, load_usda_fingerprints, write_usda_fingerprints
+)
 
 ## CUSTOM FUNCTIONS ##
-def load_json_file(file_name, rel_file_folder_path):
-    script_dir = os.path.dirname(__file__)
-    data_file_path = os.path.join(script_dir, rel_file_folder_path, file_name)
-
-    with open(data_file_path, "r") as f:
-        json_data = json.load(f)
-    
-    return json_data
-
 def empty_string_checker(raw_dict_val_str):
     replacement_val = None
     if raw_dict_val_str == "":
@@ -29,47 +24,33 @@ def empty_string_checker(raw_dict_val_str):
     else:
         return raw_dict_val_str
 
-def change_timezones(dttm, tz_dest):
-    NEW_TZ = ZoneInfo(tz_dest)
-    dttm_new_tz = dttm.astimezone(NEW_TZ)
-    return dttm_new_tz
-
 def parse_dttm(dttm_str, format_string):
     dttm = datetime.strptime(dttm_str, format_string)
     return dttm
 
-def find_state_postal_codes(state_list, present_states):
+# `field_states` is a comma separated list of state names. Each one is looked up whole so
+# "Arkansas" and "West Virginia" no longer also match Kansas and Virginia
+def find_state_postal_codes(present_states):
     if present_states == "":
         state_abbs = []
     else:
-        matching_indices = [i for i, element in enumerate(state_list[1]) if element in present_states]
-        state_abbs = [state_list[0][i] for i in matching_indices]
+        state_abbs = mask_to_states(state_names_to_mask(present_states.split(",")))
     return state_abbs
 
-def find_usda_recall_url(title_str, xml_folder, xml_filename):
-    script_dir = os.path.dirname(__file__)
-    xml_data_folder_rel_path = xml_folder
-    xml_data_file_path = os.path.join(script_dir, xml_data_folder_rel_path, xml_filename)
+def find_usda_recall_url(title_str, notice_id, recall_date, url_index):
+    recall_url = url_index.find(title_str, notice_id, recall_date)
 
-    tree = ET.parse(xml_data_file_path)
-    root = tree.getroot()
-
-    recall_url = None
-
-    for item in root.iterfind(".//item"):
-        recall_title = item.find("title").text.strip()
-        xml_recall_url = item.find("guid").text.strip()
-        if title_str == recall_title:
-            recall_url = xml_recall_url
-    
-    if not recall_url:
-        print(f"Could not find corresponding URL for recall {title_str}, leaving value empty")
+    if recall_url:
+        # Remembering the match so the record is found by its notice id even if its title changes
+        url_index.add_notice_id(notice_id, recall_url)
+    else:
         recall_url = None
     
     return recall_url
 
 
-def transform_usda_node(dict, state_list, xml_folder, xml_filename):
+
+def transform_usda_node(dict, url_index):
     title = empty_string_checker(dict["field_title"])
     company_announce_dttm = None
     notification_dttm_str = dict["field_recall_date"]
@@ -78,11 +59,17 @@ def transform_usda_node(dict, state_list, xml_folder, xml_filename):
     company_name = empty_string_checker(dict["field_establishment"])
     brand_name = None
     product_description = empty_string_checker(dict["field_product_items"])
-    impacted_states = find_state_postal_codes(state_list, dict["field_states"])
+    impacted_states = find_state_postal_codes(dict["field_states"])
     agency = "USDA"
-    uid = str(uuid.uuid4())
-    recall_url = find_usda_recall_url(title, xml_folder, xml_filename)
+    # Spanish translations share their English recall's notice id and a few alerts have no
+    # notice id at all, so the language (or the title if there's no language) tells those apart
     notice_id_number = empty_string_checker(dict["field_recall_number"])
+    uid_lang = dict.get("langcode") or title
+    if notice_id_number:
+        uid = make_recall_uid(agency, notice_id_number, uid_lang)
+    else:
+        uid = make_recall_uid(agency, title, notification_dttm_str, uid_lang)
+    recall_url = find_usda_recall_url(title, notice_id_number, notification_dttm_str, url_index)
     recall_type = empty_string_checker(dict["field_recall_type"])
     risk_level = empty_string_checker(dict["field_risk_level"])
     recall_classification = empty_string_checker(dict["field_recall_classification"])
@@ -108,151 +95,72 @@ def transform_usda_node(dict, state_list, xml_folder, xml_filename):
     return usda_dict
 
 ## OBJECTS ##
-states = [
-    [
-        "AL",
-        "AK",
-        "AS",
-        "AZ",
-        "AR",
-        "CA",
-        "CO",
-        "CT",
-        "DE",
-        "DC",
-        "FM",
-        "FL",
-        "GA",
-        "GU",
-        "HI",
-        "ID",
-        "IL",
-        "IN",
-        "IA",
-        "KS",
-        "KY",
-        "LA",
-        "ME",
-        "MH",
-        "MD",
-        "MA",
-        "MI",
-        "MN",
-        "MS",
-        "MO",
-        "MT",
-        "US",
-        "NE",
-        "NV",
-        "NH",
-        "NJ",
-        "NM",
-        "NY",
-        "NC",
-        "ND",
-        "MP",
-        "OH",
-        "OK",
-        "OR",
-        "PW",
-        "PA",
-        "PR",
-        "RI",
-        "SC",
-        "SD",
-        "TN",
-        "TX",
-        "UT",
-        "VT",
-        "VI",
-        "VA",
-        "WA",
-        "WV",
-        "WI",
-        "WY"
-    ],
-    [
-        "Alabama",
-        "Alaska",
-        "American Samoa",
-        "Arizona",
-        "Arkansas",	
-        "California",
-        "Colorado",
-        "Connecticut",
-        "Delaware",
-        "District of Columbia",
-        "Federated States of Micronesia",
-        "Florida",
-        "Georgia",
-        "Guam",
-        "Hawaii",
-        "Idaho",
-        "Illinois",
-        "Indiana",
-        "Iowa",
-        "Kansas",
-        "Kentucky",
-        "Louisiana",
-        "Maine",
-        "Marshall Islands",
-        "Maryland",
-        "Massachusetts",
-        "Michigan",
-        "Minnesota",
-        "Mississippi",
-        "Missouri",
-        "Montana",
-        "nationwide",
-        "Nebraska",
-        "Nevada",
-        "New Hampshire",
-        "New Jersey",
-        "New Mexico",
-        "New York",
-        "North Carolina",
-        "North Dakota",
-        "Northern Mariana Islands",
-        "Ohio",
-        "Oklahoma",
-        "Oregon",
-        "Palau",
-        "Pennsylvania",
-        "Puerto Rico",
-        "Rhode Island",
-        "South Carolina",
-        "South Dakota",
-        "Tennessee",
-        "Texas",
-        "Utah",
-        "Vermont",
-        "Virgin Islands",
-        "Virginia",
-        "Washington",
-        "West Virginia",
-        "Wisconsin",
-        "Wyoming"
-    ]
-]
+# Every recall URL the RSS feed has ever listed
+usda_recall_url_index = UsdaRecallUrlIndex()
 
 ## ACTUAL SCRIPT ##
+metrics.start_run("transform_usda_recall")
 
-raw_usda_json = load_json_file("usda_food_safety_recalls.json", "../raw_data")
-
-staging_data = []
+# The first time the URL index is built it's seeded with the URLs in the clean data, and the
+# latest RSS snapshot is always added in case the extractor didn't get to
+if len(usda_recall_url_index) == 0:
+    bootstrap_recall_log()
+    usda_recall_url_index.add_transformed_recalls(read_recall_log())
+with open(os.path.join(os.path.dirname(__file__), "../raw_data", "usda_food_safety_recalls.xml"), "r") as f:
+    usda_recall_url_index.add_rss_snapshot(f.read())
 
-for recall in raw_usda_json:
-    recall_dict = transform_usda_node(recall, states, "../raw_data", "usda_food_safety_recalls.xml")
-    staging_data.append(recall_dict)
-
-
-# Write out USDA Food Safety Recalls as JSON into `transformed_staged_data` folder
 # Getting script folder
 script_dir = os.path.dirname(__file__)
+# The raw API JSON is read a record at a time so the whole history is never in memory at once
+raw_data_file_path = os.path.join(script_dir, "../raw_data", "usda_food_safety_recalls.json")
 staged_data_folder_rel_path = "../transformed_staged_data"
 staged_data_file_path = os.path.join(script_dir, staged_data_folder_rel_path, "usda_food_safety_recalls_staged.json")
-
-print("Writing out staged USDA JSON")
-# Writing out dict as JSON
-with open(staged_data_file_path, 'w') as f:
-    json.dump(staging_data, f, indent=4, separators=(",", ": "), cls=DateTimeEncoder)
+# Only records that are new or have changed since the last run get transformed and staged.
+# Without fingerprints from a previous load, records already in the clean data count as seen.
+seen_fingerprints = load_usda_fingerprints()
+bootstrapped_fingerprints = seen_fingerprints is None
+if bootstrapped_fingerprints:
+    clean_notice_ids = set(read_recall_watermarks().get("USDA", empty_agency_watermarks())["notice_ids"])
+    seen_fingerprints = {fingerprint_usda_node(recall) for recall in iter_json_array(raw_data_file_path) if empty_string_checker(recall["field_recall_number"]) in clean_notice_ids}
+
+staged_fingerprints = set()
+raw_count = 0
+missing_url_count = 0
+
+# Staged recalls are written out as they're transformed. The writer only replaces the staging
+# file once it's closed and leaves it as is if no recalls were written.
+with JsonArrayWriter(staged_data_file_path, cls=DateTimeEncoder) as staging_writer:
+    for recall in iter_json_array(raw_data_file_path):
+        raw_count += 1
+        recall_fingerprint = fingerprint_usda_node(recall)
+        if recall_fingerprint in seen_fingerprints:
+            continue
+        staged_fingerprints.add(recall_fingerprint)
+        recall_dict = transform_usda_node(recall, usda_recall_url_index)
+        if recall_dict["recall_url"] is None:
+            missing_url_count += 1
+        staging_writer.write(recall_dict)
+
+metrics.increment("records_read", raw_count)
+metrics.increment("records_staged", staging_writer.count)
+metrics.increment("records_unchanged", raw_count - staging_writer.count)
+metrics.increment("usda_recall_urls_missing", missing_url_count)
+print(f"{staging_writer.count} of {raw_count} USDA recalls are new or changed")
+# One line instead of one per recall, most API records are older than anything the RSS feed has listed
+if missing_url_count:
+    print(f"Could not find the URL of {missing_url_count} staged USDA recalls, leaving their values empty")
+
+if staging_writer.count == 0:
+    print("No new USDA data to add to the staging file.")
+else:
+    print("Wrote out staged USDA JSON")
+
+usda_recall_url_index.save()
+
+# The fingerprints are never pruned against the raw file, an hourly run's raw file may not have every year
+# in it. The staged ones only count as seen once the loader has loaded them.
+if staging_writer.count:
+    write_usda_fingerprints(seen_fingerprints | staged_fingerprints, PENDING_FINGERPRINTS_PATH)
+elif bootstrapped_fingerprints:
+    # Nothing was staged for the loader, so the records already in the clean data are seen right away
+    write_usda_fingerprints(seen_fingerprints)